@@ -1,30 +1,41 @@
 # agents/assessor.py
+from scheduler import node
+from rules import RuleEngine
+
+@node(reads=('verified_world_state', 'rule_engine'), writes=('situation_assessment', 'rule_engine'))
 async def run(state, tools, llm, config=None):
     """
     From verified_world_state, produce situation_assessment:
     a list of incidents with severity, est_population, legal_flags.
+    Severities come from the declarative rule set (rules.DEFAULT_RULES, or config['rules']:
+    a dict or a JSON file path, re-read when the file changes); only zones that changed
+    since the last assessed WorldState version are re-evaluated.
     """
+    config = config or {}
     world = state.get('verified_world_state', {})
-    incidents = []
-    for zone, vals in world.items():
-        sev = 0
-        if vals.get('avg_water') and vals['avg_water'] >= 2.5: sev = max(sev, 3)
-        if vals.get('avg_garbage') and vals['avg_garbage'] >= 90: sev = max(sev, 2)
-        if sev>0:
-            incidents.append({
-                'zone': zone,
-                'severity': sev,
-                'estimated_people': 1000*sev,  # demo heuristic
-                'notes': []
-            })
-    state['situation_assessment'] = incidents
+    engine = state.get('rule_engine')
+    if engine is None:
+        engine = state['rule_engine'] = RuleEngine(config.get('rules'))
+    else:
+        engine.configure(config.get('rules'))
+    incidents, changed = engine.update(world)
+    if changed or 'situation_assessment' not in state:
+        state['situation_assessment'] = incidents
+    return state
 
-    # LLM add: short assessment
+@node(reads=('situation_assessment',), writes=('assessor_notes',))
+async def summarize(state, tools, llm, config=None):
+    """
+    LLM add: short assessment of the current incidents.
+    """
+    incidents = state.get('situation_assessment', [])
     try:
         prompt = f"assess\nincidents:{incidents}\nReturn 1-line summary."
-        resp = llm.call(prompt)
+        resp = await llm.acall(prompt)
         state.setdefault('assessor_notes',[]).append(resp['text'])
     except Exception:
         pass
 
     return state
+
+NODES = [run, summarize]
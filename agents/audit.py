@@ -1,24 +1,32 @@
 # agents/audit.py
-import json
-print("   [Audit] Appending plan decision to ledger...")
+from scheduler import node
 
+@node(reads=('approved_plan', 'last_execution'), writes=('audit_log', 'last_ledger_hash'))
 async def run(state, tools, llm, config=None):
     """
     Produce a signed explainability card for the approved plan and append to ledger.
     """
     plan = state.get('approved_plan')
-    exec_res = state.get('execution_results', [])
+    exec_res = state.get('last_execution', [])
     if not plan:
         return state
     card = {
         'plan_id': plan.get('id'),
         'plan_name': plan.get('name'),
+        'zone': plan.get('zone'),
+        'impact_pct': plan.get('impact_pct'),
+        'cost': plan.get('cost'),
+        'confidence': plan.get('confidence'),
         'rationale': plan.get('rationale'),
         'explain_card': plan.get('explain_card'),
         'execution': exec_res
     }
-    # sign/append via tool
-    ledger_entry = tools['append_ledger'](card)
+    # sign/append via tool; with group commit the entry is chained now and written with its batch
+    batcher = tools.get('ledger_batch')
+    if batcher is not None:
+        ledger_entry, _committed = batcher.submit(card)
+    else:
+        ledger_entry = tools['append_ledger'](card)
     state.setdefault('audit_log', []).append(ledger_entry)
-    state.setdefault('last_ledger_hash', ledger_entry.get('hash'))
+    state['last_ledger_hash'] = ledger_entry.get('hash')
     return state
@@ -1,18 +1,15 @@
 # agents/coalition.py
+from scheduler import node
+from rules import RuleEngine
+
+@node(reads=('situation_assessment', 'rule_engine'), writes=('coalitions',))
 async def run(state, tools, llm, config=None):
     """
     Decide which agent roles to involve for each incident.
-    Simple mapping: severity->roles
+    The roles come from the rule set's coalition tiers, evaluated by the assessor's
+    rule engine alongside the incidents.
     """
     incidents = state.get('situation_assessment', [])
-    coalitions = []
-    for inc in incidents:
-        sev = inc['severity']
-        roles = ['Planner','Executor','Audit']
-        if sev>=3:
-            roles += ['PublicComm','Traffic']
-        if sev>=4:
-            roles += ['EmergencyResponse']
-        coalitions.append({'zone': inc['zone'], 'roles': roles})
-    state['coalitions'] = coalitions
+    engine = state.get('rule_engine') or RuleEngine()
+    state['coalitions'] = engine.coalitions_for(incidents)
     return state
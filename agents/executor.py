@@ -1,33 +1,39 @@
 # agents/executor.py
+from scheduler import node
+from dispatch import ExecutionEngine
+from instrumentation import get_logger
+
+log = get_logger('executor')
+
+@node(reads=('approved_plan', 'safety_report', 'execution_seq'),
+      writes=('execution_results', 'last_execution', 'execution_seq'))
 async def run(state, tools, llm, config=None):
     """
     Execute approved plan by calling executor tools (dispatch, sms).
-    Execution results appended to state['execution_results'].
+    Steps run concurrently through dispatch.ExecutionEngine (per-actor limits, per-step
+    timeout, retries under an idempotency key); dispatch steps send the resources the
+    planner's allocation assigned (step['resources']).
+    Each step's result is appended to state['execution_results'] as soon as it finishes;
+    this plan's results (in step order) are also kept in state['last_execution'].
+    config: concurrency, per_actor, actor_limits, step_timeout_s, retries, backoff_s.
     """
+    config = config or {}
     plan = state.get('approved_plan')
     if not plan:
         return state
-    results = []
     # sandbox check: if high-risk, run digital twin simulation (already done in planner)
     if (plan.get('impact_pct',0) > 50) and state.get('safety_report', {}).get('verified') is False:
         # don't execute; require human
+        log.warning("blocked by safety", extra={'plan': plan.get('id')})
         state['execution_results'] = [{'status':'blocked_by_safety','plan_id':plan.get('id')}]
+        state['last_execution'] = list(state['execution_results'])
         return state
 
-    # iterate steps
-    for s in plan.get('steps', []):
-        actor = s.get('actor')
-        action = s.get('action', 'noop')
-        # map to tool calls
-        print(f"   [Executor] Executing action: {action} (Actor: {actor})")
-
-        if action == 'dispatch_truck':
-            num = s.get('count',1)
-            res = tools.get('dispatch_tool', lambda *a,**k: {'ok':True})({'zone': plan.get('name'), 'count': num})
-            results.append({'step':s,'result':res})
-        else:
-            # generic call
-            res = {'ok':True, 'note':'simulated action'}
-            results.append({'step':s,'result':res})
-    state.setdefault('execution_results', []).extend(results)
+    seq = state['execution_seq'] = state.get('execution_seq', 0) + 1
+    engine = ExecutionEngine(tools.get('dispatch_tool', lambda payload: {'ok': True}),
+                             concurrency=config.get('concurrency', 16), per_actor=config.get('per_actor', 4),
+                             actor_limits=config.get('actor_limits'), timeout=config.get('step_timeout_s', 1.0),
+                             retries=config.get('retries', 3), backoff=config.get('backoff_s', 0.05))
+    stream = state.setdefault('execution_results', [])
+    state['last_execution'] = await engine.run(plan, seq, on_result=lambda i, r: stream.append(r))
     return state
@@ -1,34 +1,68 @@
 # agents/fusion.py
-from collections import defaultdict
 import json
+from aggregation import ZoneAggregator
+from scheduler import node
+from state_store import WorldState
 
+@node(reads=('perception_events', 'perception_batch', 'fusion_cursor', 'zone_aggregator', 'world_state'),
+      writes=('fusion_cursor', 'zone_aggregator', 'world_state', 'zone_stats', 'changed_zones'))
 async def run(state, tools, llm, config=None):
     """
-    Look at last N perception_events and produce merged world_state.
-    Uses LLM for a short natural language summary (optional).
+    Fold perception_events that arrived since the last tick into per-zone window
+    statistics and refresh world_state for the zones that changed.
+    config: window (default ('count', 20)), windows (per zone/metric overrides), alpha (EWMA).
+    When the new events are exactly perception's columnar batch, that is folded in instead.
     """
-    events = state.get('perception_events', [])[-20:]
-    zones = defaultdict(lambda: {'water': [], 'garbage': []})
-    for ev in events:
-        stype = ev.get('sensor_type','').lower()
-        if 'water' in stype:
-            zones[ev['location']]['water'].append(ev['value'])
-        elif 'garbage' in stype:
-            zones[ev['location']]['garbage'].append(ev['value'])
-    world = {}
-    for z, vals in zones.items():
-        world[z] = {
-            'avg_water': round(sum(vals['water'])/len(vals['water']),2) if vals['water'] else None,
-            'avg_garbage': round(sum(vals['garbage'])/len(vals['garbage']),2) if vals['garbage'] else None
-        }
+    agg = state.get('zone_aggregator')
+    if agg is None:
+        config = config or {}
+        agg = state['zone_aggregator'] = ZoneAggregator(
+            config.get('window', ('count', 20)), config.get('windows'), config.get('alpha', 0.3))
 
-    state['world_state'] = world
+    events = state.get('perception_events', [])
+    cursor = state.get('fusion_cursor', 0)
+    batch = state.get('perception_batch')
+    if batch is not None and batch.covers(cursor, len(events)):
+        agg.update_batch(batch)
+    else:
+        agg.update_many(events[cursor:])
+    state['fusion_cursor'] = len(events)
+    agg.expire()
 
-    # optional LLM short summary
+    changed = agg.pop_changed()
+    state['changed_zones'] = sorted(changed)
+    if not changed:
+        # nothing new: keep the same world_state object
+        state.setdefault('world_state', WorldState())
+        return state
+
+    world = state.get('world_state')
+    if not isinstance(world, WorldState):
+        world = WorldState(world or {})
+    updates = {}
+    stats = dict(state.get('zone_stats', {}))
+    for z in changed:
+        zs = agg.stats.get(z, {})
+        if 'water' in zs or 'garbage' in zs:
+            updates[z] = agg.zone_world(z)
+        stats[z] = agg.zone_stats(z)
+    # copy-on-write: a new version only if some zone's values actually moved
+    state['world_state'] = world.evolve(updates)
+    state['zone_stats'] = stats
+    return state
+
+@node(reads=('world_state',), writes=('summaries',))
+async def summarize(state, tools, llm, config=None):
+    """
+    Optional LLM natural language summary of world_state.
+    """
+    world = state.get('world_state', {})
     try:
         prompt = f"fusion\nworld: {json.dumps(world)}\nSummarize in one short sentence."
-        llm_out = llm.call(prompt)
+        llm_out = await llm.acall(prompt)
         state.setdefault('summaries', []).append({'agent':'fusion','text': llm_out['text']})
     except Exception:
         pass
     return state
+
+NODES = [run, summarize]
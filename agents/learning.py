@@ -1,22 +1,26 @@
-import random
 # agents/learning.py
+from scheduler import node
+from plan_stats import PlanStats
+
+@node(reads=('audit_log', 'plan_stats', 'learning_cursor'),
+      writes=('plan_stats', 'learning_cursor', 'plan_weights', 'learning_notes'))
 async def run(state, tools, llm, config=None):
     """
-    Periodically analyze past audit_log and propose simple planner tweaks.
-    For demo, only run if audit_log length > N.
+    Fold audit entries appended since the last run into the running per-plan outcome
+    statistics (state['plan_stats'], bootstrapped from the ledger when the run starts) and
+    publish the planner's ranking weights as state['plan_weights'].
+    Work per tick is proportional to the new entries, not to the history.
     """
     log = state.get('audit_log', [])
-    if len(log) < 2:
+    stats = state.get('plan_stats')
+    if stats is None:
+        stats = state['plan_stats'] = PlanStats()
+    cursor = state.get('learning_cursor', 0)
+    if len(log) <= cursor:
         return state
-    # simple heuristic: compute avg impact_pct of successful plans and recommend threshold change
-    impacts = []
-    for entry in log:
-        p = entry.get('entry', {})
-        plan = p.get('plan_name') if isinstance(p.get('plan_name'), str) else p.get('plan_id')
-        # from entry, try to access nested impact
-        # fallback: pick random
-        impacts.append(random.random()*50)
-    avg = sum(impacts)/len(impacts)
-    # propose a small update
-    state.setdefault('learning_notes', []).append({'avg_impact_est': avg, 'suggestion': 'increase_planner_weight_on_impact_by_5pct'})
+    for entry in log[cursor:]:
+        stats.update(entry)
+    state['learning_cursor'] = len(log)
+    state['plan_weights'] = stats.weights()
+    state.setdefault('learning_notes', []).append({'entries': stats.entries, 'plan_weights': stats.weights()})
     return state
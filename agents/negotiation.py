@@ -1,16 +1,30 @@
 # agents/negotiation.py
+from scheduler import node
+
+@node(reads=('plans', 'manual_approve', 'human_approval'), writes=('approved_plan', 'human_approval'))
 async def run(state, tools, llm, config=None):
     """
     Presents plans and accepts a human-approved plan.
     For CLI demo, auto-approve top plan unless 'manual_approve' in state is True.
+    With manual_approve, state['human_approval'] (set from outside, e.g. graph.RunControl.approve)
+    picks the plan: True for the top plan, a plan name, or an index into plans.
     """
     plans = state.get('plans', [])
     if not plans:
         state['approved_plan'] = None
         return state
     if state.get('manual_approve', False):
-        # in demo, this would be replaced with UI
-        # here we keep system paused for human action (simulate by expecting external change)
+        choice = state.get('human_approval')
+        if choice is None:
+            # keep system paused until a human decides
+            return state
+        state['human_approval'] = None
+        if choice is True:
+            state['approved_plan'] = plans[0]
+        elif isinstance(choice, int) and 0 <= choice < len(plans):
+            state['approved_plan'] = plans[choice]
+        else:
+            state['approved_plan'] = next((p for p in plans if p.get('name') == choice), None)
         return state
     # auto-approve top plan
     state['approved_plan'] = plans[0]
@@ -1,6 +1,8 @@
 # agents/perception.py
-import asyncio, time
+import time
 from pydantic import BaseModel
+from scheduler import node
+from state_store import Event, RingBuffer
 
 # Simple Pydantic model for strong typing (optional)
 class Observation(BaseModel):
@@ -11,18 +13,28 @@ class Observation(BaseModel):
     value: float
     source: str = "simulator"
 
+@node(reads=('perception_cursor', 'manual_inject', 'ingest_offset'),
+      writes=('perception_cursor', 'perception_events', 'provenance',
+              'ingest_offset', 'perception_batch', 'ingest_stats'))
 async def run(state, tools, llm, config=None):
     """
     Reads next simulated event (CSV stream) and appends a structured observation to state['perception_events'].
     In a streaming run, this is called repeatedly.
+    config['batch']: take every row that arrived since the last tick in one columnar read instead.
+    With a live feed (tools['ingest'], an ingest.IngestServer) the queue is drained instead;
+    config['max_batch'] caps how many readings one tick takes.
     """
-    if 'perception_cursor' not in state:
-        state['perception_cursor'] = getattr(state, 'perception_cursor', 0)
+    if 'ingest' in tools:
+        return run_live(state, tools, (config or {}).get('max_batch'))
+    if (config or {}).get('batch') and 'csv_tail' in tools:
+        return run_batch(state, tools)
 
     # read one item from CSV stream generator stored in tools
     try:
         gen = tools['csv_gen']
         raw = next(gen)
+        # rows taken from the CSV so far (a resumed run skips this many)
+        state['perception_cursor'] = state.get('perception_cursor', 0) + 1
     except StopIteration:
         return state
     except Exception:
@@ -31,16 +43,67 @@ async def run(state, tools, llm, config=None):
         if raw is None:
             return state
 
-    obs = Observation(
+    obs = Event(**Observation(
         ts=raw.get('timestamp', str(time.time())),
         sensor_id=raw.get('sensor_id'),
         sensor_type=raw.get('sensor_type'),
         location=raw.get('location'),
         value=float(raw.get('value', 0.0)),
         source=raw.get('source','sim')
-    ).dict()
+    ).dict())
 
     state.setdefault('perception_events', []).append(obs)
     # small provenance
     state.setdefault('provenance', []).append({'agent':'perception','obs_id':len(state['perception_events'])-1})
     return state
+
+def run_live(state, tools, max_batch=None):
+    """
+    Drain the live ingestion queue into perception_events. ingest_stats keeps the
+    server counters plus the receive-time range of this tick's readings (for latency).
+    """
+    server = tools['ingest']
+    events, recv = server.drain(max_batch)
+    stats = state.setdefault('ingest_stats', {'rows': 0, 'rejected': 0})
+    stats['rows'] += len(events)
+    stats.update(server.stats, pending=server.pending(),
+                 oldest_recv=recv[0] if recv else None, newest_recv=recv[-1] if recv else None)
+    if events:
+        all_events = state.setdefault('perception_events', [])
+        first = len(all_events)
+        all_events.extend(events)
+        state.setdefault('provenance', []).extend(
+            {'agent': 'perception', 'obs_id': i} for i in range(first, len(all_events)))
+    return state
+
+def run_batch(state, tools):
+    """
+    Columnar ingestion: read all complete rows after state['ingest_offset'] in one chunked,
+    vectorized pass (same schema checks as Observation), keep a non-empty batch in
+    state['perception_batch'] and append its events to perception_events.
+    Fusion and safety consume the batch itself, so Event records are only built for the
+    rows the perception_events ring buffer keeps (its newest maxlen, all with a spill file).
+    """
+    batch, state['ingest_offset'] = tools['csv_tail'].read(state.get('ingest_offset', 0))
+    events = state.setdefault('perception_events', [])
+    batch.start = first = len(events)
+    stats = state.setdefault('ingest_stats', {'rows': 0, 'rejected': 0})
+    stats['rows'] += len(batch)
+    stats['rejected'] += batch.rejected
+    n = len(batch)
+    if n:
+        # an empty read leaves the key alone: a fresh batch object is news to fusion and safety
+        state['perception_batch'] = batch
+        provenance = state.setdefault('provenance', [])
+        _append(events, n, lambda keep: batch.records(n - keep))
+        _append(provenance, n, lambda keep: [{'agent': 'perception', 'obs_id': i}
+                                             for i in range(first + n - keep, first + n)])
+    return state
+
+def _append(buf, n, newest):
+    # newest(k) builds the last k of n new items; a ring buffer only gets what it keeps
+    keep = buf.retained(n) if isinstance(buf, RingBuffer) else n
+    if keep < n:
+        buf.extend_tail(n, newest(keep))
+    else:
+        buf.extend(newest(n))
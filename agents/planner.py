@@ -1,23 +1,160 @@
 # agents/planner.py
-import json, uuid
+import json, uuid, asyncio
+from scheduler import node
+from instrumentation import get_logger
 
+log = get_logger('planner')
+
+def canned_candidates():
+    """Fallback candidates when the LLM output can't be parsed or the deadline passes."""
+    return [
+        {'id': str(uuid.uuid4()), 'name': 'alert_and_dispatch',
+         'steps': [{'actor': 'Executor', 'action': 'dispatch_truck', 'count': 2}],
+         'confidence': 0.9},
+        {'id': str(uuid.uuid4()), 'name': 'monitor_only',
+         'steps': [{'actor': 'Monitoring', 'action': 'monitor'}],
+         'confidence': 0.6}
+    ]
+
+def simulate_candidates(candidates, world, tools):
+    """Run the digital twin for all candidates in one batch and build plan entries (no explain_card yet)."""
+    if 'digital_twin_batch' in tools:
+        twins = tools['digital_twin_batch'](candidates, world)
+    else:
+        twins = [tools['digital_twin_simulate'](c, world) for c in candidates]
+    entries = []
+    for c, twin in zip(candidates, twins):
+        name = c.get('name', c.get('id', 'plan'))
+        log.debug("simulated plan", extra={'plan': name})
+        entries.append({
+            'id': c.get('id', str(uuid.uuid4())),
+            'name': name,
+            'steps': c.get('steps', []),
+            'cost': twin.get('cost', 0),
+            'time_min': twin.get('time_saved_min', 0),
+            'impact_pct': twin.get('damage_reduced_pct', 0),
+            'confidence': c.get('confidence', 0.7),
+            'rationale': c.get('rationale', ["No rationale provided"])
+        })
+    return entries
+
+def apply_allocation(entries, zone, allocation):
+    """
+    Tie plans to the incident zone; dispatch steps send the trucks allocated to it.
+    A zone that got no trucks can't be dispatched to: its dispatch steps become monitor steps.
+    """
+    trucks = allocation.by_zone.get(zone, {}).get('truck', []) if allocation is not None else None
+    for e in entries:
+        e['zone'] = zone
+        if trucks is None:
+            continue
+        e['steps'] = [_allocated_step(s, trucks) if s.get('action') == 'dispatch_truck' else s
+                      for s in e['steps']]
+    return entries
+
+def _allocated_step(step, trucks):
+    if not trucks:
+        return {'actor': 'Monitoring', 'action': 'monitor', 'reason': 'no trucks allocated'}
+    return dict(step, count=len(trucks), resources=list(trucks))
+
+def rank(entries, weights=None):
+    """
+    Top 3 by confidence * impact, scaled by the learned per-plan weight (state['plan_weights'],
+    1.0 for plans without outcomes yet); sorted() is stable so ties keep candidate order.
+    """
+    weights = weights or {}
+    return sorted(entries, key=lambda x: x['confidence'] * x['impact_pct'] * weights.get(x['name'], 1.0),
+                  reverse=True)[:3]
+
+async def plan_incident(inc, world, tools, llm, allocation=None, weights=None):
+    """LLM candidates -> digital twin -> explain cards (all candidates at once) -> top 3."""
+    # build a prompt for the LLM to create candidate plans
+    prompt = (
+        f"Planner: world={json.dumps(world)}\n"
+        f"Incident={json.dumps(inc)}\n"
+        f"Produce up to 3 plans with steps, required roles, and a short rationale. Output JSON."
+    )
+    planner_out = await llm.acall(prompt)
+
+    # parse planner_out loosely using simulate fallback or try json
+    try:
+        parsed = json.loads(planner_out['text'])
+        candidates = parsed.get('plans', []) if isinstance(parsed, dict) else []
+    except Exception:
+        candidates = canned_candidates()
+
+    entries = apply_allocation(simulate_candidates(candidates, world, tools), inc['zone'], allocation)
+
+    # attach explainability cards via LLM (requests overlap)
+    explain_prompts = [
+        f"Explainability for plan {e['name']}: world={json.dumps(world)} plan={json.dumps(e)}"
+        for e in entries
+    ]
+    eouts = await asyncio.gather(*(llm.acall(p) for p in explain_prompts), return_exceptions=True)
+    for entry, eout in zip(entries, eouts):
+        if isinstance(eout, Exception):
+            entry['explain_card'] = "Simulated explanation"
+        else:
+            entry['explain_card'] = eout['text']
+    return rank(entries, weights)
+
+def fallback_plans(inc, world, tools, allocation=None, weights=None):
+    entries = apply_allocation(simulate_candidates(canned_candidates(), world, tools), inc['zone'], allocation)
+    for entry in entries:
+        entry['explain_card'] = "Simulated explanation (planner deadline exceeded)"
+    return rank(entries, weights)
+
+@node(reads=('situation_assessment', 'resources', 'allocation'), writes=('allocation',))
+async def allocate(state, tools, llm, config=None):
+    """
+    One global allocation of state['resources'] (trucks, crews) across all incidents,
+    re-solved from the previous one (warm start) when incidents or resources change.
+    config['allocation_budget_s'] (optional) caps the solve time.
+    """
+    config = config or {}
+    if 'allocate_resources' not in tools:
+        return state
+    incidents = state.get('situation_assessment', [])
+    resources = state.get('resources', [])
+    prev = state.get('allocation')
+    if prev is not None and prev.resources is resources and prev.incidents == incidents:
+        return state
+    state['allocation'] = tools['allocate_resources'](incidents, resources, warm=prev,
+                                                      time_budget=config.get('allocation_budget_s'))
+    return state
+
+@node(reads=('situation_assessment', 'verified_world_state', 'allocation', 'plan_weights', 'planner_inputs'),
+      writes=('plans', 'planner_inputs'))
 async def run(state, tools, llm, config=None):
     """
     Produce ranked plans using LLM + optimizer + digital twin.
     Output: state['plans'] = [ {id,name,steps,cost,time,confidence,explain_card}... ]
+    All incidents are planned concurrently. config['deadline_s'] (optional) bounds the
+    planning time per tick; incidents not done by then get the canned plans.
+    Dispatch steps use the trucks state['allocation'] assigns to the incident's zone.
+    Candidates are ranked with the learning agent's state['plan_weights'] as of this replan.
+    Plans are kept as they are while the verified WorldState version, the incidents and
+    the allocation are unchanged.
     """
     if state is None:
         state = {}
+    config = config or {}
 
     incidents = state.get('situation_assessment', [])
     world = state.get('verified_world_state', {})
+    allocation = state.get('allocation')
+    weights = state.get('plan_weights')
+    prev_world, prev_incidents, prev_allocation = state.get('planner_inputs', (None, None, None))
+    if 'plans' in state and world is prev_world and incidents == prev_incidents and allocation is prev_allocation:
+        return state
+    state['planner_inputs'] = (world, incidents, allocation)
     plans = []
 
-    print("   [Planner] Calling Gemini for planning...")
+    log.debug("planning", extra={'incidents': len(incidents)})
 
     # If no incidents detected, still generate a monitoring plan
     if not incidents:
-        print("   [Planner] No incidents detected → creating monitor-only plan.")
+        log.info("no incidents, monitor-only plan")
         monitor_plan = {
             "id": f"p_monitor_{uuid.uuid4().hex[:6]}",
             "name": "monitor_environment",
@@ -27,62 +164,21 @@ async def run(state, tools, llm, config=None):
         }
         plans.append(monitor_plan)
     else:
-        for inc in incidents:
-            zone = inc.get('zone', 'unknown')
-            # build a prompt for the LLM to create candidate plans
-            prompt = (
-                f"Planner: world={json.dumps(world)}\n"
-                f"Incident={json.dumps(inc)}\n"
-                f"Produce up to 3 plans with steps, required roles, and a short rationale. Output JSON."
-            )
-            planner_out = llm.call(prompt)
-
-            # parse planner_out loosely using simulate fallback or try json
-            try:
-                parsed = json.loads(planner_out['text'])
-                candidates = parsed.get('plans', []) if isinstance(parsed, dict) else []
-            except Exception:
-                # fallback: create two canned plans
-                candidates = [
-                    {'id': str(uuid.uuid4()), 'name': 'alert_and_dispatch',
-                     'steps': [{'actor': 'Executor', 'action': 'dispatch_truck', 'count': 2}],
-                     'confidence': 0.9},
-                    {'id': str(uuid.uuid4()), 'name': 'monitor_only',
-                     'steps': [{'actor': 'Monitoring', 'action': 'monitor'}],
-                     'confidence': 0.6}
-                ]
-
-            # evaluate each candidate using digital twin
-            ranked = []
-            for c in candidates:
-                name = c.get('name', c.get('id', 'plan'))
-                print(f"   [Planner] Simulating plan '{name}' using digital_twin_simulate...")
-
-                twin = tools['digital_twin_simulate'](c, world)
-                entry = {
-                    'id': c.get('id', str(uuid.uuid4())),
-                    'name': name,
-                    'steps': c.get('steps', []),
-                    'cost': twin.get('cost', 0),
-                    'time_min': twin.get('time_saved_min', 0),
-                    'impact_pct': twin.get('damage_reduced_pct', 0),
-                    'confidence': c.get('confidence', 0.7),
-                    'rationale': c.get('rationale', ["No rationale provided"])
-                }
-
-                # attach explainability card via LLM
-                try:
-                    explain_prompt = f"Explainability for plan {name}: world={json.dumps(world)} plan={json.dumps(entry)}"
-                    eout = llm.call(explain_prompt)
-                    entry['explain_card'] = eout['text']
-                except Exception:
-                    entry['explain_card'] = "Simulated explanation"
-
-                ranked.append(entry)
-
-            # sort by confidence * impact
-            ranked = sorted(ranked, key=lambda x: (x['confidence'] * x['impact_pct']), reverse=True)
-            plans.extend(ranked[:3])
+        tasks = [asyncio.ensure_future(plan_incident(inc, world, tools, llm, allocation, weights)) for inc in incidents]
+        done, pending = await asyncio.wait(tasks, timeout=config.get('deadline_s'))
+        if pending:
+            log.warning("deadline hit, canned plans", extra={'incidents': len(pending)})
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        # keep incident order so the final plan list is deterministic
+        for inc, task in zip(incidents, tasks):
+            if task in done and task.exception() is None:
+                plans.extend(task.result())
+            else:
+                plans.extend(fallback_plans(inc, world, tools, allocation, weights))
 
     state['plans'] = plans
     return state
+
+NODES = [allocate, run]
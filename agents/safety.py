@@ -1,31 +1,52 @@
 # agents/safety.py
+from scheduler import node
+from anomaly import StreamingDetector
+
+@node(reads=('perception_events', 'perception_batch', 'world_state', 'safety_cursor', 'anomaly_detector'),
+      writes=('safety_cursor', 'anomaly_detector', 'quarantine_list', 'verified_world_state', 'safety_report'))
 async def run(state, tools, llm, config=None):
     """
-    Verify fused world state vs perception provenance. Use tools.detect_adversarial.
+    Verify fused world state vs perception provenance. Scores only the events that arrived
+    since the last tick with a stateful per-sensor detector (tools.detect_adversarial).
     Adds 'verified_world_state' and 'quarantine_list' to state.
+    config: StreamingDetector options (z_threshold, roc_threshold, warmup, ...).
     """
-    events = state.get('perception_events', [])[-50:]
-    flags = tools['detect_adversarial'](events)
+    detector = state.get('anomaly_detector')
+    if detector is None:
+        detector = state['anomaly_detector'] = StreamingDetector(**(config or {}))
+    events = state.get('perception_events', [])
+    cursor = state.get('safety_cursor', 0)
+    batch = state.get('perception_batch')
+    if batch is not None and batch.covers(cursor, len(events)):
+        tools['detect_adversarial'](batch, detector=detector)
+    else:
+        tools['detect_adversarial'](events[cursor:], detector=detector)
+    state['safety_cursor'] = len(events)
+    # sensors stay quarantined until their next reading looks normal
+    flags = detector.quarantined()
     state['quarantine_list'] = flags
+    # world_state is a read-only WorldState, so it is passed on as is (no copy); a version
+    # with suspicious zones masked would be built with world.evolve()
+    state['verified_world_state'] = state.get('world_state', {})
     if flags:
-        # mark suspicious: remove suspicious sensors from world state for now
-        state['verified_world_state'] = state.get('world_state', {}).copy()
-        # simple removal: if sensor in flags, zero out affected zones (demo logic)
-        for f in flags:
-            sid = f.get('sensor_id')
-            # naive: if sensor_id contains zone or map to zone (demo)
-            # For demo we simply set 'verified' False
         state['safety_report'] = {'verified': False, 'flags': flags}
     else:
-        state['verified_world_state'] = state.get('world_state', {})
         state['safety_report'] = {'verified': True, 'flags': []}
+    return state
 
-    # Also ask the LLM for a short human explanation (optional)
+@node(reads=('world_state', 'quarantine_list'), writes=('safety_notes',))
+async def explain(state, tools, llm, config=None):
+    """
+    Ask the LLM for a short human explanation of the safety decision (optional).
+    """
+    flags = state.get('quarantine_list', [])
     try:
         prompt = f"safety check\nworld_state:{state.get('world_state')}\nflags:{flags}\nExplain."
-        resp = llm.call(prompt)
+        resp = await llm.acall(prompt)
         state.setdefault('safety_notes', []).append(resp['text'])
     except Exception:
         pass
 
     return state
+
+NODES = [run, explain]
@@ -0,0 +1,285 @@
+# aggregation.py
+from collections import deque
+from datetime import datetime
+import numpy as np
+from anomaly import group_order
+
+def metric_of(sensor_type):
+    """Map a sensor_type to the metric name used in world_state ('water', 'garbage', ...)."""
+    stype = (sensor_type or '').lower()
+    if 'water' in stype:
+        return 'water'
+    if 'garbage' in stype:
+        return 'garbage'
+    return stype
+
+def event_time(ts):
+    """Event timestamp (epoch float or ISO-8601 string) -> epoch seconds, None if it doesn't parse."""
+    if isinstance(ts, (int, float)):
+        return float(ts)
+    try:
+        return float(ts)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(str(ts).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+def event_times(ts):
+    """event_time over an array of timestamps -> float64 epoch seconds (NaN where it doesn't parse)."""
+    out = np.empty(len(ts))
+    for i, t in enumerate(ts.tolist()):
+        t = event_time(t)
+        out[i] = np.nan if t is None else t
+    return out
+
+# --- Windowed statistics ---
+class WindowStats:
+    """
+    Running statistics over a sliding window, O(1) amortized per value.
+    window: ('count', n) keeps the last n values, ('time', seconds) keeps values newer than
+    latest_ts - seconds. EWMA is over all values seen (not windowed).
+    """
+    __slots__ = ('kind', 'size', 'alpha', 'values', 'sum', 'sumsq', 'minq', 'maxq', 'ewma', 'seen')
+
+    def __init__(self, window=('count', 20), alpha=0.3):
+        self.kind, self.size = window
+        if self.kind not in ('count', 'time'):
+            raise ValueError(f"window kind must be 'count' or 'time', got {self.kind!r}")
+        self.alpha = alpha
+        self.values = deque()   # (ts, value, seq)
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.minq = deque()     # (value, seq), increasing values
+        self.maxq = deque()     # (value, seq), decreasing values
+        self.ewma = None
+        self.seen = 0
+
+    def add(self, value, ts=0.0):
+        seq = self.seen
+        self.seen += 1
+        self.values.append((ts, value, seq))
+        self.sum += value
+        self.sumsq += value * value
+        while self.minq and self.minq[-1][0] >= value:
+            self.minq.pop()
+        self.minq.append((value, seq))
+        while self.maxq and self.maxq[-1][0] <= value:
+            self.maxq.pop()
+        self.maxq.append((value, seq))
+        self.ewma = value if self.ewma is None else self.alpha * value + (1 - self.alpha) * self.ewma
+        self._evict(ts)
+
+    def add_many(self, values):
+        """
+        add() for each of an array of values (count windows; time windows add one by one).
+        Only the last `size` values can still be in the window afterwards, so the window is
+        rebuilt from those (vectorized) and the rest just advance seen and the EWMA.
+        """
+        m = len(values)
+        if self.kind != 'count' or m <= self.size:
+            for v in values.tolist():
+                self.add(v)
+            return
+        rest = values
+        if self.ewma is None:
+            self.ewma, rest = float(values[0]), values[1:]
+        if len(rest):
+            a = self.alpha
+            decay = (1 - a) ** np.arange(len(rest) - 1, -1, -1)
+            self.ewma = (1 - a) ** len(rest) * self.ewma + a * float(np.dot(decay, rest))
+        # everything in the window now is older than the last `size` values: all evicted
+        tail = values[m - self.size:]
+        seqs = range(self.seen + m - self.size, self.seen + m)
+        self.seen += m
+        self.values = deque(zip([0.0] * self.size, tail.tolist(), seqs))
+        self.sum = float(tail.sum())
+        self.sumsq = float(np.dot(tail, tail))
+        # monotonic queues: a value stays only if every later one is strictly larger (minq) / smaller (maxq)
+        later_min = np.r_[np.minimum.accumulate(tail[::-1])[::-1][1:], np.inf]
+        later_max = np.r_[np.maximum.accumulate(tail[::-1])[::-1][1:], -np.inf]
+        keep_min, keep_max = np.flatnonzero(tail < later_min), np.flatnonzero(tail > later_max)
+        self.minq = deque(zip(tail[keep_min].tolist(), [seqs[i] for i in keep_min.tolist()]))
+        self.maxq = deque(zip(tail[keep_max].tolist(), [seqs[i] for i in keep_max.tolist()]))
+
+    def expire(self, now):
+        """Drop values that fell out of a time window (no-op for count windows)."""
+        if self.kind == 'time':
+            return self._evict(now)
+        return False
+
+    def _evict(self, now):
+        vals = self.values
+        dropped = False
+        while vals and ((self.kind == 'count' and len(vals) > self.size) or
+                        (self.kind == 'time' and vals[0][0] < now - self.size)):
+            _, v, seq = vals.popleft()
+            self.sum -= v
+            self.sumsq -= v * v
+            if self.minq and self.minq[0][1] == seq:
+                self.minq.popleft()
+            if self.maxq and self.maxq[0][1] == seq:
+                self.maxq.popleft()
+            dropped = True
+        return dropped
+
+    @property
+    def count(self):
+        return len(self.values)
+
+    @property
+    def mean(self):
+        return self.sum / len(self.values) if self.values else None
+
+    @property
+    def var(self):
+        n = len(self.values)
+        if not n:
+            return None
+        m = self.sum / n
+        return max(0.0, self.sumsq / n - m * m)
+
+    @property
+    def min(self):
+        return self.minq[0][0] if self.minq else None
+
+    @property
+    def max(self):
+        return self.maxq[0][0] if self.maxq else None
+
+    def snapshot(self):
+        return {'count': self.count, 'sum': self.sum, 'mean': self.mean, 'min': self.min,
+                'max': self.max, 'var': self.var, 'ewma': self.ewma}
+
+# --- Per-zone aggregation ---
+class ZoneAggregator:
+    """
+    Incremental per-(zone, metric) window statistics, updated as each event arrives.
+    windows: overrides keyed by (zone, metric), zone or metric -> window spec
+    (looked up in that order, falling back to default_window).
+    Tracks which zones changed since the last pop_changed().
+    Time windows run on the event clock: values expire relative to the newest event
+    timestamp seen (self.latest), so replayed / historical data ages the same way live data does.
+    A reading whose timestamp doesn't parse is placed at the event clock as it stands (it
+    never moves it); before any valid timestamp it is dropped from time windows.
+    """
+    def __init__(self, default_window=('count', 20), windows=None, alpha=0.3):
+        self.default_window = tuple(default_window)
+        self.windows = {k: tuple(v) for k, v in (windows or {}).items()}
+        self.alpha = alpha
+        self.stats = {}         # zone -> {metric: WindowStats}
+        self.changed = set()
+        self.latest = None      # newest event timestamp seen (time windows only)
+        self._has_time = self.default_window[0] == 'time' or any(w[0] == 'time' for w in self.windows.values())
+
+    def window_for(self, zone, metric):
+        w = self.windows
+        return w.get((zone, metric)) or w.get(zone) or w.get(metric) or self.default_window
+
+    def update(self, ev):
+        """Fold one perception event into its zone's window."""
+        zone = ev.get('location')
+        value = ev.get('value')
+        if zone is None or not isinstance(value, (int, float)):
+            return
+        metric = metric_of(ev.get('sensor_type'))
+        ts = 0.0
+        if self._has_time:
+            ts = event_time(ev.get('ts'))
+            if ts is None:
+                ts = self.latest
+                if ts is None and self.window_for(zone, metric)[0] == 'time':
+                    return
+            elif self.latest is None or ts > self.latest:
+                self.latest = ts
+        zstats = self.stats.get(zone)
+        if zstats is None:
+            zstats = self.stats[zone] = {}
+        ws = zstats.get(metric)
+        if ws is None:
+            ws = zstats[metric] = WindowStats(self.window_for(zone, metric), self.alpha)
+        ws.add(float(value), ts if ws.kind == 'time' else 0.0)
+        self.changed.add(zone)
+
+    def update_many(self, events):
+        for ev in events:
+            self.update(ev)
+
+    def update_batch(self, batch):
+        """
+        update() for every row of a columnar EventBatch, without per-row Event objects:
+        rows are grouped by (zone, metric) once and each group's values folded in with add_many.
+        """
+        if not len(batch):
+            return
+        zcodes, zones = batch.codes('location')
+        scodes, stypes = batch.codes('sensor_type')
+        metrics = list(dict.fromkeys(metric_of(s) for s in stypes))
+        mcode = np.array([metrics.index(metric_of(s)) for s in stypes], dtype=np.int64)
+        key = zcodes.astype(np.int64) * len(metrics) + mcode[scodes]
+        order = group_order(key, len(zones) * len(metrics))
+        bounds = np.flatnonzero(np.diff(key[order])) + 1
+        starts, ends = np.r_[0, bounds], np.r_[bounds, len(key)]
+        values = batch.value.astype(np.float64, copy=False)
+        ts = None
+        if self._has_time:
+            ts = event_times(batch.ts)
+            bad = np.isnan(ts)
+            if bad.any():
+                # as in update(): the event clock each unparseable row would have seen
+                clock = np.fmax.accumulate(np.r_[np.nan if self.latest is None else self.latest, ts])
+                ts[bad] = clock[:-1][bad]
+            known = ts[~np.isnan(ts)]
+            if len(known) and (self.latest is None or known.max() > self.latest):
+                self.latest = float(known.max())
+        for s, e in zip(starts.tolist(), ends.tolist()):
+            rows = order[s:e]
+            zone, metric = zones[key[rows[0]] // len(metrics)], metrics[key[rows[0]] % len(metrics)]
+            if ts is not None and self.window_for(zone, metric)[0] == 'time':
+                rows = rows[~np.isnan(ts[rows])]    # no event clock yet: dropped
+                if not len(rows):
+                    continue
+            zstats = self.stats.get(zone)
+            if zstats is None:
+                zstats = self.stats[zone] = {}
+            ws = zstats.get(metric)
+            if ws is None:
+                ws = zstats[metric] = WindowStats(self.window_for(zone, metric), self.alpha)
+            if ws.kind == 'time':
+                for v, t in zip(values[rows].tolist(), ts[rows].tolist()):
+                    ws.add(v, t)
+            else:
+                ws.add_many(values[rows])
+            self.changed.add(zone)
+
+    def expire(self, now=None):
+        """
+        Age out time windows (only needed when some window is time-based).
+        now: on the event clock; defaults to the newest event timestamp seen.
+        """
+        if not self._has_time:
+            return
+        now = self.latest if now is None else now
+        if now is None:
+            return
+        for zone, zstats in self.stats.items():
+            for ws in zstats.values():
+                if ws.expire(now):
+                    self.changed.add(zone)
+
+    def pop_changed(self):
+        changed, self.changed = self.changed, set()
+        return changed
+
+    def zone_world(self, zone):
+        """world_state entry for one zone (same shape fusion always produced)."""
+        zstats = self.stats.get(zone, {})
+        out = {}
+        for metric in ('water', 'garbage'):
+            ws = zstats.get(metric)
+            out[f'avg_{metric}'] = round(ws.mean, 2) if ws is not None and ws.count else None
+        return out
+
+    def zone_stats(self, zone):
+        return {m: ws.snapshot() for m, ws in self.stats.get(zone, {}).items()}
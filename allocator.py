@@ -0,0 +1,276 @@
+# allocator.py
+import time, hashlib
+import numpy as np
+
+# --- Fleet and geometry ---
+GRID_KM = 20.0
+
+def zone_position(zone):
+    """Stable pseudo-coordinates (km) for a zone name; demo stand-in for a real zone map."""
+    h = hashlib.blake2b(str(zone).encode(), digest_size=8).digest()
+    return (int.from_bytes(h[:4], 'little') / 2**32 * GRID_KM,
+            int.from_bytes(h[4:], 'little') / 2**32 * GRID_KM)
+
+def default_fleet(trucks=10, crews=5, seed=0):
+    """Demo fleet: resources spread over the grid, trucks with 1-2 units of capacity."""
+    rng = np.random.default_rng(seed)
+    fleet = []
+    for kind, n in (('truck', trucks), ('crew', crews)):
+        for i in range(n):
+            x, y = rng.uniform(0, GRID_KM, 2)
+            fleet.append({'id': f"{kind}{i}", 'kind': kind, 'position': (round(x, 2), round(y, 2)),
+                          'capacity': float(rng.choice([1.0, 1.5, 2.0])) if kind == 'truck' else 1.0})
+    return fleet
+
+def demand(incident):
+    """Units needed per resource kind: incident['need'] if given, else by severity."""
+    if 'need' in incident:
+        need = incident['need']
+        return need if isinstance(need, dict) else {'truck': need}
+    sev = incident.get('severity', 1)
+    return {'truck': sev, 'crew': 1 if sev >= 3 else 0}
+
+# --- Result ---
+class Allocation:
+    """
+    One global assignment of resources to incident zones.
+    assignments: {resource_id: zone}; by_zone: {zone: {kind: [resource ids]}}.
+    objective: total value (severity-weighted service minus travel cost); optimal is False
+    when the time budget cut the solve short. Pass it back as warm= on the next solve.
+    """
+    __slots__ = ('assignments', 'by_zone', 'objective', 'optimal', 'iterations', 'solve_s',
+                 'incidents', 'resources', '_slots', '_prices')
+
+    def __init__(self, incidents, resources):
+        self.incidents = incidents
+        self.resources = resources
+        self.assignments = {}
+        self.by_zone = {}
+        self.objective = 0.0
+        self.optimal = True
+        self.iterations = 0
+        self.solve_s = 0.0
+        self._slots = {}     # resource id -> (zone, kind, unit index)
+        self._prices = {}    # (zone, kind, unit index) -> auction price
+
+    def count(self, zone, kind='truck'):
+        return len(self.by_zone.get(zone, {}).get(kind, ()))
+
+    def to_dict(self):
+        return {'assignments': dict(self.assignments), 'objective': round(self.objective, 3),
+                'optimal': self.optimal, 'iterations': self.iterations}
+
+    def __eq__(self, other):
+        if not isinstance(other, Allocation):
+            return NotImplemented
+        return self.assignments == other.assignments and self.incidents == other.incidents
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (f"Allocation(assigned={len(self.assignments)}, zones={len(self.by_zone)}, "
+                f"objective={self.objective:.1f}, optimal={self.optimal})")
+
+# --- Auction solver ---
+def _auction(V, prices, assign, eps, deadline):
+    """
+    Jacobi forward auction on benefit matrix V (persons x objects), in place on prices /
+    assign (object index, -1 = bidding, -2 = idle at value 0). Returns (iterations, finished).
+    """
+    R, S = V.shape
+    owner = np.full(S, -1, dtype=np.int64)
+    held = assign >= 0
+    owner[assign[held]] = np.nonzero(held)[0]
+    it = 0
+    rows = np.arange(R)
+    while True:
+        bidders = rows[assign == -1]
+        if not len(bidders):
+            return it, True
+        if time.perf_counter() > deadline:
+            return it, False
+        it += 1
+        net = V[bidders] - prices
+        j1 = net.argmax(axis=1)
+        idx = np.arange(len(bidders))
+        w1 = net[idx, j1]
+        net[idx, j1] = -np.inf
+        w2 = np.maximum(net.max(axis=1), 0.0)
+        idle = w1 <= 0.0
+        assign[bidders[idle]] = -2
+        bidders, j1, bid = bidders[~idle], j1[~idle], prices[j1[~idle]] + w1[~idle] - w2[~idle] + eps
+        if not len(bidders):
+            continue
+        # highest bid per object wins
+        order = np.lexsort((bid, j1))
+        last = np.r_[j1[order][1:] != j1[order][:-1], True]
+        win = order[last]
+        objs = j1[win]
+        losers = owner[objs]
+        assign[losers[losers >= 0]] = -1
+        owner[objs] = bidders[win]
+        assign[bidders[win]] = objs
+        prices[objs] = bid[win]
+
+def _profits(V, prices, assign):
+    held = assign >= 0
+    out = np.zeros(len(assign))
+    out[held] = V[np.nonzero(held)[0], assign[held]] - prices[assign[held]]
+    return out
+
+def _cs_violations(V, prices, assign, eps):
+    """Persons whose current choice is worse than eps below their best option."""
+    best = np.maximum((V - prices).max(axis=1), 0.0)
+    return (assign == -1) | (_profits(V, prices, assign) < best - eps - 1e-12)
+
+def _reverse(V, prices, assign, eps, deadline):
+    """
+    Reverse auction for objects left unassigned at a positive price: each one lowers its
+    price just enough to take the person who gains most from switching, or drops to 0
+    (the idle price) if nobody would gain eps. Every taken person's profit rises by at
+    least eps, so this ends; afterwards no unassigned object is priced above idle, which
+    makes the forward result optimal when not every object gets a person.
+    """
+    R, S = V.shape
+    profit = _profits(V, prices, assign)
+    owner = np.full(S, -1, dtype=np.int64)
+    held = assign >= 0
+    owner[assign[held]] = np.nonzero(held)[0]
+    stale = list(np.nonzero((owner < 0) & (prices > 0))[0])
+    it = 0
+    while stale:
+        if time.perf_counter() > deadline:
+            return it, False
+        it += 1
+        j = stale.pop()
+        beta = V[:, j] - profit
+        i = int(beta.argmax())
+        if beta[i] < eps:
+            prices[j] = 0.0
+            continue
+        beta[i] = -np.inf
+        prices[j] = max(float(beta.max()) - eps if R > 1 else 0.0, 0.0)
+        old = assign[i]
+        if old >= 0:
+            owner[old] = -1
+            if prices[old] > 0:
+                stale.append(old)
+        assign[i], owner[j] = j, i
+        profit[i] = V[i, j] - prices[j]
+    return it, True
+
+def _complete(V, assign):
+    """After a timeout: give each still-bidding person its best free object (or idle)."""
+    taken = np.zeros(V.shape[1], dtype=bool)
+    taken[assign[assign >= 0]] = True
+    for i in np.nonzero(assign == -1)[0]:
+        row = np.where(taken, -np.inf, V[i])
+        j = int(row.argmax())
+        if row[j] > 0:
+            assign[i], taken[j] = j, True
+        else:
+            assign[i] = -2
+
+def solve(V, prices=None, assign=None, time_budget=0.05, rel_eps=1e-6):
+    """
+    Max-benefit assignment of persons (rows) to objects (columns), each person free to stay
+    idle at value 0. eps-scaling auction, each phase a forward pass (persons bid) and a
+    reverse pass (unwanted objects drop their price); the result is within R * eps of
+    optimal (eps = rel_eps * max|V|); if the time budget runs out, persons still bidding
+    are placed greedily (finished=False). Assignments that
+    still satisfy eps-CS carry over between phases.
+    prices / assign: warm start from a previous solve (starts at a small eps).
+    Returns (assign, prices, iterations, finished).
+    """
+    R, S = V.shape
+    deadline = time.perf_counter() + time_budget
+    if not R or not S:
+        return np.full(R, -2, dtype=np.int64), np.zeros(S), 0, True
+    scale = float(np.abs(V).max()) or 1.0
+    eps_min = rel_eps * scale
+    if prices is None:
+        prices, eps = np.zeros(S), scale / 4
+        assign = np.full(R, -1, dtype=np.int64)
+    else:
+        prices, eps = prices.copy(), max(scale * 1e-3, eps_min)
+        assign = assign.copy()
+    iterations = 0
+    while True:
+        assign[_cs_violations(V, prices, assign, eps)] = -1
+        it, finished = _auction(V, prices, assign, eps, deadline)
+        iterations += it
+        if finished:
+            it, finished = _reverse(V, prices, assign, eps, deadline)
+            iterations += it
+        if not finished:
+            _complete(V, assign)
+        if not finished or eps <= eps_min:
+            return assign, prices, iterations, finished
+        eps = max(eps / 8, eps_min)
+
+# --- Allocation problem ---
+class Allocator:
+    """
+    Assigns trucks and crews to the units every incident needs, maximising
+    sum(unit_value * severity_weight * capacity * decay**k) - cost_per_km * travel distance,
+    where k is the unit index within the zone (the first truck matters most). One auction
+    per resource kind; pass the previous Allocation as warm= so small changes re-solve
+    from the old prices.
+    """
+    def __init__(self, severity_weights=None, unit_value=100.0, decay=0.7, cost_per_km=2.0,
+                 time_budget=0.05):
+        self.severity_weights = severity_weights or {1: 1.0, 2: 2.0, 3: 4.0, 4: 8.0}
+        self.unit_value = unit_value
+        self.decay = decay
+        self.cost_per_km = cost_per_km
+        self.time_budget = time_budget
+
+    def values(self, incidents, resources, kind, positions=None):
+        """(slot keys, resource list, benefit matrix resources x slots) for one kind."""
+        positions = positions or {}
+        slots, weight, zpos = [], [], []
+        for inc in incidents:
+            zone = inc['zone']
+            w = self.severity_weights.get(inc.get('severity', 1), float(inc.get('severity', 1)))
+            p = positions.get(zone) or inc.get('position') or zone_position(zone)
+            for k in range(int(demand(inc).get(kind, 0))):
+                slots.append((zone, kind, k))
+                weight.append(w * self.decay ** k)
+                zpos.append(p)
+        res = [r for r in resources if r.get('kind', 'truck') == kind]
+        if not slots or not res:
+            return slots, res, np.zeros((len(res), len(slots)))
+        rpos = np.array([r['position'] for r in res], dtype=np.float64)
+        cap = np.array([r.get('capacity', 1.0) for r in res], dtype=np.float64)
+        dist = np.sqrt(((rpos[:, None, :] - np.array(zpos)[None, :, :]) ** 2).sum(axis=2))
+        V = self.unit_value * cap[:, None] * np.array(weight)[None, :] - self.cost_per_km * dist
+        return slots, res, V
+
+    def allocate(self, incidents, resources, warm=None, positions=None, time_budget=None):
+        t0 = time.perf_counter()
+        budget = self.time_budget if time_budget is None else time_budget
+        out = Allocation(incidents, resources)
+        kinds = sorted({r.get('kind', 'truck') for r in resources})
+        for n, kind in enumerate(kinds):
+            slots, res, V = self.values(incidents, resources, kind, positions)
+            prices = assign = None
+            if warm is not None and slots and res:
+                col = {s: j for j, s in enumerate(slots)}
+                prices = np.array([warm._prices.get(s, 0.0) for s in slots])
+                assign = np.array([col.get(warm._slots.get(r['id']), -1) for r in res], dtype=np.int64)
+            left = budget - (time.perf_counter() - t0)
+            assign, prices, it, finished = solve(V, prices, assign, max(left, 0.0) / (len(kinds) - n))
+            out.iterations += it
+            out.optimal &= finished
+            for j, s in enumerate(slots):
+                out._prices[s] = float(prices[j])
+            for i in np.nonzero(assign >= 0)[0]:
+                r, s = res[i], slots[assign[i]]
+                out.assignments[r['id']] = s[0]
+                out._slots[r['id']] = s
+                out.by_zone.setdefault(s[0], {}).setdefault(kind, []).append(r['id'])
+                out.objective += float(V[i, assign[i]])
+        out.solve_s = time.perf_counter() - t0
+        return out
+
+DEFAULT_ALLOCATOR = Allocator()
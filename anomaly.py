@@ -0,0 +1,170 @@
+# anomaly.py
+import numpy as np
+
+ABS_DEV_SCALE = 1.2533  # mean absolute deviation -> std for normal data (sqrt(pi/2))
+
+def group_order(codes, n_codes):
+    """Stable argsort of integer codes in [0, n_codes): radix sort when they fit in 16 bits."""
+    if n_codes <= 1 << 16:
+        codes = codes.astype(np.uint16)
+    return np.argsort(codes, kind='stable')
+
+class StreamingDetector:
+    """
+    Stateful per-sensor anomaly detector. Rolling statistics live in NumPy arrays
+    indexed by sensor (ids are mapped to rows on first sight):
+      - EWMA level and EWMA absolute deviation (a streaming, MAD-like robust scale)
+      - last value, for rate-of-change between consecutive readings
+    A reading's robust z-score is |x - level| / scale and its rate-of-change score is
+    |x - last| / scale (only flagged when the reading is also off-baseline); scale has an absolute and a relative floor so sensors that sit
+    near zero don't blow up. Updates are clipped (Huber-style) so a spike doesn't drag
+    the baseline with it. No flags are raised until a sensor has `warmup` readings.
+    """
+    def __init__(self, capacity=1024, alpha=0.05, z_threshold=6.0, roc_threshold=8.0,
+                 warmup=5, abs_floor=1e-3, rel_floor=0.01, clip=3.0):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.roc_threshold = roc_threshold
+        self.warmup = warmup
+        self.abs_floor = abs_floor
+        self.rel_floor = rel_floor
+        self.clip = clip
+        self.index = {}     # sensor_id -> row
+        self.ids = []       # row -> sensor_id
+        self.active = {}    # sensor_id -> last flag, until the sensor reads normal again
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        self.level = np.zeros(capacity)
+        self.dev = np.zeros(capacity)
+        self.last = np.zeros(capacity)
+        self.count = np.zeros(capacity, dtype=np.int64)
+
+    def _grow(self, need):
+        cap = len(self.level)
+        if need <= cap:
+            return
+        new_cap = max(need, cap * 2)
+        for name in ('level', 'dev', 'last', 'count'):
+            old = getattr(self, name)
+            arr = np.zeros(new_cap, dtype=old.dtype)
+            arr[:cap] = old
+            setattr(self, name, arr)
+
+    def rows(self, sensor_ids):
+        """Map sensor ids to array rows, registering unseen sensors."""
+        index = self.index
+        out = np.empty(len(sensor_ids), dtype=np.int64)
+        for i, sid in enumerate(sensor_ids):
+            r = index.get(sid)
+            if r is None:
+                r = index[sid] = len(self.ids)
+                self.ids.append(sid)
+            out[i] = r
+        self._grow(len(self.ids))
+        return out
+
+    def score_rows(self, rows, values):
+        """
+        Score a batch of readings (rows from rows(), float values) and fold them into the state.
+        Readings are processed in arrival order per sensor; each sensor's k-th reading in the
+        batch is handled in vectorized round k.
+        Returns (z, roc, flagged) arrays aligned with the input.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        n = len(rows)
+        z = np.zeros(n)
+        roc = np.zeros(n)
+        if n == 0:
+            return z, roc, np.zeros(0, dtype=bool)
+        # occurrence rank of each reading within its sensor
+        order = group_order(rows, len(self.ids))
+        srows = rows[order]
+        starts = np.r_[0, np.flatnonzero(np.diff(srows)) + 1]
+        group_start = np.repeat(starts, np.diff(np.r_[starts, n]))
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.arange(n) - group_start
+        max_rank = int(rank.max())
+        if max_rank == 0:
+            self._round(rows, values, z, roc, slice(None))
+        else:
+            # readings ordered by rank: round k is one contiguous slice
+            by_rank = group_order(rank, max_rank + 1)
+            bounds = np.searchsorted(rank[by_rank], np.arange(max_rank + 2))
+            for k in range(max_rank + 1):
+                sel = by_rank[bounds[k]:bounds[k + 1]]
+                self._round(rows[sel], values[sel], z, roc, sel)
+        # a big jump only counts while the reading is also away from the baseline,
+        # so returning to normal after a spike isn't flagged again
+        flagged = (z > self.z_threshold) | ((roc > self.roc_threshold) & (z > 0.5 * self.z_threshold))
+        return z, roc, flagged
+
+    def _round(self, r, x, z_out, roc_out, sel):
+        cnt = self.count[r]
+        level, dev, last = self.level[r], self.dev[r], self.last[r]
+        first = cnt == 0
+        scale = ABS_DEV_SCALE * dev + self.abs_floor + self.rel_floor * np.abs(level)
+        resid = x - level
+        warm = cnt >= self.warmup
+        z_out[sel] = np.where(warm, np.abs(resid) / scale, 0.0)
+        roc_out[sel] = np.where(warm, np.abs(x - last) / scale, 0.0)
+        # clipped update so outliers don't move the baseline much (unclipped while warming up)
+        c = np.where(warm, np.clip(resid, -self.clip * scale, self.clip * scale), resid)
+        a = np.where(cnt < self.warmup, 1.0 / (cnt + 1), self.alpha)
+        new_level = np.where(first, x, level + a * c)
+        new_dev = np.where(first, 0.0, (1 - a) * dev + a * np.abs(c))
+        self.level[r] = new_level
+        self.dev[r] = new_dev
+        self.last[r] = x
+        self.count[r] = cnt + 1
+
+    def detect(self, events):
+        """
+        events: list of dicts with sensor_id, value -> list of flags
+        {'sensor_id', 'reason', 'score'} for readings that look adversarial.
+        Also updates self.active (sensors currently considered suspicious).
+        """
+        evs = [e for e in events if isinstance(e.get('value'), (int, float))]
+        if not evs:
+            return []
+        sids = [e.get('sensor_id') for e in evs]
+        z, roc, flagged = self.score_rows(self.rows(sids), [e['value'] for e in evs])
+        flags = []
+        for i in range(len(evs)):
+            sid = sids[i]
+            if flagged[i]:
+                reason = 'sudden_spike' if roc[i] > self.roc_threshold else 'outlier'
+                f = {'sensor_id': sid, 'reason': reason, 'score': round(float(max(z[i], roc[i])), 2)}
+                flags.append(f)
+                self.active[sid] = f
+            else:
+                self.active.pop(sid, None)
+        return flags
+
+    def detect_coded(self, codes, sensor_ids, values):
+        """
+        detect() for columnar input: codes index into sensor_ids (e.g. pd.factorize output),
+        values is a float array. Only flagged readings become dicts; each sensor's place in
+        self.active follows its last reading, as it does in detect().
+        """
+        n = len(codes)
+        if not n:
+            return []
+        z, roc, flagged = self.score_rows(self.rows(sensor_ids)[codes], values)
+        flags = {}
+        for i in np.flatnonzero(flagged).tolist():
+            reason = 'sudden_spike' if roc[i] > self.roc_threshold else 'outlier'
+            flags[i] = {'sensor_id': sensor_ids[codes[i]], 'reason': reason, 'score': round(float(max(z[i], roc[i])), 2)}
+        order = group_order(codes, len(sensor_ids))
+        ends = np.r_[np.flatnonzero(np.diff(codes[order])), n - 1]
+        for i in order[ends].tolist():
+            sid = sensor_ids[codes[i]]
+            if i in flags:
+                self.active[sid] = flags[i]
+            else:
+                self.active.pop(sid, None)
+        return list(flags.values())
+
+    def quarantined(self):
+        return list(self.active.values())
@@ -0,0 +1,75 @@
+# benchmarks/bench_events.py
+"""
+Fixed-cadence ticks vs the event-driven scheduler on a live feed: readings for a new
+zone arrive at random intervals over TCP; we time each one from send until it shows up
+in world_state, and count how many node runs each mode spends.
+Usage: python benchmarks/bench_events.py [--readings 20] [--gap-ms 250] [--llm-latency 0.02]
+"""
+import os, sys, io, json, time, random, asyncio, argparse, contextlib, tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import graph
+from llm_wrapper import LLM
+from ingest import IngestServer
+
+async def feed(server, control, n, gap, latencies):
+    _, w = await asyncio.open_connection("127.0.0.1", server.tcp_port)
+    rng = random.Random(0)
+    for i in range(n):
+        await asyncio.sleep(rng.uniform(0.5, 1.5) * gap)
+        zone = f"zone{i}"
+        w.write((json.dumps({'sensor_id': f"ws_{i}", 'sensor_type': 'water_level',
+                             'location': zone, 'value': 2.0}) + "\n").encode())
+        await w.drain()
+        t0 = time.perf_counter()
+        while zone not in (control.state.get('world_state') or {}):
+            await asyncio.sleep(0.001)
+        latencies.append(time.perf_counter() - t0)
+    w.close()
+
+async def run_mode(mode, args, ledger):
+    server = await IngestServer().start()
+    control, latencies = graph.RunControl(), []
+    llm = LLM(provider='stub', latency=args.llm_latency)
+    kw = dict(llm=llm, ingest=server, control=control, ledger_path=ledger, scheduler=mode)
+    if mode == "events":
+        kw.update(iterations=None, max_latency=args.max_latency, min_interval=args.min_interval)
+    else:
+        kw.update(iterations=10**9, tick_interval=args.tick_interval)
+    with contextlib.redirect_stdout(io.StringIO()):
+        run = asyncio.ensure_future(graph.run_graph(**kw))
+        while control.state is None:
+            await asyncio.sleep(0.001)
+        t0 = time.perf_counter()
+        await feed(server, control, args.readings, args.gap_ms / 1e3, latencies)
+        elapsed = time.perf_counter() - t0
+        if mode == "events":
+            control.stop()
+            await run
+        else:
+            run.cancel()
+            await asyncio.gather(run, return_exceptions=True)
+    await server.close()
+    node_runs = sum(h.count for h in control.metrics.histograms['agent_seconds'].values())
+    lat = np.array(latencies) * 1e3
+    print(f"{mode:10s} latency p50 {np.percentile(lat, 50):6.1f} ms  p95 {np.percentile(lat, 95):6.1f} ms  "
+          f"max {lat.max():6.1f} ms   node runs {node_runs:5d} ({node_runs / elapsed:.0f}/s)")
+
+async def main_async(args):
+    with tempfile.TemporaryDirectory() as d:
+        await run_mode("sequential", args, os.path.join(d, "seq.jsonl"))
+        await run_mode("events", args, os.path.join(d, "events.jsonl"))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--readings", type=int, default=20)
+    ap.add_argument("--gap-ms", type=float, default=250.0, help="mean gap between readings")
+    ap.add_argument("--llm-latency", type=float, default=0.02)
+    ap.add_argument("--tick-interval", type=float, default=0.3)
+    ap.add_argument("--max-latency", type=float, default=1.0)
+    ap.add_argument("--min-interval", type=float, default=0.0)
+    asyncio.run(main_async(ap.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_learning.py
+"""
+Learning agent cost as history grows: the old agent rescanned the whole audit_log every
+tick; the new one folds only entries appended since its last run into PlanStats.
+Also times bootstrapping PlanStats from a ledger file: a full streaming pass, and a
+restart from the persisted snapshot after more entries were appended.
+Usage: python benchmarks/bench_learning.py [--history 100000] [--per-tick 10] [--ticks 20]
+Writes into a temp directory, never touches data/ledger.jsonl.
+"""
+import os, sys, json, time, random, asyncio, tempfile, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ledger import LedgerWriter
+from plan_stats import PlanStats
+from state_store import StateStore
+from agents import learning
+
+def legacy_run(state):
+    """Old agents/learning.run: one pass over the full audit_log per tick (random 'impact')."""
+    log = state.get('audit_log', [])
+    if len(log) < 2:
+        return state
+    impacts = []
+    for entry in log:
+        impacts.append(random.random() * 50)
+    state.setdefault('learning_notes', []).append({'avg_impact_est': sum(impacts) / len(impacts)})
+    return state
+
+def card(rng):
+    name = rng.choice(['alert_and_dispatch', 'monitor_only', 'dispatch_pumps'])
+    ok = rng.random() < {'alert_and_dispatch': 0.9, 'monitor_only': 0.99, 'dispatch_pumps': 0.5}[name]
+    return {'plan_id': name[:1], 'plan_name': name, 'zone': f"zone{rng.randrange(100)}",
+            'impact_pct': rng.choice([5, 40, 50]), 'cost': rng.choice([10, 100]), 'confidence': 0.8,
+            'execution': [{'step': {}, 'result': {'ok': ok}}]}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--history", type=int, default=100_000)
+    ap.add_argument("--per-tick", type=int, default=10)
+    ap.add_argument("--ticks", type=int, default=20)
+    args = ap.parse_args()
+
+    rng = random.Random(0)
+    history = [{'entry': card(rng), 'hash': str(i)} for i in range(args.history)]
+    ticks = [[{'entry': card(rng), 'hash': f"t{t}.{i}"} for i in range(args.per_tick)] for t in range(args.ticks)]
+
+    def per_tick(run):
+        state = StateStore({'audit_log': list(history)}, limits={'audit_log': 10 ** 9})
+        run(state)
+        t0 = time.perf_counter()
+        for new in ticks:
+            state['audit_log'].extend(new)
+            run(state)
+        return (time.perf_counter() - t0) / args.ticks, state
+
+    old, _ = per_tick(legacy_run)
+    loop = asyncio.new_event_loop()
+    new, state = per_tick(lambda s: loop.run_until_complete(learning.run(s, None, None)))
+    loop.close()
+    print(f"{args.history:,} past entries, {args.per_tick} new/tick: learning agent "
+          f"{old * 1e3:.2f} ms/tick (rescan) -> {new * 1e3:.3f} ms/tick (incremental)")
+    print(f"weights: {state['plan_weights']}")
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "ledger.jsonl")
+        with LedgerWriter(path) as w:
+            w.write_lines([json.dumps(w.make_payload(h['entry'])) + "\n" for h in history])
+        t0 = time.perf_counter()
+        stats = PlanStats().bootstrap(path)
+        t = time.perf_counter() - t0
+        print(f"bootstrap from a {os.path.getsize(path) / 2**20:.0f} MB ledger: {t * 1e3:.0f} ms "
+              f"({stats.entries / t:,.0f} entries/s)")
+        with LedgerWriter(path) as w:
+            w.write_lines([json.dumps(w.make_payload(card(rng))) + "\n" for _ in range(args.per_tick * args.ticks)])
+        t0 = time.perf_counter()
+        warm = PlanStats().bootstrap(path)
+        t = time.perf_counter() - t0
+        assert warm == PlanStats().bootstrap(path, persist=False)
+        print(f"restart from the snapshot + {args.per_tick * args.ticks} new entries: {t * 1e3:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_ledger.py
+"""
+Append latency vs ledger size.
+Usage: python benchmarks/bench_ledger.py [--max 1000000] [--sample 1000] [--legacy]
+Writes into a temp directory, never touches data/ledger.jsonl.
+"""
+import os, sys, json, time, tempfile, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ledger import LedgerWriter, chain_hash
+
+ENTRY = {'plan_id': 'p1', 'plan_name': 'alert_and_dispatch', 'rationale': ['water > threshold'],
+         'explain_card': 'bench', 'execution': []}
+
+def legacy_append(path, entry):
+    """Old tools.append_ledger behaviour (readlines on every call), for comparison."""
+    payload = {'ts': time.time(), 'entry': entry}
+    prev = ""
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            lines = f.readlines()
+            if lines:
+                prev = json.loads(lines[-1]).get("hash", "")
+    payload['prev'] = prev
+    payload['hash'] = chain_hash(payload)
+    with open(path, "a") as f:
+        f.write(json.dumps(payload)+"\n")
+
+def checkpoints(max_n):
+    n, out = 1000, []
+    while n <= max_n:
+        out.append(n)
+        n *= 10
+    return out
+
+def bench(append, max_n, sample):
+    """Grow the ledger to each checkpoint, then time `sample` appends there."""
+    results, size = [], 0
+    for cp in checkpoints(max_n):
+        while size < cp:
+            append(ENTRY)
+            size += 1
+        t0 = time.perf_counter()
+        for _ in range(sample):
+            append(ENTRY)
+        dt = time.perf_counter() - t0
+        size += sample
+        results.append({'entries': cp, 'us_per_append': round(dt / sample * 1e6, 2)})
+        print(f"  {cp:>9} entries: {results[-1]['us_per_append']:>9.2f} us/append")
+    return results
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max", type=int, default=1_000_000)
+    ap.add_argument("--sample", type=int, default=1000)
+    ap.add_argument("--legacy", action="store_true", help="also run the readlines() baseline (capped at 10k)")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        print("LedgerWriter.append")
+        path = os.path.join(d, "ledger.jsonl")
+        with LedgerWriter(path) as w:
+            bench(w.append, args.max, args.sample)
+        # restart recovery cost on the full ledger
+        t0 = time.perf_counter()
+        LedgerWriter(path).close()
+        print(f"  head recovery on restart: {(time.perf_counter()-t0)*1e3:.3f} ms")
+        if args.legacy:
+            print("legacy append_ledger (readlines)")
+            lpath = os.path.join(d, "legacy.jsonl")
+            bench(lambda e: legacy_append(lpath, e), min(args.max, 10_000), min(args.sample, 200))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/bench_ledger_index.py
+"""
+Reading the ledger back: a full linear JSON parse per audit/lookup vs LedgerReader's
+persistent offset index (cold build, warm open, incremental refresh), indexed lookups by
+plan_id / zone / time range, random access via mmap, and chain verification by chunk.
+Usage: python benchmarks/bench_ledger_index.py [--entries 200000] [--segment-mb 32] [--workers N]
+Writes into a temp directory, never touches data/ledger.jsonl.
+"""
+import os, sys, json, time, random, tempfile, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ledger import LedgerWriter, chain_hash, segment_paths
+from ledger_index import LedgerReader
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+def linear_verify(path):
+    prev, n = '', 0
+    for seg in segment_paths(path):
+        with open(seg) as f:
+            for line in f:
+                p = json.loads(line)
+                h = p.pop('hash')
+                assert chain_hash(p) == h and p['prev'] == prev
+                prev, n = h, n + 1
+    return n
+
+def linear_find(path, **where):
+    out = []
+    for seg in segment_paths(path):
+        with open(seg) as f:
+            for line in f:
+                p = json.loads(line)
+                if all(p['entry'].get(k) == v for k, v in where.items()):
+                    out.append(p)
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entries", type=int, default=200_000)
+    ap.add_argument("--segment-mb", type=float, default=32)
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    args = ap.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "ledger.jsonl")
+        with LedgerWriter(path, max_segment_bytes=int(args.segment_mb * 2**20)) as w:
+            lines = []
+            for i in range(args.entries):
+                card = {'plan_id': f"p{i // 3}", 'plan_name': rng.choice(['alert_and_dispatch', 'monitor_only']),
+                        'zone': f"zone{rng.randrange(1000)}", 'rationale': ["water > threshold"],
+                        'explain_card': "x" * 200, 'execution': []}
+                lines.append(json.dumps(w.make_payload(card, now=1.7e9 + i)) + "\n")
+                if len(lines) == 1000:
+                    w.write_lines(lines)
+                    lines = []
+            w.write_lines(lines)
+        size = sum(os.path.getsize(p) for p in segment_paths(path))
+        print(f"{args.entries:,} entries, {size / 2**20:.0f} MB in {len(segment_paths(path))} segments, "
+              f"{args.workers} worker(s)")
+
+        t, _ = timed(lambda: linear_verify(path))
+        print(f"  linear parse + verify:        {t * 1e3:9.1f} ms")
+        t, r = timed(lambda: LedgerReader(path, workers=args.workers))
+        print(f"  index build (cold):           {t * 1e3:9.1f} ms")
+        r.close()
+        t, r = timed(lambda: LedgerReader(path, workers=args.workers))
+        print(f"  open with persisted index:    {t * 1e3:9.1f} ms")
+        with LedgerWriter(path) as w:
+            for i in range(1000):
+                w.append({'plan_id': f"new{i}", 'zone': "zone1"})
+        t, n = timed(r.refresh)
+        print(f"  refresh after 1000 appends:   {t * 1e3:9.1f} ms ({n:,} entries)")
+        for workers in sorted({1, args.workers}):
+            t, v = timed(lambda: r.verify(workers=workers))
+            print(f"  verify, {workers} worker(s):          {t * 1e3:9.1f} ms ({v['chunks']} chunks, ok={v['ok']})")
+
+        t_lin, hits = timed(lambda: linear_find(path, zone="zone42"))
+        t_idx, found = timed(lambda: r.find(zone="zone42"))
+        print(f"  zone lookup: linear {t_lin * 1e3:.1f} ms -> index {t_idx * 1e3:.2f} ms "
+              f"(first query builds postings; {len(found)} hits, same: {found == hits})")
+        t, found = timed(lambda: r.find(plan_id="p4242"))
+        t2, found = timed(lambda: r.find(plan_id="p31337"))
+        print(f"  plan_id lookup:               {t * 1e3:9.3f} ms first, {t2 * 1e3:.3f} ms after ({len(found)} hits)")
+        t, rows = timed(lambda: r.rows(since=1.7e9 + 50_000, until=1.7e9 + 50_999))
+        print(f"  1000-entry time range:        {t * 1e3:9.3f} ms ({len(rows)} rows)")
+        picks = [rng.randrange(len(r)) for _ in range(1000)]
+        t, _ = timed(lambda: [r[i] for i in picks])
+        print(f"  random access:                {t * 1e6 / len(picks):9.1f} us/entry")
+        r.close()
+
+if __name__ == "__main__":
+    main()
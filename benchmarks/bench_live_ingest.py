@@ -0,0 +1,113 @@
+# benchmarks/bench_live_ingest.py
+"""
+Live ingestion: a local load generator streams sensor readings to an IngestServer over
+TCP (newline-delimited JSON) or UDP (binary frames) while perception + fusion run in a
+loop draining the queue. Reports accepted events/s, drop/malformed counters and
+ingest -> world_state latency (receive time to the end of the fusion pass that folded it in).
+Usage: python benchmarks/bench_live_ingest.py [--events 200000] [--proto tcp|udp] [--maxsize 50000]
+"""
+import os, sys, time, json, asyncio, argparse, socket
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ingest import IngestServer, encode_frame
+from state_store import StateStore
+from agents import perception, fusion
+
+def reading(i, zones):
+    z = i % zones
+    if z % 2 == 0:
+        return (f"ws_{z}", 'water_level', f"zone{z}", (i % 40) / 10)
+    return (f"gs_{z}", 'garbage_level', f"zone{z}", 30 + i % 70)
+
+async def tcp_load(port, n, conns, lines_per_write, zones):
+    per = n // conns
+    async def one(c):
+        _, w = await asyncio.open_connection("127.0.0.1", port)
+        buf = []
+        for i in range(c * per, (c + 1) * per):
+            sid, st, loc, v = reading(i, zones)
+            buf.append(json.dumps({'timestamp': i, 'sensor_id': sid, 'sensor_type': st,
+                                   'location': loc, 'value': v}))
+            if len(buf) == lines_per_write:
+                w.write(("\n".join(buf) + "\n").encode())
+                buf = []
+                await w.drain()     # respects backpressure from the server
+        if buf:
+            w.write(("\n".join(buf) + "\n").encode())
+        await w.drain()
+        w.close()
+        await w.wait_closed()
+    await asyncio.gather(*(one(c) for c in range(conns)))
+    return per * conns
+
+async def udp_load(port, n, frames_per_dgram, zones):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    sent = 0
+    for start in range(0, n, frames_per_dgram):
+        sock.sendto(b"".join(encode_frame(*reading(i, zones), ts=i)
+                             for i in range(start, min(n, start + frames_per_dgram))),
+                    ("127.0.0.1", port))
+        sent = min(n, start + frames_per_dgram)
+        await asyncio.sleep(0)       # let the server read the socket before its buffer fills
+    sock.close()
+    return sent
+
+async def pipeline(server, done, latencies, period):
+    state = StateStore({'perception_events': []}, limits={'perception_events': 10_000, 'provenance': 10_000})
+    tools = {'ingest': server}
+    while not (done.is_set() and server.pending() == 0):
+        await perception.run(state, tools, None, {})
+        batch = state['ingest_stats']
+        await fusion.run(state, tools, None, {})
+        if batch['oldest_recv'] is not None:
+            now = time.perf_counter()
+            latencies.append(now - batch['oldest_recv'])
+            latencies.append(now - batch['newest_recv'])
+        await asyncio.sleep(period)
+    return state
+
+async def main_async(args):
+    server = IngestServer(tcp_port=0 if args.proto == 'tcp' else None,
+                          udp_port=0 if args.proto == 'udp' else None,
+                          maxsize=args.maxsize, overflow=args.overflow)
+    async with server:
+        done, latencies = asyncio.Event(), []
+        pipe = asyncio.create_task(pipeline(server, done, latencies, args.tick / 1e3))
+        t0 = time.perf_counter()
+        if args.proto == 'tcp':
+            sent = await tcp_load(server.tcp_port, args.events, args.conns, args.batch, args.zones)
+            # wait for the server to read what's still in the socket buffers
+            while server.stats['received'] < sent and time.perf_counter() - t0 < 60:
+                await asyncio.sleep(0.01)
+        else:
+            sent = await udp_load(server.udp_port, args.events, args.batch, args.zones)
+            await asyncio.sleep(0.2)
+        done.set()
+        state = await pipe
+        dt = time.perf_counter() - t0
+    s = server.stats
+    print(f"{args.proto}: sent {sent:,}  received {s['received']:,}  accepted {s['accepted']:,}  "
+          f"dropped {s['dropped']:,}  malformed {s['malformed']:,}  in {dt:.2f}s")
+    print(f"throughput: {s['drained'] / dt:,.0f} events/s into perception_events "
+          f"({len(state['perception_events']):,} total, {len(state['world_state'])} zones in world_state)")
+    if latencies:
+        lat = np.array(latencies) * 1e3
+        print(f"ingest -> world_state latency: p50 {np.percentile(lat, 50):.1f} ms  "
+              f"p99 {np.percentile(lat, 99):.1f} ms  max {lat.max():.1f} ms")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=200_000)
+    ap.add_argument("--proto", choices=('tcp', 'udp'), default='tcp')
+    ap.add_argument("--conns", type=int, default=4, help="TCP connections")
+    ap.add_argument("--batch", type=int, default=100, help="lines per write / frames per datagram")
+    ap.add_argument("--zones", type=int, default=50)
+    ap.add_argument("--maxsize", type=int, default=50_000)
+    ap.add_argument("--overflow", default='block', choices=('block', 'drop_newest', 'drop_oldest'))
+    ap.add_argument("--tick", type=float, default=20.0, help="pipeline period (ms)")
+    asyncio.run(main_async(ap.parse_args()))
+
+if __name__ == "__main__":
+    main()
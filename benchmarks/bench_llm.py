@@ -0,0 +1,56 @@
+# benchmarks/bench_llm.py
+"""
+Wall-clock per tick with a stub LLM (injected latency): blocking call() vs acall().
+K pipelines (e.g. cities) share one event loop; each tick runs perception..planner.
+Usage: python benchmarks/bench_llm.py [--pipelines 4] [--ticks 5] [--latency 0.05]
+"""
+import os, sys, time, asyncio, argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import tools
+from graph import load_nodes
+from llm_wrapper import LLM
+
+STAGES = ['perception', 'fusion', 'safety', 'assessor', 'coalition', 'planner']
+
+class BlockingLLM(LLM):
+    """acall() that blocks the loop like the old synchronous call path."""
+    async def acall(self, prompt, max_tokens=300, temperature=0.0, timeout=None):
+        return self.call(prompt, max_tokens, temperature)
+
+async def pipeline(llm, ticks):
+    state = {'perception_events': [], 'audit_log': []}
+    toolset = {
+        'csv_gen': tools.csv_stream(os.path.join(ROOT, "data/simulated_sensors.csv")),
+        'digital_twin_simulate': tools.digital_twin_simulate,
+        'detect_adversarial': tools.detect_adversarial,
+    }
+    funcs = [n.func for n in load_nodes() if n.agent in STAGES]
+    for _ in range(ticks):
+        for f in funcs:
+            state = await f(state, toolset, llm)
+    return state
+
+async def bench(llm, pipelines, ticks):
+    t0 = time.perf_counter()
+    await asyncio.gather(*(pipeline(llm, ticks) for _ in range(pipelines)))
+    return (time.perf_counter() - t0) / ticks
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pipelines", type=int, default=4)
+    ap.add_argument("--ticks", type=int, default=5)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--concurrency", type=int, default=16)
+    args = ap.parse_args()
+
+    import contextlib, io
+    for name, cls in (("blocking call()", BlockingLLM), ("acall()", LLM)):
+        llm = cls(provider="stub", latency=args.latency, max_concurrency=args.concurrency)
+        with contextlib.redirect_stdout(io.StringIO()):
+            per_tick = asyncio.run(bench(llm, args.pipelines, args.ticks))
+        print(f"{name:>16}: {per_tick*1e3:8.1f} ms/tick ({args.pipelines} pipelines, {args.latency*1e3:.0f} ms LLM latency)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# benchmarks/bench_pipeline.py
+"""
+End-to-end pipeline benchmark on a seeded synthetic workload (workload.Workload):
+every agent runs against a stub LLM with injected latency, one simulated minute of
+readings per tick (fed through an in-process IngestServer, so ingestion is not the
+bottleneck being measured). Reports readings/s and ticks/s, per-stage latency
+percentiles (agent_seconds), LLM wait, peak RSS and ledger growth, and how many of the
+injected incidents (and of the zones that only saw spoofed spikes) reached the ledger.
+Results are written as JSON; --compare checks them against an earlier run and exits 1
+on a regression beyond --tolerance.
+Usage: python benchmarks/bench_pipeline.py [--zones 20] [--sensors 4] [--minutes 60] [--seed 0]
+       [--latency 0.02] [--scheduler sequential|dag] [--out results.json] [--compare old.json]
+"""
+import os, sys, json, time, asyncio, argparse, resource, tempfile, platform, contextlib, io
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import graph
+from workload import generate
+from ingest import IngestServer
+from llm_wrapper import LLM
+from instrumentation import Metrics
+from ledger import segment_paths
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # KB on Linux
+
+def ledger_size(path):
+    n = size = 0
+    for seg in segment_paths(path):
+        size += os.path.getsize(seg)
+        with open(seg, 'rb') as f:
+            n += sum(1 for line in f if line.strip())
+    return n, size
+
+def stages(metrics, name):
+    """{agent: {count, mean, p50, p95, p99, max}} in ms for one histogram."""
+    out = {}
+    for k, h in metrics.histograms.get(name, {}).items():
+        snap = h.snapshot()
+        agent = dict(k).get('agent')
+        out[str(agent)] = {'count': snap['count'],
+                           **{q: round(snap[q] * 1e3, 3) for q in ('mean', 'p50', 'p95', 'p99', 'max')}}
+    return dict(sorted(out.items()))
+
+async def run(args, ledger_path):
+    w = generate(args.zones, args.sensors, args.minutes, args.seed,
+                 floods=args.floods, overflows=args.overflows, spikes=args.spikes)
+    server = IngestServer(tcp_port=None, maxsize=len(w) + 1)
+    for t in range(w.minutes):
+        server.offer(json.dumps(w.minute(t)).encode())
+    metrics = Metrics()
+    per_tick = args.zones * args.sensors
+    rss0 = peak_rss_mb()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        state = await graph.run_graph(
+            w.minutes, llm=LLM(provider='stub', latency=args.latency), scheduler=args.scheduler,
+            tick_interval=0, ingest=server, ledger_path=ledger_path, metrics=metrics,
+            config={'perception': {'max_batch': per_tick}})
+    wall = time.perf_counter() - t0
+    entries, size = ledger_size(ledger_path)
+    audited = {c.get('entry', c).get('zone') for c in state.get('audit_log', [])}
+    expected = w.incident_zones()
+    spiked = {e['zone'] for e in w.events if e['kind'] == 'spike'} - set(expected)
+    ticks = metrics.histograms['tick_seconds'][()].snapshot()
+    return {
+        'workload': {'zones': args.zones, 'sensors': args.sensors, 'minutes': args.minutes,
+                     'seed': args.seed, 'readings': len(w), 'events': w.events},
+        'config': {'latency': args.latency, 'scheduler': args.scheduler},
+        'env': {'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'wall_s': round(wall, 4),
+        'throughput': {'readings_per_s': round(server.stats['drained'] / wall, 1),
+                       'ticks_per_s': round(w.minutes / wall, 3)},
+        'tick_ms': {q: round(ticks[q] * 1e3, 3) for q in ('mean', 'p50', 'p95', 'p99', 'max')},
+        'stages_ms': stages(metrics, 'agent_seconds'),
+        'llm_wait_ms': stages(metrics, 'llm_wait_seconds'),
+        'agent_errors': metrics.summary().get('agent_errors_total', {}),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'rss_growth_mb': round(peak_rss_mb() - rss0, 1),
+        'ledger': {'entries': entries, 'bytes': size,
+                   'bytes_per_entry': round(size / entries, 1) if entries else None},
+        'incidents': {'injected': expected, 'audited': sorted(z for z in audited if z in expected),
+                      'recall': round(len(audited & set(expected)) / len(expected), 3) if expected else None,
+                      'spike_only_audited': sorted(audited & spiked)},
+    }
+
+# --- regression check ---
+CHECKS = [   # (path, higher is better)
+    (('throughput', 'readings_per_s'), True),
+    (('tick_ms', 'p95'), False),
+    (('peak_rss_mb',), False),
+    (('ledger', 'bytes_per_entry'), False),
+]
+
+def compare(new, old, tolerance, floor_ms=1.0):
+    """
+    Print old -> new for the headline numbers and per-stage p95; returns the regressions.
+    Stages under floor_ms in the old run are skipped (sub-millisecond timings are noise).
+    """
+    old_stages = old.get('stages_ms', {})
+    checks = CHECKS + [(('stages_ms', a, 'p95'), False) for a in new['stages_ms']
+                       if old_stages.get(a, {}).get('p95', 0) >= floor_ms]
+    bad = []
+    for path, higher in checks:
+        a, b = old, new
+        for k in path:
+            a, b = (a or {}).get(k), (b or {}).get(k)
+        if not a or b is None:
+            continue
+        change = (b - a) / a
+        worse = -change if higher else change
+        flag = ' REGRESSION' if worse > tolerance else ''
+        print(f"  {'.'.join(path):<32} {a:>12,.2f} -> {b:>12,.2f} ({change:+.1%}){flag}")
+        if flag:
+            bad.append('.'.join(path))
+    return bad
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--zones", type=int, default=20)
+    ap.add_argument("--sensors", type=int, default=4)
+    ap.add_argument("--minutes", type=int, default=60)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--floods", type=int, default=2)
+    ap.add_argument("--overflows", type=int, default=2)
+    ap.add_argument("--spikes", type=int, default=5)
+    ap.add_argument("--latency", type=float, default=0.02, help="stub LLM latency per call (s)")
+    ap.add_argument("--scheduler", default="sequential", choices=["sequential", "dag"])
+    ap.add_argument("--out", default=None, help="write results JSON here")
+    ap.add_argument("--compare", default=None, help="earlier results JSON to check against")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    ap.add_argument("--floor-ms", type=float, default=1.0, help="ignore stages faster than this")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        res = asyncio.run(run(args, os.path.join(d, "ledger.jsonl")))
+
+    print(f"{res['workload']['readings']:,} readings, {args.minutes} ticks in {res['wall_s']:.2f}s: "
+          f"{res['throughput']['readings_per_s']:,.0f} readings/s, {res['throughput']['ticks_per_s']:.2f} ticks/s "
+          f"(tick p50 {res['tick_ms']['p50']:.1f} ms, p95 {res['tick_ms']['p95']:.1f} ms)")
+    print(f"{'agent':<20}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for agent, s in res['stages_ms'].items():
+        print(f"{agent:<20}{s['count']:>7}{s['p50']:>10.2f}{s['p95']:>10.2f}{s['p99']:>10.2f}{s['max']:>10.2f}")
+    print(f"peak RSS {res['peak_rss_mb']:.0f} MB (+{res['rss_growth_mb']:.0f} MB during the run); "
+          f"ledger +{res['ledger']['entries']} entries / {res['ledger']['bytes']:,} bytes; "
+          f"incidents audited {len(res['incidents']['audited'])}/{len(res['incidents']['injected'])}, "
+          f"spike-only zones audited {len(res['incidents']['spike_only_audited'])}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(res, f, indent=2)
+        print(f"results -> {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        print(f"vs {args.compare}:")
+        bad = compare(res, old, args.tolerance, args.floor_ms)
+        if bad:
+            print(f"regressions beyond {args.tolerance:.0%}: {', '.join(bad)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# benchmarks/bench_rules.py
+"""
+Rule evaluation at scale: a random rule set (hundreds of incident rules over many metrics,
+plus coalition tiers) on thousands of zones, evaluated three ways per tick:
+  - per-zone Python if-chains (what the assessor / coalition agents used to do)
+  - the compiled rule set over all zones (rules.RuleSet.evaluate)
+  - incremental rules.RuleEngine.update, with --changed zones' metrics changing per tick
+and a hot reload of the rule file mid-run.
+Usage: python benchmarks/bench_rules.py [--zones 5000] [--rules 300] [--metrics 40] [--changed 50] [--ticks 20]
+"""
+import os, sys, time, json, random, argparse, operator, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+from rules import RuleSet, RuleEngine
+from state_store import WorldState
+
+PY_OPS = {'>=': operator.ge, '>': operator.gt, '<=': operator.le, '<': operator.lt, '==': operator.eq, '!=': operator.ne}
+
+def make_rules(n, metrics, rng):
+    incidents = []
+    for i in range(n):
+        when = [[rng.choice(metrics), rng.choice(['>=', '>', '<=', '<']), round(rng.uniform(0, 100), 1)]
+                for _ in range(rng.randint(1, 3))]
+        incidents.append({'name': f"r{i}", 'when': when, 'severity': rng.randint(1, 4)})
+    coalitions = [{'roles': ['Planner', 'Executor', 'Audit']},
+                  {'min_severity': 3, 'roles': ['PublicComm', 'Traffic']},
+                  {'min_severity': 4, 'roles': ['EmergencyResponse']}]
+    coalitions += [{'rules': rng.sample([r['name'] for r in incidents], 5), 'roles': [f"Team{k}"]} for k in range(10)]
+    return {'incidents': incidents, 'coalitions': coalitions, 'people_per_severity': 1000}
+
+def if_chain(spec, world):
+    """The per-zone, per-rule Python loop the compiled rule set replaces."""
+    incidents, coalitions = [], []
+    for zone, vals in world.items():
+        sev, matched = 0, set()
+        for r in spec['incidents']:
+            ok = True
+            for m, op, v in r['when']:
+                x = vals.get(m)
+                if x is None or not PY_OPS[op](x, v):
+                    ok = False
+                    break
+            if ok:
+                sev = max(sev, r['severity'])
+                matched.add(r['name'])
+        if sev:
+            incidents.append({'zone': zone, 'severity': sev, 'estimated_people': 1000 * sev, 'notes': []})
+            roles = []
+            for t in spec['coalitions']:
+                if sev >= t.get('min_severity', 0) and (not t.get('rules') or matched.intersection(t['rules'])):
+                    roles += t['roles']
+            coalitions.append({'zone': zone, 'roles': roles})
+    return incidents, coalitions
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--zones", type=int, default=5000)
+    ap.add_argument("--rules", type=int, default=300)
+    ap.add_argument("--metrics", type=int, default=40)
+    ap.add_argument("--changed", type=int, default=50)
+    ap.add_argument("--ticks", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+    metrics = [f"avg_m{k}" for k in range(args.metrics)]
+    spec = make_rules(args.rules, metrics, rng)
+    zone = lambda: {m: round(rng.uniform(0, 100), 2) for m in metrics if rng.random() > 0.05}
+    world = WorldState({f"zone{i}": zone() for i in range(args.zones)})
+    worlds = [world]
+    for _ in range(args.ticks):
+        world = world.evolve({f"zone{rng.randrange(args.zones)}": zone() for _ in range(args.changed)})
+        worlds.append(world)
+
+    t0 = time.perf_counter()
+    ruleset = RuleSet(spec)
+    compile_s = time.perf_counter() - t0
+    print(f"{args.zones} zones, {args.rules} rules over {args.metrics} metrics, "
+          f"{len(spec['coalitions'])} coalition tiers (compiled in {compile_s * 1e3:.1f} ms)")
+
+    t0 = time.perf_counter()
+    for w in worlds[1:]:
+        ref = if_chain(spec, w)
+    chain_t = (time.perf_counter() - t0) / args.ticks
+
+    t0 = time.perf_counter()
+    for w in worlds[1:]:
+        X = np.array([[float(w[z].get(m, np.nan)) for m in ruleset.metrics] for z in w])
+        ruleset.evaluate(X)
+    full_t = (time.perf_counter() - t0) / args.ticks
+
+    engine = RuleEngine(spec, capacity=args.zones)
+    engine.update(worlds[0])
+    t0 = time.perf_counter()
+    for w in worlds[1:]:
+        incidents, _ = engine.update(w)
+        coalitions = engine.coalitions_for(incidents)
+    inc_t = (time.perf_counter() - t0) / args.ticks
+    same = (incidents, coalitions) == ref
+
+    print(f"  if-chains (all zones)          {chain_t * 1e3:8.2f} ms/tick")
+    print(f"  compiled, all zones            {full_t * 1e3:8.2f} ms/tick  ({chain_t / full_t:.0f}x)")
+    print(f"  compiled, {args.changed} changed zones     {inc_t * 1e3:8.2f} ms/tick  ({chain_t / inc_t:.0f}x), "
+          f"same incidents and coalitions: {same}")
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "rules.json")
+        with open(path, "w") as f:
+            json.dump(spec, f)
+        engine = RuleEngine(path, capacity=args.zones)
+        engine.update(worlds[0])
+        spec['incidents'] = spec['incidents'][:args.rules // 2]
+        spec['coalitions'] = spec['coalitions'][:3]
+        with open(path, "w") as f:
+            json.dump(spec, f)
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 1))
+        t0 = time.perf_counter()
+        incidents, _ = engine.update(worlds[1])
+        reload_t = time.perf_counter() - t0
+        print(f"hot reload to {len(spec['incidents'])} rules + re-evaluation of all zones: {reload_t * 1e3:.1f} ms, "
+              f"same as a fresh engine: {incidents == RuleEngine(spec).update(worlds[1])[0]}")
+
+if __name__ == "__main__":
+    main()
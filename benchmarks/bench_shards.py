@@ -0,0 +1,48 @@
+# benchmarks/bench_shards.py
+"""
+Sharded run_graph scaling: 8 synthetic shards, 1 worker vs N workers.
+The stub LLM has zero latency, so every stage is CPU-bound.
+Usage: python benchmarks/bench_shards.py [--shards 8] [--ticks 300] [--workers 8]
+"""
+import os, sys, csv, random, tempfile, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sharding import ShardedRunner
+
+def synthetic_csv(path, zones, rows, seed=7):
+    rnd = random.Random(seed)
+    with open(path, "w", newline='') as f:
+        w = csv.writer(f)
+        w.writerow(["timestamp", "sensor_id", "sensor_type", "location", "value"])
+        for i in range(rows):
+            z = rnd.randrange(zones)
+            if rnd.random() < 0.5:
+                w.writerow([1761477000 + i, f"ws_{z:04d}", "water_level", f"zone{z:04d}", round(rnd.uniform(0.5, 3.5), 2)])
+            else:
+                w.writerow([1761477000 + i, f"gs_{z:04d}", "garbage_level", f"zone{z:04d}", round(rnd.uniform(40, 99), 1)])
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--shards", type=int, default=8)
+    ap.add_argument("--ticks", type=int, default=300)
+    ap.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1))
+    ap.add_argument("--zones", type=int, default=64)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        src = os.path.join(d, "sensors.csv")
+        synthetic_csv(src, args.zones, args.shards * args.ticks * 2)
+        base = None
+        for workers in sorted({1, args.workers}):
+            out = os.path.join(d, f"w{workers}")
+            runner = ShardedRunner.from_csv(src, args.shards, out_dir=out, workers=workers, llm_latency=0.0)
+            stats = runner.run(iterations=args.ticks)
+            base = base or stats['wall_s']
+            print(f"workers={workers:>2}: wall {stats['wall_s']:.2f}s  {stats['ticks_per_s']:.0f} ticks/s  "
+                  f"{stats['events_per_s']:.0f} events/s  speedup x{base / stats['wall_s']:.2f}  "
+                  f"parallelism {stats['effective_parallelism']:.2f}  top head {stats['top_head'][:12]}")
+        if (os.cpu_count() or 1) < args.workers:
+            print(f"note: only {os.cpu_count()} CPU(s) available, speedup is capped accordingly")
+
+if __name__ == "__main__":
+    main()
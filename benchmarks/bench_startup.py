@@ -0,0 +1,64 @@
+# benchmarks/bench_startup.py
+"""
+Cold start of a short-lived worker: fresh interpreters that import graph and run one
+tick (stub LLM, temp ledger). Reports, as medians over --runs processes, process wall time
+to the end of the first tick, time spent in `import graph`, and the first tick itself;
+plus which heavy modules got loaded and the slowest imports from `python -X importtime`.
+Usage: python benchmarks/bench_startup.py [--runs 5] [--top 10]
+"""
+import os, sys, json, time, statistics, subprocess, argparse, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ['google.generativeai', 'dotenv', 'pandas', 'pydantic', 'numpy']
+
+CHILD = r"""
+import sys, time, json, asyncio, io, contextlib
+t0 = time.perf_counter()
+import graph
+t1 = time.perf_counter()
+from llm_wrapper import LLM
+with contextlib.redirect_stdout(io.StringIO()):
+    asyncio.run(graph.run_graph(1, llm=LLM(provider='stub'), tick_interval=0, ledger_path=sys.argv[1]))
+t2 = time.perf_counter()
+print(json.dumps({'import_s': t1 - t0, 'tick_s': t2 - t1, 'loaded': [m for m in sys.argv[2:] if m in sys.modules]}))
+"""
+
+def one(ledger):
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", CHILD, ledger, *HEAVY], cwd=ROOT,
+                         capture_output=True, text=True, check=True).stdout
+    wall = time.perf_counter() - t0
+    res = json.loads(out.strip().splitlines()[-1])
+    res['first_tick_s'] = wall
+    return res
+
+def importtime(top):
+    """(cumulative us, module) for the slowest top-level imports under `import graph`."""
+    err = subprocess.run([sys.executable, "-W", "ignore", "-X", "importtime", "-c", "import graph"], cwd=ROOT,
+                         capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in err.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=10)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        runs = [one(os.path.join(d, f"ledger_{i}.jsonl")) for i in range(args.runs)]
+    med = lambda k: statistics.median(r[k] for r in runs) * 1e3
+    print(f"time to first tick {med('first_tick_s'):.0f} ms (median of {args.runs} processes): "
+          f"import graph {med('import_s'):.0f} ms, first tick {med('tick_s'):.0f} ms, "
+          f"rest is interpreter start-up")
+    print(f"heavy modules loaded: {', '.join(runs[0]['loaded']) or 'none'}")
+    print("slowest imports under `import graph` (cumulative):")
+    for us, mod in importtime(args.top):
+        print(f"  {us / 1e3:8.1f} ms  {mod}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# benchmarks/bench_state.py
+"""
+Long-run memory of the shared state: appends a tick's worth of events/notes/audit entries
+per tick, like the agents do, and prints RSS + the per-field memory report as it goes.
+With the StateStore limits RSS levels off; --unbounded uses a plain dict for comparison.
+Usage: python benchmarks/bench_state.py [--ticks 200000] [--events 20] [--unbounded]
+"""
+import os, sys, time, resource, argparse, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from state_store import StateStore, Event
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ticks", type=int, default=200_000)
+    ap.add_argument("--events", type=int, default=20, help="events per tick")
+    ap.add_argument("--unbounded", action="store_true")
+    ap.add_argument("--spill", action="store_true", help="spill evicted items to a temp dir")
+    args = ap.parse_args()
+
+    spill = tempfile.mkdtemp() if args.spill else None
+    init = {'perception_events': [], 'provenance': [], 'summaries': [], 'audit_log': [], 'execution_results': []}
+    state = dict(init) if args.unbounded else StateStore(init, spill_dir=spill)
+    t0 = time.perf_counter()
+    for tick in range(args.ticks):
+        for i in range(args.events):
+            ev = Event(str(tick), f"ws_{i:02d}", 'water_level', f"zone{i % 5}", float(i), 'sim')
+            state['perception_events'].append(ev)
+            state['provenance'].append({'sensor_id': ev.sensor_id, 'ts': ev.ts, 'raw': None})
+        state['summaries'].append({'tick': tick, 'summary': f"tick {tick}"})
+        state['execution_results'].append({'tick': tick, 'status': 'ok'})
+        state['audit_log'].append({'hash': f"{tick:064x}", 'entry': {'tick': tick}})
+        if (tick + 1) % max(1, args.ticks // 5) == 0:
+            print(f"tick {tick + 1:>8,}: maxrss {rss_mb():7.1f} MB  "
+                  f"events {len(state['perception_events']):,}")
+    dt = time.perf_counter() - t0
+    print(f"{args.ticks:,} ticks in {dt:.1f}s")
+    if isinstance(state, StateStore):
+        for k, r in state.memory_report().items():
+            print(f"  {k:18s} len {r['len']:>10,}  in memory {r['in_memory']:>6,}  "
+                  f"spilled {r['spilled']:>10,}  ~{r['bytes'] / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/bench_world.py
+"""
+Cost of noticing world_state changes with thousands of zones: the old per-agent
+json.dumps before/after diff vs WorldState's version/identity check, plus the assessor
+re-assessing only the zones that changed vs all of them.
+Usage: python benchmarks/bench_world.py [--zones 5000] [--changed 50] [--ticks 50]
+"""
+import os, sys, json, time, random, asyncio, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from state_store import WorldState
+from agents import assessor
+
+AGENTS_PER_TICK = 10
+
+def zone_vals(rng):
+    return {'avg_water': round(rng.uniform(0, 4), 2), 'avg_garbage': round(rng.uniform(20, 100), 2)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--zones", type=int, default=5000)
+    ap.add_argument("--changed", type=int, default=50, help="zones updated per tick")
+    ap.add_argument("--ticks", type=int, default=50)
+    args = ap.parse_args()
+
+    rng = random.Random(0)
+    zones = [f"zone{i}" for i in range(args.zones)]
+    base = {z: zone_vals(rng) for z in zones}
+    updates = [{z: zone_vals(rng) for z in rng.sample(zones, args.changed)} for _ in range(args.ticks)]
+
+    # old: dict copy per tick + json.dumps before/after every agent
+    world = dict(base)
+    t0 = time.perf_counter()
+    for u in updates:
+        world = dict(world)
+        world.update(u)
+        for _ in range(AGENTS_PER_TICK):
+            json.dumps(world) != json.dumps(world)
+    old = (time.perf_counter() - t0) / args.ticks
+
+    # new: evolve() + identity check per agent
+    world = WorldState(base)
+    t0 = time.perf_counter()
+    for u in updates:
+        before = world
+        world = world.evolve(u)
+        for _ in range(AGENTS_PER_TICK):
+            world is not before
+    new = (time.perf_counter() - t0) / args.ticks
+    print(f"{args.zones} zones, {args.changed} changed/tick: change detection "
+          f"{old * 1e3:.2f} ms/tick (json diff) -> {new * 1e3:.3f} ms/tick (WorldState), {old / new:.0f}x")
+    delta = world.delta(world.version - 1)
+    print(f"delta vs previous version: {len(json.dumps(delta)):,} bytes (full state {len(json.dumps(world)):,} bytes)")
+
+    async def assess(incremental):
+        w = WorldState(base)
+        state = {'verified_world_state': w}
+        await assessor.run(state, None, None)
+        t0 = time.perf_counter()
+        for u in updates:
+            w = w.evolve(u)
+            state['verified_world_state'] = w
+            if not incremental:
+                state.pop('rule_engine', None)
+            await assessor.run(state, None, None)
+        return (time.perf_counter() - t0) / args.ticks, state['situation_assessment']
+    full_t, full_out = asyncio.run(assess(False))
+    inc_t, inc_out = asyncio.run(assess(True))
+    print(f"assessor: {full_t * 1e3:.2f} ms/tick (all zones) -> {inc_t * 1e3:.2f} ms/tick (changed zones), "
+          f"same output: {full_out == inc_out}")
+
+if __name__ == "__main__":
+    main()
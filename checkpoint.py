@@ -0,0 +1,178 @@
+# checkpoint.py
+import os, zlib, struct, pickle, hashlib, time
+from concurrent.futures import ThreadPoolExecutor
+from state_store import RingBuffer, WorldState
+from instrumentation import get_logger
+
+log = get_logger('checkpoint')
+
+# --- Frame format ---
+# A checkpoint file is a full frame followed by delta frames, each
+#   MAGIC | kind (1 byte) | payload length (u32) | crc32 of payload (u32) | payload
+# where payload is a zlib-compressed pickle of
+#   {'meta': {...}, 'set': {key: pickled value},
+#    'append': {ring buffer key: (start, length, pickled new items)}, 'drop': [keys]}
+# A torn frame at the end (crash mid-write) fails its length / crc check and is ignored.
+MAGIC = b"GMCK"
+FULL, DELTA = 0, 1
+_HEADER = struct.Struct("<4sBII")
+
+class CheckpointError(Exception):
+    pass
+
+def _frame(kind, record, level):
+    payload = zlib.compress(pickle.dumps(record, pickle.HIGHEST_PROTOCOL), level)
+    return _HEADER.pack(MAGIC, kind, len(payload), zlib.crc32(payload)) + payload
+
+def read_frames(path):
+    """Yield (kind, record) for every intact frame in the file, stopping at the first bad one."""
+    with open(path, "rb") as f:
+        data = f.read()
+    pos = 0
+    while pos + _HEADER.size <= len(data):
+        magic, kind, n, crc = _HEADER.unpack_from(data, pos)
+        payload = data[pos + _HEADER.size:pos + _HEADER.size + n]
+        if magic != MAGIC or len(payload) != n or zlib.crc32(payload) != crc:
+            log.warning("torn checkpoint frame, ignoring the rest", extra={'path': path, 'offset': pos})
+            return
+        yield kind, pickle.loads(zlib.decompress(payload))
+        pos += _HEADER.size + n
+
+def load(path):
+    """
+    (state dict, meta) as of the last intact frame of the checkpoint at path.
+    Ring buffers come back as RingBuffers (same maxlen / spill file / logical indices).
+    """
+    state, meta = None, None
+    for kind, rec in read_frames(path):
+        if kind == FULL:
+            state = {}
+        elif state is None:
+            raise CheckpointError(f"{path}: delta frame before the first full frame")
+        for k in rec['drop']:
+            state.pop(k, None)
+        for k, b in rec['set'].items():
+            state[k] = pickle.loads(b)
+        for k, (start, length, items) in rec['append'].items():
+            rb = state[k]
+            keep = length - start
+            rb.items = (rb.items + pickle.loads(items))[-keep:] if keep else []
+            rb.start = start
+        meta = rec['meta']
+    if state is None:
+        raise CheckpointError(f"no intact checkpoint in {path}")
+    return state, meta
+
+# --- Writer ---
+def _stamp(key, value, versions):
+    """(object, version) that can only stay the same while the value does; None = unknown."""
+    if isinstance(value, WorldState):
+        return value, value.version     # copy-on-write: same object and version, same contents
+    ver = versions.get(key) if versions is not None else None
+    return None if ver is None else (None, ver)
+
+class Checkpointer:
+    """
+    Periodic incremental checkpoints of the pipeline state into one file (see the frame
+    format above). save() runs between ticks: it pickles only what changed since the last
+    frame - ring buffers (append-only history) contribute just their new items, other keys
+    are written when their pickled bytes' digest differs - and hands compression, the write
+    and fsync to a background thread, so the loop only pays for pickling (which has to
+    happen there, while no node is mutating the state). With a StateStore, values whose
+    write counter (state.versions) hasn't moved, and WorldStates still at the same object
+    and version, aren't even pickled; a plain dict state is pickled key by key.
+    every: checkpoint after every n-th tick (see due()); full_every: every n-th checkpoint is a
+    full frame, written to a temp file that atomically replaces the old one (keeps the file
+    from growing without bound).
+    """
+    def __init__(self, path="data/checkpoints/state.ckpt", every=1, full_every=50, level=1, fsync=True):
+        self.path = path
+        self.every = max(1, every)
+        self.full_every = max(1, full_every)
+        self.level = level
+        self.fsync = fsync
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._digests = {}      # key -> digest of the last written pickle
+        self._buffers = {}      # key -> (RingBuffer, len, start) at the last frame
+        self._versions = {}     # key -> _stamp() of the value at the last frame
+        self._count = 0
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")
+        self._last = None       # future of the last write
+        self.stats = {'checkpoints': 0, 'full': 0, 'bytes': 0, 'pickled': 0, 'pickle_s': 0.0, 'write_s': 0.0}
+
+    def due(self, tick):
+        """True after every `every`-th tick (tick counts from 0)."""
+        return (tick + 1) % self.every == 0
+
+    def save(self, state, ticks, meta=None):
+        """Checkpoint state after `ticks` completed ticks; returns the future of the write."""
+        t0 = time.perf_counter()
+        full = self._count % self.full_every == 0
+        rec = {'meta': dict(meta or {}, ticks=ticks, ts=time.time()), 'set': {}, 'append': {}, 'drop': []}
+        if full:
+            self._digests, self._buffers, self._versions = {}, {}, {}
+        else:
+            rec['drop'] = [k for k in self._digests if k not in state]
+        versions = getattr(state, 'versions', None)
+        for k, v in state.items():
+            if isinstance(v, RingBuffer):
+                prev = self._buffers.get(k)
+                n = len(v)
+                if prev is not None and prev[0] is v and prev[1] <= n:
+                    if n != prev[1] or v.start != prev[2]:
+                        new = v[max(prev[1], v.start):n]
+                        rec['append'][k] = (v.start, n, pickle.dumps(new, pickle.HIGHEST_PROTOCOL))
+                    self._buffers[k] = (v, n, v.start)
+                    continue
+                self._buffers[k] = (v, n, v.start)
+            stamp, prev = _stamp(k, v, versions), self._versions.get(k)
+            if stamp is not None and prev is not None and prev[0] is stamp[0] and prev[1] == stamp[1]:
+                continue
+            self._versions[k] = stamp
+            b = pickle.dumps(v, pickle.HIGHEST_PROTOCOL)
+            self.stats['pickled'] += 1
+            digest = hashlib.blake2b(b, digest_size=16).digest()
+            if self._digests.get(k) != digest:
+                rec['set'][k] = b
+                self._digests[k] = digest
+        for k in rec['drop']:
+            self._digests.pop(k, None)
+            self._buffers.pop(k, None)
+            self._versions.pop(k, None)
+        self._count += 1
+        self.stats['pickle_s'] += time.perf_counter() - t0
+        self._last = self._pool.submit(self._write, FULL if full else DELTA, rec)
+        return self._last
+
+    def _write(self, kind, rec):
+        t0 = time.perf_counter()
+        frame = _frame(kind, rec, self.level)
+        if kind == FULL:
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(frame)
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self.stats['full'] += 1
+        else:
+            with open(self.path, "ab") as f:
+                f.write(frame)
+                if self.fsync:
+                    os.fsync(f.fileno())
+        self.stats['checkpoints'] += 1
+        self.stats['bytes'] += len(frame)
+        self.stats['write_s'] += time.perf_counter() - t0
+        return len(frame)
+
+    def wait(self):
+        """Block until every queued checkpoint is on disk."""
+        if self._last is not None:
+            self._last.result()
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        if self._last is not None:
+            self._last.result()
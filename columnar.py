@@ -0,0 +1,181 @@
+# columnar.py
+import io, os, time
+import numpy as np
+import pandas as pd
+
+from state_store import Event
+
+# --- Columnar event batches ---
+class EventBatch:
+    """
+    A batch of perception events stored column-wise (NumPy arrays), with the same
+    fields as agents.perception.Observation: ts, sensor_id, sensor_type, location, value, source.
+    rejected: rows dropped by validation while building the batch.
+    start: logical index of the first row in state['perception_events'] (set by perception),
+    so consumers can tell whether the batch is exactly what arrived since their cursor.
+    """
+    __slots__ = ('ts', 'sensor_id', 'sensor_type', 'location', 'value', 'source', 'rejected', 'start', '_codes')
+
+    def __init__(self, ts, sensor_id, sensor_type, location, value, source, rejected=0):
+        self.ts = ts
+        self.sensor_id = sensor_id
+        self.sensor_type = sensor_type
+        self.location = location
+        self.value = value
+        self.source = source
+        self.rejected = rejected
+        self.start = 0
+        self._codes = {}
+
+    @classmethod
+    def empty(cls, rejected=0):
+        e = np.empty(0, dtype=object)
+        return cls(e, e, e, e, np.empty(0), e, rejected)
+
+    def __len__(self):
+        return len(self.value)
+
+    def covers(self, start, stop):
+        """True if this batch is exactly perception_events[start:stop]."""
+        return self.start == start and self.start + len(self) == stop
+
+    def codes(self, field):
+        """(codes, uniques) for a string column (pd.factorize, first-seen order), computed once."""
+        out = self._codes.get(field)
+        if out is None:
+            codes, uniques = pd.factorize(getattr(self, field))
+            out = self._codes[field] = (codes, list(uniques))
+        return out
+
+    def records(self, first=0):
+        """Materialize compact Event records from row `first` on (for agents that work per event)."""
+        return [
+            Event(str(t), sid, st, loc, v, src)
+            for t, sid, st, loc, v, src in zip(
+                self.ts[first:].tolist(), self.sensor_id[first:].tolist(), self.sensor_type[first:].tolist(),
+                self.location[first:].tolist(), self.value[first:].tolist(), self.source[first:].tolist())
+        ]
+
+def validate_frame(df, source="sim"):
+    """
+    Vectorized equivalent of building an Observation per row: ids/types/locations must be
+    present, value must parse as a finite float, ts defaults to now() when missing
+    (kept as parsed; records() renders it as a string).
+    Rows that fail are dropped and counted in EventBatch.rejected.
+    """
+    n = len(df)
+    if n == 0:
+        return EventBatch.empty()
+    value = df['value'] if 'value' in df else pd.Series(np.nan, index=df.index)
+    if value.dtype.kind != 'f':
+        value = pd.to_numeric(value, errors='coerce')
+    value = value.to_numpy(dtype=np.float64)
+    ok = np.isfinite(value)
+    cols = {}
+    for c in ('sensor_id', 'sensor_type', 'location'):
+        if c not in df:
+            raise ValueError(f"sensor batch is missing column {c!r}")
+        arr = df[c].to_numpy(dtype=object)
+        # elementwise compares are much cheaper than pd.notna on object arrays
+        ok &= (arr != '') & (arr == arr) & (arr != None)  # noqa: E711 (vectorized None check)
+        cols[c] = arr
+    now = str(time.time())
+    if 'timestamp' in df:
+        ts = df['timestamp'].to_numpy()
+        if ts.dtype == object:
+            missing = (ts == '') | (ts != ts) | (ts == None)  # noqa: E711
+            if missing.any():
+                ts = ts.copy()
+                ts[missing] = now
+        elif ts.dtype.kind == 'f' and np.isnan(ts).any():
+            ts = ts.astype(object)
+            ts[pd.isna(ts)] = now
+    else:
+        ts = np.broadcast_to(np.array(now, dtype=object), (n,))
+    if 'source' in df:
+        src = df['source'].to_numpy(dtype=object)
+    else:
+        # read-only view, no per-row allocation
+        src = np.broadcast_to(np.array(source, dtype=object), (n,))
+    if not ok.all():
+        idx = np.flatnonzero(ok)
+        return EventBatch(ts[idx], cols['sensor_id'][idx], cols['sensor_type'][idx],
+                          cols['location'][idx], value[idx], src[idx], rejected=int(n - len(idx)))
+    return EventBatch(ts, cols['sensor_id'], cols['sensor_type'],
+                      cols['location'], value, src)
+
+# --- Chunked CSV reader ---
+class CsvTail:
+    """
+    Reads a sensor CSV in large chunks from a byte offset, so each call returns everything
+    appended since the previous one (only complete lines). The offset is owned by the caller
+    (e.g. state['ingest_offset']), which makes the reader restartable.
+    Rows that don't parse (wrong field count) or are longer than max_bytes are skipped and
+    counted in the batch's rejected, so one bad line can't hold the reader in place.
+    """
+    def __init__(self, path, max_bytes=64 << 20, source="sim"):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.source = source
+        self._header = None
+        self._header_len = 0
+
+    def _read_header(self, f):
+        f.seek(0)
+        line = f.readline()
+        if not line.endswith(b"\n"):
+            return False
+        self._header = [h.strip() for h in line.decode().strip().split(",")]
+        self._header_len = len(line)
+        return True
+
+    def read(self, offset=0):
+        """Returns (EventBatch, new_offset)."""
+        if not os.path.exists(self.path):
+            return EventBatch.empty(), offset
+        with open(self.path, "rb") as f:
+            if self._header is None and not self._read_header(f):
+                return EventBatch.empty(), offset
+            offset = max(offset, self._header_len)
+            f.seek(offset)
+            data = f.read(self.max_bytes)
+        end = data.rfind(b"\n")
+        if end == -1:
+            if len(data) < self.max_bytes:
+                return EventBatch.empty(), offset      # a row still being written
+            # a single row longer than max_bytes: drop it once its newline has arrived
+            skip = self._line_end(offset + len(data))
+            return (EventBatch.empty(), offset) if skip is None else (EventBatch.empty(1), skip)
+        data = data[:end+1]
+        # na_filter=False: empty fields stay '' (validate_frame rejects them) and parsing is faster
+        df = pd.read_csv(io.BytesIO(data), header=None, names=self._header, na_filter=False,
+                         dtype={'sensor_id': object, 'sensor_type': object, 'location': object},
+                         on_bad_lines='skip')
+        batch = validate_frame(df, self.source)
+        bad = data.count(b"\n") - len(df)
+        if bad:
+            # pandas skips blank lines silently: only the malformed ones count as rejected
+            batch.rejected += bad - sum(1 for line in data.split(b"\n")[:-1] if not line.strip())
+        return batch, offset + len(data)
+
+    def _line_end(self, pos, step=1 << 20):
+        """Offset just past the first newline at or after pos (None if there is none yet)."""
+        with open(self.path, "rb") as f:
+            f.seek(pos)
+            while True:
+                chunk = f.read(step)
+                if not chunk:
+                    return None
+                nl = chunk.find(b"\n")
+                if nl != -1:
+                    return pos + nl + 1
+                pos += len(chunk)
+
+    def batches(self, offset=0):
+        """Iterate the rest of the file chunk by chunk: yields (EventBatch, new_offset)."""
+        while True:
+            batch, new_offset = self.read(offset)
+            if new_offset == offset:
+                return
+            offset = new_offset
+            yield batch, offset
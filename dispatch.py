@@ -0,0 +1,152 @@
+# dispatch.py
+import asyncio, hashlib, json, random, inspect
+from instrumentation import get_logger
+
+log = get_logger('dispatch')
+
+DISPATCH_ACTIONS = ('dispatch_truck',)   # step actions sent to the dispatch service
+
+class DispatchError(Exception):
+    pass
+
+def idempotency_key(plan_id, execution, index, step):
+    """Same plan execution + step -> same key, so a retry is recognised as the same request."""
+    digest = hashlib.sha1(json.dumps(step, sort_keys=True, default=str).encode()).hexdigest()[:10]
+    return f"{plan_id}:{execution}:{index}:{digest}"
+
+# --- Stub dispatch service ---
+class StubDispatchService:
+    """
+    Local stand-in for the field dispatch API: async call(payload) with configurable
+    latency (+ uniform jitter) and failure modes, deduplicating on payload['idempotency_key']
+    like the real service would.
+      failure_rate - request rejected before anything is dispatched (safe to retry)
+      lost_ack_rate - dispatched, but the response never arrives (the caller times out)
+    stats: requests, dispatched (unique keys acted on), duplicates (retries answered from
+    the dedupe table), failures, lost_acks.
+    """
+    def __init__(self, latency=0.05, jitter=0.0, failure_rate=0.0, lost_ack_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.lost_ack_rate = lost_ack_rate
+        self.rng = random.Random(seed)
+        self.done = {}        # idempotency key -> result
+        self.dispatched = []  # payloads acted on, in order
+        self.stats = {'requests': 0, 'dispatched': 0, 'duplicates': 0, 'failures': 0, 'lost_acks': 0}
+
+    async def __call__(self, payload):
+        self.stats['requests'] += 1
+        await asyncio.sleep(self.latency + self.rng.uniform(0, self.jitter))
+        key = payload.get('idempotency_key')
+        if key is not None and key in self.done:
+            self.stats['duplicates'] += 1
+            return self.done[key]
+        if self.rng.random() < self.failure_rate:
+            self.stats['failures'] += 1
+            raise DispatchError("dispatch service unavailable")
+        result = {'ok': True, 'dispatch_id': f"d{len(self.dispatched) + 1}", 'zone': payload.get('zone'),
+                  'count': payload.get('count')}
+        self.dispatched.append(payload)
+        self.stats['dispatched'] += 1
+        if key is not None:
+            self.done[key] = result
+        if self.rng.random() < self.lost_ack_rate:
+            self.stats['lost_acks'] += 1
+            await asyncio.sleep(3600)   # the response is lost; the caller's timeout fires
+        return result
+
+# --- Execution engine ---
+class ExecutionEngine:
+    """
+    Runs a plan's steps concurrently. A step waits only for the earlier steps listed in its
+    'after' (indices into plan['steps']); everything else starts at once, limited to
+    `concurrency` in flight overall and `per_actor` per actor (actor_limits overrides it
+    per actor name). Each attempt has its own timeout; failed or timed-out dispatches are
+    retried with exponential backoff under the same idempotency key, so the service acts
+    on each step at most once. Steps whose dependencies failed are skipped.
+    dispatch: sync or async callable(payload) -> result dict (e.g. StubDispatchService).
+    A sync callable runs in a worker thread, so it can't block the loop and its timeout
+    holds (the thread itself can't be cancelled and finishes in the background). A result
+    that isn't a dict counts as a failed step, without retries.
+    """
+    def __init__(self, dispatch, concurrency=16, per_actor=4, actor_limits=None, timeout=1.0,
+                 retries=3, backoff=0.05):
+        self.dispatch = dispatch
+        self.concurrency = concurrency
+        self.per_actor = per_actor
+        self.actor_limits = dict(actor_limits or {})
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._is_async = (inspect.iscoroutinefunction(dispatch) or
+                          inspect.iscoroutinefunction(getattr(dispatch, '__call__', None)))
+
+    async def _call(self, payload):
+        if self._is_async:
+            return await self.dispatch(payload)
+        res = await asyncio.to_thread(self.dispatch, payload)
+        return await res if inspect.isawaitable(res) else res
+
+    async def _send(self, payload):
+        """(status, result, attempts) after up to 1 + retries attempts."""
+        err = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                res = await asyncio.wait_for(self._call(payload), self.timeout)
+                if not isinstance(res, dict):
+                    # the service answered, just not with a result: retrying won't change that
+                    log.warning("dispatch returned a non-dict result",
+                                extra={'key': payload.get('idempotency_key'), 'result': repr(res)[:200]})
+                    return 'failed', {'ok': False, 'error': f"unexpected result {res!r:.200}"}, attempt + 1
+                return ('ok' if res.get('ok', True) else 'failed'), res, attempt + 1
+            except asyncio.TimeoutError:
+                err = 'timeout'
+            except Exception as e:
+                err = repr(e)
+            log.warning("dispatch attempt failed",
+                        extra={'key': payload.get('idempotency_key'), 'attempt': attempt + 1, 'error': err})
+        return ('timeout' if err == 'timeout' else 'failed'), {'ok': False, 'error': err}, self.retries + 1
+
+    async def run_step(self, plan, step, key, limits):
+        actor = step.get('actor')
+        action = step.get('action', 'noop')
+        if action not in DISPATCH_ACTIONS:
+            return {'step': step, 'result': {'ok': True, 'note': 'simulated action'}, 'status': 'ok'}
+        payload = {'zone': plan.get('zone', plan.get('name')), 'count': step.get('count', 1),
+                   'idempotency_key': key}
+        if 'resources' in step:
+            payload['resources'] = step['resources']
+        if actor not in limits:
+            limits[actor] = asyncio.Semaphore(self.actor_limits.get(actor, self.per_actor))
+        # actor slot first: steps queued behind a busy actor must not hold global slots
+        # that other actors' steps could be using
+        async with limits[actor], limits[None]:
+            log.info("executing action", extra={'action': action, 'actor': actor})
+            status, res, attempts = await self._send(payload)
+        return {'step': step, 'result': res, 'status': status, 'attempts': attempts, 'key': key}
+
+    async def run(self, plan, execution=0, on_result=None):
+        """
+        Execute plan; on_result(index, result) is called as each step finishes.
+        Returns the results in step order.
+        """
+        steps = plan.get('steps', [])
+        limits = {None: asyncio.Semaphore(self.concurrency)}
+        tasks = {}
+
+        async def one(i, step):
+            deps = [tasks[j] for j in step.get('after', ()) if 0 <= j < i]
+            if deps and any(d['status'] != 'ok' for d in await asyncio.gather(*deps)):
+                out = {'step': step, 'result': {'ok': False, 'error': 'dependency failed'}, 'status': 'skipped'}
+            else:
+                out = await self.run_step(plan, step, idempotency_key(plan.get('id'), execution, i, step), limits)
+            if on_result is not None:
+                on_result(i, out)
+            return out
+
+        for i, step in enumerate(steps):
+            tasks[i] = asyncio.ensure_future(one(i, step))
+        return list(await asyncio.gather(*tasks.values())) if tasks else []
@@ -1,16 +1,18 @@
 # graph.py
-import asyncio, time, json
-from llm_wrapper import LLM
+import asyncio, time, signal, contextlib
+from functools import partial
+from llm_wrapper import LLM, ResponseCache
 import tools
 from importlib import import_module
+from scheduler import Node, DagScheduler, EventScheduler
+from state_store import StateStore
+from ingest import IngestServer
+from ledger import rewind
+from checkpoint import Checkpointer, load as load_checkpoint
+from replay import Recorder, ReplayLLM, ReplayFeed
+from instrumentation import Metrics, TimedLLM, current_agent, profiled, get_logger, configure_logging
 
-# ANSI colors for prettier terminal logs
-class Colors:
-    AGENT = "\033[96m"
-    TOOL = "\033[92m"
-    RESULT = "\033[93m"
-    RESET = "\033[0m"
-    ERROR = "\033[91m"
+log = get_logger('graph')
 
 AGENTS = [
     'agents.perception',
@@ -26,59 +28,305 @@ AGENTS = [
 ]
 
 def log_agent(name, message):
-    print(f"{Colors.AGENT}[Agent: {name}] {Colors.RESET}{message}")
+    log.debug(message, extra={'agent': name})
 
 def log_tool(name, message):
-    print(f"   {Colors.TOOL}[Tool: {name}] {Colors.RESET}{message}")
-
-def log_result(message):
-    print(f"      {Colors.RESULT}→ {message}{Colors.RESET}")
-
-async def run_graph(iterations=10, manual_approve=False):
-    state = {
-        'manual_approve': manual_approve,
-        'perception_events': [],
-        'audit_log': [],
-    }
-
-    csv_gen = tools.csv_stream("data/simulated_sensors.csv")
-    toolset = {
-        'csv_gen': csv_gen,
-        'digital_twin_simulate': tools.digital_twin_simulate,
-        'detect_adversarial': tools.detect_adversarial,
-        'simple_optimizer': tools.simple_optimizer,
-        'append_ledger': tools.append_ledger,
-        'dispatch_tool': lambda payload: {'ok': True, 'payload': payload}
-    }
-
-    llm = LLM()
-    agent_funcs = [(a.split('.')[-1], import_module(a).run) for a in AGENTS]
-
-    for tick in range(iterations):
-        print(f"\n{Colors.RESULT}=== TICK {tick+1} START ==={Colors.RESET}")
-        for agent_name, func in agent_funcs:
-            try:
-                log_agent(agent_name, "Running...")
-                before = json.dumps(state.get("world_state", {}))
-                state = await func(state, toolset, llm)
-                after = json.dumps(state.get("world_state", {}))
-                if before != after and 'world_state' in state:
-                    log_result(f"Updated world_state: {after}")
-                if agent_name == "planner" and "plans" in state:
-                    top_plan = state["plans"][0]
-                    log_result(f"Best Plan: {top_plan['name']} (Conf={top_plan['confidence']})")
-                if agent_name == "executor" and "execution_results" in state:
-                    log_result(f"Executed {len(state['execution_results'])} actions.")
-                if agent_name == "audit" and "last_ledger_hash" in state:
-                    log_result(f"Ledger hash: {state['last_ledger_hash'][:12]}...")
-            except Exception as e:
-                print(f"{Colors.ERROR}[ERROR in {agent_name}]: {e}{Colors.RESET}")
-        print(f"{Colors.RESULT}=== TICK {tick+1} END ==={Colors.RESET}\n")
-        await asyncio.sleep(0.3)
-
-    print(f"\n✅ Run complete — Total ledger entries: {len(state.get('audit_log', []))}")
+    log.debug(message, extra={'tool': name})
+
+def log_result(message, **fields):
+    log.info(message, extra=fields)
+
+_agent_nodes = {}
+
+def agent_nodes(module):
+    """
+    The Nodes of one agent module, importing it on first use.
+    Agent modules may list several functions in NODES (e.g. run + an LLM side-note).
+    """
+    nodes = _agent_nodes.get(module)
+    if nodes is None:
+        mod = import_module(module)
+        agent_name = module.split('.')[-1]
+        nodes = _agent_nodes[module] = [
+            Node(agent_name if func is mod.run else f"{agent_name}.{func.__name__}", agent_name, func)
+            for func in getattr(mod, 'NODES', [mod.run])]
+    return nodes
+
+def load_nodes():
+    """One Node per agent function, in sequential order (imports every agent)."""
+    return [n for a in AGENTS for n in agent_nodes(a)]
+
+class RunControl:
+    """
+    Handle on a running graph (run_graph(control=...)), for use from other tasks: read the
+    live state and metrics, approve a plan, and - in event-driven runs - flag keys as
+    changed or stop.
+    """
+    def __init__(self):
+        self.state = None
+        self.scheduler = None
+        self.metrics = None
+
+    def _events(self):
+        if self.scheduler is None:
+            raise RuntimeError("only available while run_graph(scheduler='events') is running")
+        return self.scheduler
+
+    def approve(self, plan=True):
+        """Human approval for negotiation: True (top plan), a plan name or an index."""
+        if self.state is None:
+            raise RuntimeError("run_graph has not started this run yet")
+        self.state['human_approval'] = plan
+        if self.scheduler is not None:
+            self.scheduler.notify('human_approval')
+
+    def notify(self, *keys):
+        self._events().notify(*keys)
+
+    def stop(self):
+        self._events().stop()
+
+async def run_node(node, state, toolset, llm, config, metrics=None):
+    """Run one node against the shared state, with logging and per-agent timing."""
+    agent_name = node.name
+    token = current_agent.set(agent_name)
+    timer = metrics.time('agent_seconds', agent=agent_name) if metrics is not None else contextlib.nullcontext()
+    try:
+        with timer:
+            log_agent(agent_name, "running")
+            before = state.get('world_state')
+            out = await node.func(state, toolset, llm, config.get(node.agent))
+            if out is not None and out is not state:
+                state.update(out)
+        # WorldState is copy-on-write: a new object means a new version, no diff needed
+        world = state.get('world_state')
+        writes_world = node.writes is None or 'world_state' in node.writes
+        if writes_world and world is not before and world is not None:
+            log_result("world_state updated", agent=agent_name, version=getattr(world, 'version', None),
+                       changed=len(getattr(world, 'changed', world)))
+        if agent_name == "planner" and "plans" in state:
+            top_plan = state["plans"][0]
+            log_result("best plan", agent=agent_name, plan=top_plan['name'], confidence=top_plan['confidence'])
+        if agent_name == "executor" and "execution_results" in state:
+            log_result("executed", agent=agent_name, actions=len(state['execution_results']))
+        if agent_name == "audit" and "last_ledger_hash" in state:
+            log_result("ledger append", agent=agent_name, hash=state['last_ledger_hash'][:12])
+    except Exception as e:
+        log.error("agent failed", extra={'agent': agent_name, 'error': repr(e)})
+        if metrics is not None:
+            metrics.inc('agent_errors_total', agent=agent_name)
+    finally:
+        current_agent.reset(token)
+        if isinstance(state, StateStore):
+            state.touch(node.writes)    # undeclared nodes (writes None) may have changed anything
+
+async def run_graph(iterations=10, manual_approve=False, ledger_batch=None, llm=None, config=None,
+                    scheduler="sequential", max_inflight_ticks=2, tick_interval=0.3,
+                    csv_path="data/simulated_sensors.csv", ledger_path=None,
+                    state_limits=None, spill_dir=None, ingest=None,
+                    max_latency=1.0, min_interval=0.0, stop_when_idle=False, control=None,
+                    metrics=None, profile_path=None, resources=None, dispatch=None,
+                    checkpoint=None, resume=None, record=None, replay=None):
+    """
+    ingest: live sensor feed instead of the CSV - an ingest.IngestServer (already started
+    or not), or a dict of IngestServer options (e.g. {'tcp_port': 9000, 'udp_port': 9001}).
+    Servers started here are closed at the end of the run.
+    state_limits / spill_dir: ring-buffer sizes per appended-to state field (defaults in
+    state_store.DEFAULT_LIMITS) and where evicted items are spilled (None = drop them).
+    csv_path / ledger_path: sensor input and ledger file (ledger defaults to tools.LEDGER_PATH);
+    the learning agent's plan statistics are bootstrapped from the ledger at startup.
+    config: per-agent options keyed by agent name, e.g. {'planner': {'deadline_s': 2.0}}.
+    llm: LLM instance to use (defaults to LLM with an in-memory response cache; pass LLM(provider='stub', latency=...) for offline runs).
+    ledger_batch: None for a synchronous append per plan, or a dict of
+    BatchedLedgerWriter options (e.g. {'fsync': 'batch', 'max_delay': 0.05}) for group commit.
+    scheduler: "sequential" runs nodes one after another, importing each agent module when
+    its first node is reached; "dag" runs independent nodes
+    concurrently and overlaps up to max_inflight_ticks ticks (same final state);
+    "events" runs event-driven waves instead of ticks (see scheduler.EventScheduler).
+    Only nodes downstream of a change run; a wave starts on new live data, an approval
+    (control.approve) or at the latest every max_latency seconds, and waves are at least
+    min_interval apart. iterations caps the number of waves (None = run until
+    control.stop(), SIGINT/SIGTERM, or - with stop_when_idle - until nothing changes).
+    tick_interval: pause between ticks (seconds).
+    control: optional RunControl bound to this run.
+    metrics: instrumentation.Metrics collecting per-agent / LLM-wait / per-tool timings, tick
+    times, events per tick and queue depths (a fresh one when None; see control.metrics).
+    Give it export_path / trace_path for a Prometheus text file / JSONL trace.
+    profile_path: cProfile the whole run into this file.
+    resources: trucks / crews the planner allocates across incidents, as
+    [{'id', 'kind', 'position', 'capacity'}] (defaults to allocator.default_fleet()).
+    dispatch: sync or async callable(payload) the executor sends dispatch steps to, e.g.
+    dispatch.StubDispatchService(latency=0.05, failure_rate=0.1) (default: always-ok stub).
+    checkpoint: checkpoint.Checkpointer, or a dict of its options (e.g. {'path':
+    'data/checkpoints/state.ckpt', 'every': 5}), for incremental state checkpoints between
+    ticks (the dag scheduler needs max_inflight_ticks=1 for that).
+    resume: checkpoint file to continue from: restores the state, the tick count, the CSV /
+    ingest offsets and the ledger head (entries written after the checkpoint are moved to
+    a .rolled_back.jsonl file next to the ledger; see ledger.rewind).
+    record: directory to record the run's per-tick input and LLM responses into (the dag
+    scheduler needs max_inflight_ticks=1 for that too);
+    replay: such a directory to re-run instead of the CSV / live feed and the LLM, with no
+    tick pause and no LLM latency (replay.ReplayFeed / ReplayLLM).
+    """
+    if scheduler == "dag" and max_inflight_ticks > 1:
+        # overlapping ticks share the state: neither has a consistent per-tick view
+        if checkpoint is not None:
+            raise ValueError("checkpoints need tick boundaries: use max_inflight_ticks=1 with the dag scheduler")
+        if record is not None:
+            raise ValueError("recording needs tick boundaries: use max_inflight_ticks=1 with the dag scheduler")
+    # everything opened below is closed on the way out (in reverse order), also when a tick raises
+    async with contextlib.AsyncExitStack() as cleanup:
+        metrics = metrics if metrics is not None else Metrics()
+        cleanup.callback(metrics.flush)
+        checkpointer = None
+        if isinstance(checkpoint, Checkpointer):
+            checkpointer = checkpoint
+            cleanup.callback(checkpointer.wait)     # the caller's: just let pending writes finish
+        elif checkpoint is not None:
+            checkpointer = Checkpointer(**checkpoint)
+            cleanup.callback(checkpointer.close)
+        first_tick = 0
+        if resume is not None:
+            restored, meta = load_checkpoint(resume)
+            first_tick = meta['ticks']
+            tools.close_ledger_writer(ledger_path)
+            moved, appended = rewind(ledger_path or tools.LEDGER_PATH, meta['ledger_head'], meta.get('ledger_pending', ()))
+            log.info("resumed from checkpoint", extra={'path': resume, 'ticks': first_tick,
+                                                       'ledger_rolled_back': moved, 'ledger_reappended': appended})
+        else:
+            if resources is None:
+                from allocator import default_fleet     # numpy: loaded when the run starts, not on import
+                resources = default_fleet()
+            restored = {
+                'manual_approve': manual_approve,
+                'perception_events': [],
+                'audit_log': [],
+                'resources': resources,
+                'plan_stats': tools.load_plan_stats(ledger_path),
+            }
+        state = StateStore(restored, limits=state_limits, spill_dir=spill_dir)
+        if replay is not None:
+            ingest, llm, tick_interval = ReplayFeed(replay), ReplayLLM(replay), 0
+        recorder = None
+        if record is not None:
+            recorder = Recorder(record)
+            cleanup.callback(recorder.close)
+
+        config = config or {}
+        csv_gen = tools.csv_stream(csv_path, skip=state.get('perception_cursor', 0))
+        toolset = {
+            'csv_gen': csv_gen,
+            'digital_twin_simulate': tools.digital_twin_simulate,
+            'digital_twin_batch': tools.digital_twin_batch,
+            'digital_twin_rollout': tools.digital_twin_rollout,
+            'detect_adversarial': tools.detect_adversarial,
+            'simple_optimizer': tools.simple_optimizer,
+            'allocate_resources': tools.allocate_resources,
+            'append_ledger': partial(tools.append_ledger, path=ledger_path),
+            'dispatch_tool': dispatch or (lambda payload: {'ok': True, 'payload': payload})
+        }
+        if ingest is not None:
+            if isinstance(ingest, dict):
+                ingest = IngestServer(**ingest)
+            if not ingest.running:
+                await ingest.start()
+                cleanup.push_async_callback(ingest.close)
+            toolset['ingest'] = ingest
+        if (config.get('perception') or {}).get('batch'):
+            toolset['csv_tail'] = tools.csv_tail(csv_path)
+        if ledger_batch is not None:
+            toolset['ledger_batch'] = tools.get_ledger_batcher(ledger_path, **ledger_batch)
+            cleanup.push_async_callback(toolset['ledger_batch'].close)
+
+        for name in ('digital_twin_simulate', 'digital_twin_batch', 'digital_twin_rollout',
+                     'detect_adversarial', 'simple_optimizer', 'allocate_resources',
+                     'append_ledger', 'dispatch_tool'):
+            toolset[name] = metrics.timed('tool_seconds', toolset[name], tool=name)
+        if llm is None:
+            llm = LLM(cache=ResponseCache())
+            cleanup.callback(llm.close)
+        if recorder is not None:
+            llm = recorder.wrap(llm)
+        llm = TimedLLM(llm, metrics)
+
+        if control is not None:
+            control.state, control.metrics = state, metrics
+
+        tick_t0, seen = {}, [len(state.get('perception_events', []))]
+
+        def checkpoint_meta():
+            if 'ledger_batch' in toolset:
+                batcher = toolset['ledger_batch']
+                return {'ledger_head': batcher.writer.head, 'ledger_pending': batcher.queued()}
+            return {'ledger_head': tools.get_ledger_writer(ledger_path).head}
+
+        def tick_start(tick):
+            log.info("tick start", extra={'tick': tick + 1})
+            tick_t0[tick] = time.perf_counter()
+
+        def tick_end(tick):
+            metrics.observe('tick_seconds', time.perf_counter() - tick_t0.pop(tick))
+            n = len(state.get('perception_events', []))
+            metrics.observe('events_per_tick', n - seen[0])
+            if recorder is not None:
+                # a columnar batch's older rows may never have been built as Events
+                batch = state.get('perception_batch')
+                if batch is not None and batch.covers(seen[0], n):
+                    recorder.record_tick(tick, batch.records())
+                else:
+                    recorder.record_tick(tick, state['perception_events'][seen[0]:n])
+            seen[0] = n
+            if 'ingest' in toolset:
+                metrics.set('ingest_queue_depth', toolset['ingest'].pending())
+            if 'ledger_batch' in toolset:
+                metrics.set('ledger_pending', toolset['ledger_batch'].pending())
+            if checkpointer is not None and checkpointer.due(tick):
+                with metrics.time('checkpoint_seconds'):
+                    checkpointer.save(state, tick + 1, checkpoint_meta())
+            metrics.maybe_export()
+            log.info("tick end", extra={'tick': tick + 1})
+
+        invoke = lambda n, t: run_node(n, state, toolset, llm, config, metrics)
+        with profiled(profile_path) if profile_path else contextlib.nullcontext():
+            if scheduler == "events":
+                events = EventScheduler(load_nodes(), max_latency=max_latency, min_interval=min_interval)
+                if control is not None:
+                    control.scheduler = events
+                if 'ingest' in toolset:
+                    toolset['ingest'].on_data = events.notify
+                loop = asyncio.get_running_loop()
+                handled = []
+                for sig in (signal.SIGINT, signal.SIGTERM):
+                    try:
+                        loop.add_signal_handler(sig, events.stop)
+                        handled.append(sig)
+                    except (NotImplementedError, RuntimeError, ValueError):
+                        pass
+                try:
+                    await events.run(state, invoke, max_waves=iterations, stop_when_idle=stop_when_idle,
+                                     on_wave_start=lambda w, dirty: tick_start(first_tick + w),
+                                     on_wave_end=lambda w, changed: tick_end(first_tick + w))
+                finally:
+                    for sig in handled:
+                        loop.remove_signal_handler(sig)
+                    if 'ingest' in toolset:
+                        toolset['ingest'].on_data = None
+            elif scheduler == "dag":
+                dag = DagScheduler(load_nodes(), max_inflight_ticks=max_inflight_ticks)
+                await dag.run(iterations, invoke, tick_interval=tick_interval,
+                              on_tick_start=lambda t: tick_start(first_tick + t),
+                              on_tick_end=lambda t: tick_end(first_tick + t))
+            else:
+                for tick in range(first_tick, first_tick + iterations):
+                    tick_start(tick)
+                    for a in AGENTS:
+                        for n in agent_nodes(a):   # agent modules are imported when first reached
+                            await invoke(n, tick)
+                    tick_end(tick)
+                    await asyncio.sleep(tick_interval)
+    log.info("run complete", extra={'ledger_entries': len(state.get('audit_log', []))})
     return state
 
 if __name__ == "__main__":
-    import asyncio
+    configure_logging()
     asyncio.run(run_graph(iterations=5))
@@ -0,0 +1,249 @@
+# ingest.py
+import asyncio, json, math, struct, time
+from state_store import Event
+
+OVERFLOW_POLICIES = ('block', 'drop_newest', 'drop_oldest')
+
+# --- Wire formats ---
+# Newline-delimited JSON: {"timestamp", "sensor_id", "sensor_type", "location", "value"[, "source"]}
+# Compact binary frame: MAGIC, then <d ts><d value><B len><sensor_id><B len><sensor_type><B len><location>
+MAGIC = b"GM"
+MAX_LINE = 1 << 20
+MAX_FIELD = 255     # string fields carry a one-byte length prefix
+_HEAD = struct.Struct("<2sdd")
+
+def encode_frame(sensor_id, sensor_type, location, value, ts=None):
+    """One binary sensor frame (ts defaults to now). String fields are at most MAX_FIELD bytes as UTF-8."""
+    parts = [_HEAD.pack(MAGIC, time.time() if ts is None else float(ts), float(value))]
+    for name, s in (('sensor_id', sensor_id), ('sensor_type', sensor_type), ('location', location)):
+        b = s.encode()
+        if len(b) > MAX_FIELD:
+            raise ValueError(f"{name} is {len(b)} bytes as UTF-8; binary frames allow at most {MAX_FIELD} "
+                             f"(send this reading as a JSON line instead)")
+        parts.append(bytes([len(b)]) + b)
+    return b"".join(parts)
+
+def decode_frames(data):
+    """Decode back-to-back binary frames -> list of raw dicts (raises ValueError on a bad frame)."""
+    out, i, n = [], 0, len(data)
+    while i < n:
+        if n - i < _HEAD.size:
+            raise ValueError("truncated frame")
+        magic, ts, value = _HEAD.unpack_from(data, i)
+        if magic != MAGIC:
+            raise ValueError("bad frame magic")
+        i += _HEAD.size
+        fields = []
+        for _ in range(3):
+            if i >= n or i + 1 + data[i] > n:
+                raise ValueError("truncated frame")
+            ln = data[i]
+            fields.append(data[i+1:i+1+ln].decode())
+            i += 1 + ln
+        out.append({'timestamp': ts, 'sensor_id': fields[0], 'sensor_type': fields[1],
+                    'location': fields[2], 'value': value})
+    return out
+
+def to_event(raw, source="live"):
+    """
+    Same checks as agents.perception.Observation, without building a pydantic model per
+    reading: ids/type/location must be non-empty strings and value a finite number.
+    Returns None for a malformed reading.
+    """
+    try:
+        sid, st, loc = raw['sensor_id'], raw['sensor_type'], raw['location']
+        value = float(raw['value'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (sid and st and loc) or not all(isinstance(s, str) for s in (sid, st, loc)):
+        return None
+    if not math.isfinite(value):
+        return None
+    ts = raw.get('timestamp', raw.get('ts'))
+    return Event(str(time.time() if ts is None else ts), sid, st, loc, value, raw.get('source', source))
+
+# --- Ingestion server ---
+class IngestServer:
+    """
+    Live sensor front end. Accepts newline-delimited JSON over TCP, and JSON lines or
+    binary frames (encode_frame, several per datagram) over UDP, and buffers validated
+    Events in a bounded asyncio.Queue that the perception agent drains once per tick.
+    overflow, when the queue is full:
+      'block'       - TCP readers stop reading until there is room (kernel flow control
+                      pushes back on the sender); UDP has no backpressure and drops
+      'drop_newest' - discard the incoming reading
+      'drop_oldest' - discard the oldest queued reading to make room
+    Queue items are (receive time, Event); receive times are time.perf_counter() values,
+    kept so callers can measure ingest -> world_state latency.
+    stats: received, accepted, malformed, dropped, drained, connections.
+    on_data: optional callable run whenever readings are queued (e.g. EventScheduler.notify).
+    """
+    def __init__(self, host="127.0.0.1", tcp_port=0, udp_port=None, maxsize=100_000,
+                 overflow='drop_newest', source="live"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}")
+        self.host = host
+        self.tcp_port = tcp_port
+        self.udp_port = udp_port
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.source = source
+        self.queue = asyncio.Queue(maxsize)
+        self.stats = {'received': 0, 'accepted': 0, 'malformed': 0, 'dropped': 0,
+                      'drained': 0, 'connections': 0}
+        self._server = None
+        self._transport = None
+        self._conns = set()
+        self.on_data = None
+
+    async def start(self):
+        """Bind the listeners; tcp_port/udp_port 0 picks a free port (see .tcp_port/.udp_port after start)."""
+        if self.tcp_port is not None:
+            self._server = await asyncio.start_server(self._handle_tcp, self.host, self.tcp_port)
+            self.tcp_port = self._server.sockets[0].getsockname()[1]
+        if self.udp_port is not None:
+            loop = asyncio.get_running_loop()
+            self._transport, _ = await loop.create_datagram_endpoint(
+                lambda: _UdpProtocol(self), local_addr=(self.host, self.udp_port))
+            self.udp_port = self._transport.get_extra_info('sockname')[1]
+        return self
+
+    @property
+    def running(self):
+        return self._server is not None or self._transport is not None
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            for w in list(self._conns):
+                w.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # --- intake ---
+    def _parse(self, data):
+        """Raw dicts from one line/datagram (JSON line, JSON list, or binary frames)."""
+        if data[:2] == MAGIC:
+            return decode_frames(data)
+        obj = json.loads(data)
+        return obj if isinstance(obj, list) else [obj]
+
+    def offer(self, data, now=None):
+        """Non-blocking intake of one line/datagram; returns the number of readings queued."""
+        now = time.perf_counter() if now is None else now
+        queued = 0
+        for ev in self._events(data):
+            if self.queue.full():
+                if self.overflow == 'drop_oldest':
+                    self.queue.get_nowait()
+                    self.stats['dropped'] += 1
+                else:
+                    self.stats['dropped'] += 1
+                    continue
+            self.queue.put_nowait((now, ev))
+            queued += 1
+        self.stats['accepted'] += queued
+        if queued and self.on_data:
+            self.on_data()
+        return queued
+
+    async def put(self, data):
+        """Intake that waits for queue space (the 'block' policy)."""
+        now = time.perf_counter()
+        for ev in self._events(data):
+            await self.queue.put((now, ev))
+            self.stats['accepted'] += 1
+            if self.on_data:
+                self.on_data()
+
+    def _events(self, data):
+        try:
+            raws = self._parse(data)
+        except (ValueError, UnicodeDecodeError):
+            self.stats['received'] += 1
+            self.stats['malformed'] += 1
+            return []
+        self.stats['received'] += len(raws)
+        events = []
+        for raw in raws:
+            ev = to_event(raw, self.source) if isinstance(raw, dict) else None
+            if ev is None:
+                self.stats['malformed'] += 1
+            else:
+                events.append(ev)
+        return events
+
+    async def _handle_tcp(self, reader, writer):
+        self.stats['connections'] += 1
+        self._conns.add(writer)
+        block = self.overflow == 'block'
+        tail = b""
+        try:
+            while True:
+                # read whatever has arrived and split it into lines ourselves:
+                # much cheaper than one readline() await per reading
+                try:
+                    chunk = await reader.read(1 << 16)
+                except ConnectionError:
+                    break       # peer went away (close() drops connections the same way)
+                if not chunk:
+                    break
+                lines = (tail + chunk).split(b"\n")
+                tail = lines.pop()
+                if len(tail) > MAX_LINE:
+                    self.stats['received'] += 1
+                    self.stats['malformed'] += 1
+                    tail = b""
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    if block:
+                        await self.put(line)
+                    else:
+                        self.offer(line)
+            if tail.strip():
+                if block:
+                    await self.put(tail)
+                else:
+                    self.offer(tail)
+        finally:
+            self._conns.discard(writer)
+            writer.close()
+
+    # --- output ---
+    def drain(self, max_items=None):
+        """Everything queued right now (up to max_items): (events, receive_times)."""
+        q = self.queue
+        n = q.qsize() if max_items is None else min(max_items, q.qsize())
+        events, recv = [], []
+        for _ in range(n):
+            t, ev = q.get_nowait()
+            recv.append(t)
+            events.append(ev)
+        self.stats['drained'] += n
+        return events, recv
+
+    def pending(self):
+        return self.queue.qsize()
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, addr):
+        # one datagram may hold several newline-delimited JSON readings
+        if data[:2] == MAGIC:
+            self.server.offer(data)
+            return
+        for line in data.splitlines():
+            if line.strip():
+                self.server.offer(line)
@@ -0,0 +1,293 @@
+# instrumentation.py
+import os, sys, io, json, math, time, inspect, logging, cProfile, pstats, contextvars
+from contextlib import contextmanager
+
+# agent whose node is currently running (set by graph.run_node); labels tool / LLM timings
+current_agent = contextvars.ContextVar('current_agent', default=None)
+
+# --- Histograms ---
+class Histogram:
+    """
+    Log-bucketed histogram: constant memory, quantiles within ~2% relative error.
+    Values <= 0 fall in a single zero bucket.
+    """
+    __slots__ = ('buckets', 'count', 'sum', 'min', 'max')
+    GROWTH = 1.04
+    _LOG_GROWTH = math.log(GROWTH)
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, v):
+        b = math.ceil(math.log(v) / self._LOG_GROWTH) if v > 0 else None
+        self.buckets[b] = self.buckets.get(b, 0) + 1
+        self.count += 1
+        self.sum += v
+        if v < self.min:
+            self.min = v
+        if v > self.max:
+            self.max = v
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for b in sorted(self.buckets, key=lambda b: -math.inf if b is None else b):
+            seen += self.buckets[b]
+            if seen > rank:
+                if b is None:
+                    return 0.0
+                # geometric middle of the bucket, clamped to what was actually seen
+                v = self.GROWTH ** (b - 0.5)
+                return min(max(v, self.min), self.max)
+        return self.max
+
+    def snapshot(self):
+        return {'count': self.count, 'sum': self.sum, 'mean': self.sum / self.count if self.count else None,
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95), 'p99': self.quantile(0.99),
+                'max': self.max if self.count else None}
+
+# --- Metrics registry ---
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+def _escape(value):
+    # Prometheus text format: backslash, double quote and newline are escaped in label values
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _fmt_labels(key, extra=()):
+    # a label that is None (e.g. no current agent) is left out rather than exported as "None"
+    items = [(k, v) for k, v in list(key) + list(extra) if v is not None]
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+class Metrics:
+    """
+    Histograms, counters and gauges keyed by name + labels, e.g.
+        with metrics.time('agent_seconds', agent='planner'): ...
+        metrics.observe('events_per_tick', 12); metrics.set('ingest_queue_depth', 40)
+    trace_path: also append every timed span to a JSONL trace (buffered, written on flush()).
+    export_path: Prometheus text file refreshed by maybe_export() (at most every
+    export_interval seconds) and on flush().
+    """
+    def __init__(self, prefix="greenmesh", trace_path=None, export_path=None, export_interval=5.0):
+        self.prefix = prefix
+        self.trace_path = trace_path
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self.histograms = {}   # name -> {label key: Histogram}
+        self.counters = {}
+        self.gauges = {}
+        self._spans = []
+        self._last_export = time.monotonic()
+
+    def observe(self, name, value, **labels):
+        series = self.histograms.setdefault(name, {})
+        k = _key(labels)
+        h = series.get(k)
+        if h is None:
+            h = series[k] = Histogram()
+        h.observe(value)
+
+    def inc(self, name, n=1, **labels):
+        series = self.counters.setdefault(name, {})
+        k = _key(labels)
+        series[k] = series.get(k, 0) + n
+
+    def set(self, name, value, **labels):
+        self.gauges.setdefault(name, {})[_key(labels)] = value
+
+    @contextmanager
+    def time(self, name, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t0
+            self.observe(name, dt, **labels)
+            if self.trace_path:
+                self._spans.append({'ts': time.time() - dt, 'name': name, 'dur': dt, **labels})
+
+    def timed(self, name, fn, **labels):
+        """fn wrapped so each call is observed in `name` (labelled with the calling agent)."""
+        if inspect.iscoroutinefunction(fn) or inspect.iscoroutinefunction(getattr(fn, '__call__', None)):
+            async def wrapper(*args, **kw):
+                with self.time(name, agent=current_agent.get(), **labels):
+                    return await fn(*args, **kw)
+        else:
+            def wrapper(*args, **kw):
+                with self.time(name, agent=current_agent.get(), **labels):
+                    return fn(*args, **kw)
+        wrapper.__name__ = getattr(fn, '__name__', name)
+        wrapper.__wrapped__ = fn
+        return wrapper
+
+    # --- export ---
+    def summary(self):
+        """{histogram: {label string: snapshot}} plus counters and gauges, for logs / JSON."""
+        out = {name: {_fmt_labels(k) or 'all': h.snapshot() for k, h in series.items()}
+               for name, series in self.histograms.items()}
+        for kind in (self.counters, self.gauges):
+            for name, series in kind.items():
+                out[name] = {_fmt_labels(k) or 'all': v for k, v in series.items()}
+        return out
+
+    def to_prometheus(self):
+        lines = []
+        for name, series in sorted(self.histograms.items()):
+            full = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {full} summary")
+            for k, h in series.items():
+                for q in (0.5, 0.95, 0.99):
+                    lines.append(f"{full}{_fmt_labels(k, [('quantile', q)])} {h.quantile(q):.6g}")
+                lines.append(f"{full}_sum{_fmt_labels(k)} {h.sum:.6g}")
+                lines.append(f"{full}_count{_fmt_labels(k)} {h.count}")
+        for kind, typ in ((self.counters, 'counter'), (self.gauges, 'gauge')):
+            for name, series in sorted(kind.items()):
+                full = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {full} {typ}")
+                for k, v in series.items():
+                    lines.append(f"{full}{_fmt_labels(k)} {v}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Atomic write, so a node_exporter textfile collector never sees half a file."""
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def maybe_export(self):
+        if self.export_path and time.monotonic() - self._last_export >= self.export_interval:
+            self.write_prometheus(self.export_path)
+            self._last_export = time.monotonic()
+
+    def flush(self):
+        if self._spans:
+            with open(self.trace_path, "a") as f:
+                f.write("".join(json.dumps(s) + "\n" for s in self._spans))
+            self._spans = []
+        if self.export_path:
+            self.write_prometheus(self.export_path)
+            self._last_export = time.monotonic()
+
+class TimedLLM:
+    """LLM proxy that records time spent waiting on acall()/call() per calling agent."""
+    def __init__(self, llm, metrics):
+        self.llm = llm
+        self.metrics = metrics
+
+    async def acall(self, *args, **kw):
+        with self.metrics.time('llm_wait_seconds', agent=current_agent.get()):
+            return await self.llm.acall(*args, **kw)
+
+    def call(self, *args, **kw):
+        with self.metrics.time('llm_wait_seconds', agent=current_agent.get()):
+            return self.llm.call(*args, **kw)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+# --- Profiling ---
+@contextmanager
+def profiled(path, top=30):
+    """
+    cProfile the block; writes path (pstats, open with snakeviz or turn into a flamegraph
+    with flameprof / gprof2dot) and path + '.txt' (top functions by cumulative time).
+    """
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield prof
+    finally:
+        prof.disable()
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        prof.dump_stats(path)
+        buf = io.StringIO()
+        pstats.Stats(prof, stream=buf).sort_stats('cumulative').print_stats(top)
+        with open(path + ".txt", "w") as f:
+            f.write(buf.getvalue())
+
+# --- Structured, rate-limited logging ---
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class StructuredFormatter(logging.Formatter):
+    """
+    One line per record: 'ts level logger message key=value ...' with the fields passed in
+    extra={...}, or a JSON object per line with json_lines=True.
+    """
+    def __init__(self, json_lines=False):
+        super().__init__()
+        self.json_lines = json_lines
+
+    def format(self, record):
+        fields = {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+        if self.json_lines:
+            out = {'ts': round(record.created, 3), 'level': record.levelname,
+                   'logger': record.name, 'msg': record.getMessage(), **fields}
+            if record.exc_info:
+                out['exc'] = self.formatException(record.exc_info)
+            return json.dumps(out, default=str)
+        ts = time.strftime("%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}"
+        kv = " ".join(f"{k}={v}" for k, v in fields.items())
+        line = f"{ts} {record.levelname:<5} {record.name} {record.getMessage()}" + (f" {kv}" if kv else "")
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most `burst` records per (logger, message template) every `interval`
+    seconds; the first record after a quiet period carries suppressed=<n dropped>.
+    Warnings and errors are never dropped.
+    """
+    def __init__(self, burst=10, interval=1.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows = {}   # key -> [window start, passed, suppressed]
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg)
+        now = record.created
+        w = self._windows.get(key)
+        if w is None or now - w[0] >= self.interval:
+            dropped = w[2] if w else 0
+            self._windows[key] = [now, 1, 0]
+            if dropped:
+                record.suppressed = dropped
+            return True
+        if w[1] < self.burst:
+            w[1] += 1
+            return True
+        w[2] += 1
+        return False
+
+def get_logger(name):
+    return logging.getLogger(f"greenmesh.{name}")
+
+def configure_logging(level="INFO", json_lines=False, burst=10, interval=1.0, stream=None):
+    """Structured, rate-limited console logging for the greenmesh.* loggers."""
+    root = logging.getLogger("greenmesh")
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(StructuredFormatter(json_lines))
+    handler.addFilter(RateLimitFilter(burst, interval))
+    root.addHandler(handler)
+    root.setLevel(level)
+    root.propagate = False
+    return root
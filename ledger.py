@@ -0,0 +1,414 @@
+# ledger.py
+import os, re, json, hashlib, time, asyncio
+from instrumentation import get_logger
+
+log = get_logger('ledger')
+
+# --- Hash chain helpers ---
+def chain_hash(payload):
+    """
+    payload: dict with ts, entry, prev -> sha256 hex digest used as 'hash'.
+    Must stay byte-for-byte compatible with existing data/ledger.jsonl files.
+    """
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+# --- Segments ---
+# A ledger at data/ledger.jsonl may be rotated into data/ledger.000001.jsonl, ... (oldest
+# first); the chain runs on across segments and the unnumbered file is the active one.
+INDEX_SUFFIX = ".idx.npz"   # per-segment offset index written by ledger_index.LedgerReader
+
+def _segments(path):
+    """[(number, segment path)] of the rotated segments, oldest first."""
+    d, base = os.path.split(path)
+    root, ext = os.path.splitext(base)
+    pat = re.compile(re.escape(root) + r"\.(\d{6,})" + re.escape(ext) + "$")
+    if not os.path.isdir(d or "."):
+        return []
+    segs = []
+    for name in os.listdir(d or "."):
+        m = pat.match(name)
+        if m:
+            segs.append((int(m.group(1)), os.path.join(d, name)))
+    return sorted(segs)
+
+def segment_paths(path):
+    """Rotated segments of the ledger at path, oldest first, then the active file (if any)."""
+    out = [p for _, p in _segments(path)]
+    if os.path.exists(path):
+        out.append(path)
+    return out
+
+def segment_path(path, n):
+    root, ext = os.path.splitext(path)
+    return f"{root}.{n:06d}{ext}"
+
+def tail_entry(path, block_size=4096):
+    """
+    (last entry, torn offset, missing newline) for one ledger file. A crash mid-append can
+    leave the final line cut short: if it doesn't parse, its start offset is returned as
+    the torn offset and the entry is the line before it. Only the final line can be torn,
+    so an unparseable line before it raises ValueError (the file is corrupt).
+    """
+    if not os.path.exists(path):
+        return None, None, False
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        buf = b""
+        while pos > 0 and buf.count(b"\n") < 3:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+    lines, off = [], pos
+    for line in buf.split(b"\n"):
+        lines.append((off, line))
+        off += len(line) + 1
+    last = len(lines) - 1               # the piece after the last newline (unterminated)
+    torn = None
+    for i in range(last, 0 if pos else -1, -1):      # buf's first piece may be partial
+        start, line = lines[i]
+        if not line.strip():
+            continue
+        try:
+            return json.loads(line), torn, i == last
+        except ValueError:
+            if torn is not None:
+                raise ValueError(f"ledger {path} is corrupt before byte {torn}") from None
+            torn = start
+    return None, torn, False
+
+def recover_head(path):
+    """Hash of the last entry in the ledger at path ('' for a missing/empty ledger); a torn last line is skipped."""
+    for seg in reversed(segment_paths(path)):
+        entry = tail_entry(seg)[0]
+        if entry is not None:
+            return entry.get("hash", "")
+    return ""
+
+def repair_tail(path, aside=None):
+    """
+    Cut a torn last line (left by a crash mid-append) off the active ledger file, so the
+    next entry starts on a line of its own and chains onto the last complete one. The cut
+    bytes go to `aside` (default: ledger.torn.jsonl next to ledger.jsonl) rather than being
+    dropped. A complete last entry that only lost its newline gets the newline back.
+    Returns the number of bytes moved aside.
+    """
+    _, torn, newline = tail_entry(path)
+    if torn is None:
+        if newline:
+            with open(path, "ab") as f:
+                f.write(b"\n")
+        return 0
+    with open(path, "r+b") as f:
+        f.seek(torn)
+        cut = f.read()
+        f.truncate(torn)
+    with open(aside or os.path.splitext(path)[0] + ".torn.jsonl", "ab") as f:
+        f.write(cut.rstrip(b"\r\n") + b"\n")
+    if os.path.exists(path + INDEX_SUFFIX):
+        os.remove(path + INDEX_SUFFIX)
+    return len(cut)
+
+def rewind(path, head, pending=(), aside=None):
+    """
+    Bring the ledger at path back to chain head `head` (e.g. a checkpoint's), for resuming
+    a run from that point: entries appended after head are moved from the active file to
+    `aside` (default: ledger.rolled_back.jsonl next to ledger.jsonl) rather than dropped,
+    and `pending` lines (chained but not yet written when head was recorded) that are
+    missing from the file are appended.
+    Returns (entries moved aside, entries re-appended); raises ValueError when head is not
+    in the active file or pending.
+    """
+    repair_tail(path)
+    current = recover_head(path)
+    if current == head:
+        return 0, 0
+    pending = list(pending)
+    chain = [json.loads(line) for line in pending]
+    for i, p in enumerate(chain):
+        if p.get('prev') == current:
+            with open(path, "a") as f:
+                f.write("".join(pending[i:]))
+            return 0, len(pending) - i
+    if not os.path.exists(path):
+        raise ValueError(f"ledger {path} is missing; cannot rewind to {head[:12]}")
+    with open(path, "rb") as f:
+        lines = f.readlines()
+    cut = 0 if not head and not _segments(path) else None
+    for i, line in enumerate(lines):
+        if line.strip() and json.loads(line).get('hash') == head:
+            cut = i + 1
+            break
+    if cut is None:
+        raise ValueError(f"chain head {head[:12]} not found in the active ledger file {path}")
+    moved = [line for line in lines[cut:] if line.strip()]
+    with open(aside or os.path.splitext(path)[0] + ".rolled_back.jsonl", "ab") as f:
+        f.write(b"".join(moved))
+    with open(path, "r+b") as f:
+        f.truncate(sum(len(line) for line in lines[:cut]))
+    if os.path.exists(path + INDEX_SUFFIX):
+        os.remove(path + INDEX_SUFFIX)      # stale offsets; the reader rebuilds it
+    return len(moved), 0
+
+# --- Append-only writer ---
+class LedgerWriter:
+    """
+    Keeps the chain head in memory and the ledger file open in append mode,
+    so each append costs O(1) regardless of ledger size.
+    The head is recovered once on startup by seeking to the end of the file; a torn last
+    line from a crash mid-append is moved aside first (see repair_tail).
+    Assumes this writer is the only appender for the path (the ledger is never truncated).
+    max_segment_bytes: rotate the active file into a numbered segment once it reaches
+    this size (None = never); the chain continues in the fresh active file.
+    After a failed write the head may be ahead of the file, so the writer refuses further
+    entries (error holds the cause); a new LedgerWriter recovers the head from the file.
+    """
+    def __init__(self, path="data/ledger.jsonl", max_segment_bytes=None):
+        self.path = path
+        self.max_segment_bytes = max_segment_bytes
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        torn = repair_tail(path)
+        if torn:
+            log.warning("torn ledger tail moved aside", extra={'path': path, 'bytes': torn})
+        self.head = recover_head(path)
+        self.error = None
+        self._f = open(path, "a")
+
+    def make_payload(self, entry, now=None):
+        """Chain entry onto the current head (does not write)."""
+        if self.error is not None:
+            raise RuntimeError(f"ledger writer for {self.path} failed earlier ({self.error!r}); "
+                               "open a new one to continue from the head in the file")
+        payload = {'ts': time.time() if now is None else now, 'entry': entry}
+        payload['prev'] = self.head
+        payload['hash'] = chain_hash(payload)
+        self.head = payload['hash']
+        return payload
+
+    def append(self, entry):
+        """
+        entry: dict -> appended with timestamp+hash, returns the full payload
+        """
+        payload = self.make_payload(entry)
+        self.write_lines([json.dumps(payload)+"\n"])
+        return payload
+
+    def write_lines(self, lines):
+        """One buffered write for already-chained lines (in chain order)."""
+        try:
+            self._f.write("".join(lines))
+            self._f.flush()
+            if self.max_segment_bytes and self._f.tell() >= self.max_segment_bytes:
+                self.rotate()
+        except Exception as e:
+            self.fail(e)
+            raise
+
+    def fail(self, error):
+        """Stop chaining: entries were chained onto lines that may not be in the file."""
+        if self.error is None:
+            self.error = error
+
+    def rotate(self):
+        """Move the active file to the next numbered segment (with its index) and start a new one."""
+        if not self._f.tell():
+            return None
+        segs = _segments(self.path)
+        seg = segment_path(self.path, segs[-1][0] + 1 if segs else 1)
+        os.fsync(self._f.fileno())
+        self._f.close()
+        os.replace(self.path, seg)
+        if os.path.exists(self.path + INDEX_SUFFIX):
+            os.replace(self.path + INDEX_SUFFIX, seg + INDEX_SUFFIX)
+        self._f = open(self.path, "a")
+        return seg
+
+    def fsync(self):
+        os.fsync(self._f.fileno())
+
+    @property
+    def closed(self):
+        return self._f.closed
+
+    def close(self):
+        if not self._f.closed:
+            try:
+                self._f.close()
+            except OSError:
+                if self.error is None:
+                    raise     # a failed writer may not manage to flush what it buffered
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- Group-commit writer ---
+FSYNC_POLICIES = ('entry', 'batch', 'interval', 'none')
+
+class BatchedLedgerWriter:
+    """
+    Group-commit front end for a LedgerWriter.
+    submit() chains the entry immediately (so order and hash are known up front) and queues it;
+    queued entries are written with one buffered write per batch, when max_batch entries are
+    waiting or max_delay seconds after the first one was queued.
+    fsync policy:
+      'entry'    - write + fsync each entry before resolving its future
+      'batch'    - one fsync per batch
+      'interval' - fsync at most every fsync_interval seconds; a timer fsyncs a written but
+                   un-synced tail within fsync_interval even if no further batch comes (always on close)
+      'none'     - leave durability to the OS
+    Don't mix with LedgerWriter.append on the same writer while entries are queued.
+    """
+    def __init__(self, writer, max_batch=256, max_delay=0.05, fsync='batch', fsync_interval=1.0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.writer = writer
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.fsync_policy = fsync
+        self.fsync_interval = fsync_interval
+        self._queue = []
+        self._inflight = []     # lines of the batch being written ('entry' policy), and
+        self._written = 0       # how many of them are already in the file
+        self._lock = None
+        self._timer = None
+        self._fsync_timer = None
+        self._dirty = False     # written since the last fsync
+        self._flush_scheduled = False
+        self._tasks = set()
+        self._last_fsync = time.monotonic()
+        self.stats = {'entries': 0, 'batches': 0, 'fsyncs': 0}
+
+    def submit(self, entry):
+        """
+        Queue entry for the next batch.
+        Returns (payload, future) - payload already carries prev/hash, the future
+        resolves to the hash once the entry is committed per the fsync policy.
+        """
+        loop = asyncio.get_running_loop()
+        payload = self.writer.make_payload(entry)
+        fut = loop.create_future()
+        self._queue.append((json.dumps(payload)+"\n", payload['hash'], fut))
+        if self._flush_scheduled:
+            pass
+        elif len(self._queue) >= self.max_batch:
+            self._spawn_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._spawn_flush)
+        return payload, fut
+
+    async def append(self, entry):
+        """Submit and wait for commit; returns the payload."""
+        payload, fut = self.submit(entry)
+        await fut
+        return payload
+
+    def _spawn_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._flush_scheduled = True
+        task = asyncio.ensure_future(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task):
+        self._tasks.discard(task)
+        # errors are already delivered through the entries' futures
+        if not task.cancelled():
+            task.exception()
+
+    async def flush(self, force_fsync=False):
+        """Write everything queued so far as one batch."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            batch, self._queue = self._queue, []
+            self._flush_scheduled = False
+            if not batch:
+                if force_fsync:
+                    await self._fsync()
+                return 0
+            try:
+                if self.fsync_policy == 'entry':
+                    self._inflight, self._written = [line for line, _, _ in batch], 0
+                    for line, h, fut in batch:
+                        self.writer.write_lines([line])
+                        self._written += 1
+                        self._dirty = True
+                        await self._fsync()
+                        if not fut.done():
+                            fut.set_result(h)
+                else:
+                    self.writer.write_lines([line for line, _, _ in batch])
+                    self._dirty = True
+                    if (force_fsync or self.fsync_policy == 'batch' or
+                            (self.fsync_policy == 'interval' and
+                             time.monotonic() - self._last_fsync >= self.fsync_interval)):
+                        await self._fsync()
+                    elif self.fsync_policy == 'interval':
+                        self._schedule_fsync()
+                    for _, h, fut in batch:
+                        if not fut.done():
+                            fut.set_result(h)
+            except Exception as e:
+                # the head now runs ahead of the file: fail this batch and everything
+                # chained after it, and refuse further entries
+                self.writer.fail(e)
+                rest, self._queue = self._queue, []
+                for _, _, fut in batch + rest:
+                    if not fut.done():
+                        fut.set_exception(e)
+                raise
+            finally:
+                self._inflight, self._written = [], 0
+            self.stats['entries'] += len(batch)
+            self.stats['batches'] += 1
+            return len(batch)
+
+    async def _fsync(self):
+        # fsync can take milliseconds; keep it off the event loop
+        self._dirty = False
+        await asyncio.get_running_loop().run_in_executor(None, self.writer.fsync)
+        self._last_fsync = time.monotonic()
+        self.stats['fsyncs'] += 1
+
+    def _schedule_fsync(self):
+        # 'interval': make sure a written tail is synced within fsync_interval even when idle
+        if self._fsync_timer is None:
+            delay = max(0.0, self.fsync_interval - (time.monotonic() - self._last_fsync))
+            self._fsync_timer = asyncio.get_running_loop().call_later(delay, self._timed_fsync)
+
+    def _timed_fsync(self):
+        self._fsync_timer = None
+        if self._dirty and not self.writer.closed:
+            task = asyncio.ensure_future(self._fsync())
+            self._tasks.add(task)
+            task.add_done_callback(self._flush_done)
+
+    def pending(self):
+        return len(self._queue)
+
+    def queued(self):
+        """
+        Chained lines not written yet (in chain order), e.g. to record with a checkpoint -
+        including the unwritten rest of a batch that is being written entry by entry.
+        """
+        return self._inflight[self._written:] + [line for line, _, _ in self._queue]
+
+    async def close(self):
+        """Flush remaining entries (with a final fsync unless policy is 'none')."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._fsync_timer is not None:
+            self._fsync_timer.cancel()
+            self._fsync_timer = None
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        await self.flush(force_fsync=self.fsync_policy != 'none')
@@ -0,0 +1,362 @@
+# ledger_index.py
+import os, json, mmap, shutil
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from ledger import chain_hash, segment_paths, _segments, INDEX_SUFFIX
+
+INDEX_FIELDS = ('plan_id', 'plan_name', 'zone')   # entry fields with a lookup index
+INDEX_VERSION = 1
+CHUNK_BYTES = 8 << 20
+
+# --- Chunk scanning (runs in worker processes) ---
+def _complete_size(path):
+    """Bytes of path up to and including its last newline (a partly written line is skipped)."""
+    size = os.path.getsize(path)
+    if not size:
+        return 0
+    with open(path, "rb") as f:
+        pos = size
+        while pos > 0:
+            step = min(1 << 16, pos)
+            pos -= step
+            f.seek(pos)
+            nl = f.read(step).rfind(b"\n")
+            if nl != -1:
+                return pos + nl + 1
+    return 0
+
+def _chunks(path, start, stop, chunk=CHUNK_BYTES):
+    """Byte ranges [a, b) covering [start, stop) of path, split at line boundaries."""
+    out = []
+    with open(path, "rb") as f:
+        a = start
+        while a < stop:
+            b = min(a + chunk, stop)
+            if b < stop:
+                f.seek(b)
+                b = min(b + len(f.readline()), stop)
+            out.append((a, b))
+            a = b
+    return out
+
+def _lines(path, a, b):
+    """(offset, payload or None if unparseable) for each non-empty line in [a, b)."""
+    with open(path, "rb") as f:
+        f.seek(a)
+        data = f.read(b - a)
+    pos = a
+    for line in data.splitlines(keepends=True):
+        off, pos = pos, pos + len(line)
+        if not line.strip():
+            continue
+        try:
+            yield off, json.loads(line)
+        except ValueError:
+            yield off, None
+
+def _index_chunk(path, a, b):
+    """Index columns for the lines in [a, b): offsets, ts, INDEX_FIELDS, and the last hash."""
+    offsets, ts, cols, last = [], [], {k: [] for k in INDEX_FIELDS}, None
+    for off, p in _lines(path, a, b):
+        if p is None:
+            continue
+        entry = p.get('entry') if isinstance(p.get('entry'), dict) else {}
+        offsets.append(off)
+        ts.append(p.get('ts') or 0.0)
+        for k in INDEX_FIELDS:
+            v = entry.get(k)
+            cols[k].append('' if v is None else str(v))
+        last = p.get('hash')
+    out = {'offsets': np.array(offsets, dtype=np.int64), 'ts': np.array(ts, dtype=np.float64)}
+    out.update({k: np.array(v, dtype=str) for k, v in cols.items()})
+    return out, last
+
+def _verify_chunk(path, a, b):
+    """
+    Recompute every hash in [a, b) and check the links inside the chunk.
+    Returns (entries, first prev, last hash, [(offset, error)]); links across chunks are
+    checked by the caller.
+    """
+    n, first_prev, prev, errors = 0, None, None, []
+    for off, p in _lines(path, a, b):
+        if p is None:
+            errors.append((off, "unparseable line"))
+            continue
+        h = p.get('hash')
+        if chain_hash({k: v for k, v in p.items() if k != 'hash'}) != h:
+            errors.append((off, "hash mismatch"))
+        if n == 0:
+            first_prev = p.get('prev')
+        elif p.get('prev') != prev:
+            errors.append((off, "broken link"))
+        prev = h
+        n += 1
+    return n, first_prev, prev, errors
+
+def _empty_cols():
+    cols = {'offsets': np.empty(0, dtype=np.int64), 'ts': np.empty(0, dtype=np.float64)}
+    cols.update({k: np.empty(0, dtype=str) for k in INDEX_FIELDS})
+    return cols
+
+def _map(fn, tasks, workers):
+    if workers <= 1 or len(tasks) <= 1:
+        return [fn(*t) for t in tasks]
+    with ProcessPoolExecutor(min(workers, len(tasks))) as pool:
+        return list(pool.map(fn, *zip(*tasks)))
+
+# --- Per-segment index ---
+class _Segment:
+    """
+    Offset index for one segment file, persisted next to it (INDEX_SUFFIX) and extended
+    incrementally as the file grows; the file itself is read through mmap.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self.head = ''
+        self.cols = None
+        self.mm = None
+        self._postings = {}
+
+    def __len__(self):
+        return len(self.cols['offsets']) if self.cols is not None else 0
+
+    def _empty(self):
+        self.size, self.head, self._postings = 0, '', {}
+        self.cols = _empty_cols()
+
+    def _line_before(self, size):
+        start = self.mm.rfind(b"\n", 0, size - 1) + 1
+        return self.mm[start:size]
+
+    def _head_ok(self):
+        """The indexed prefix is still in the file: the line ending at self.size has self.head."""
+        if not self.size:
+            return True
+        if self.mm is None or len(self.mm) < self.size:
+            return False
+        try:
+            return json.loads(self._line_before(self.size)).get('hash') == self.head
+        except ValueError:
+            return False
+
+    def _remap(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        if os.path.getsize(self.path):
+            with open(self.path, "rb") as f:
+                self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def load(self):
+        try:
+            with np.load(self.path + INDEX_SUFFIX, allow_pickle=False) as z:
+                if int(z['version']) != INDEX_VERSION:
+                    return False
+                self.size, self.head = int(z['size']), str(z['head'])
+                self.cols = {k: z[k] for k in ('offsets', 'ts') + INDEX_FIELDS}
+                return True
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def save(self):
+        tmp = self.path + INDEX_SUFFIX + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, version=INDEX_VERSION, size=self.size, head=self.head, **self.cols)
+        os.replace(tmp, self.path + INDEX_SUFFIX)
+
+    def update(self, workers=1, persist=True):
+        """Index lines appended since the last update (rebuild if the file was replaced)."""
+        if self.cols is None and not (persist and self.load()):
+            self._empty()
+        size = _complete_size(self.path)
+        self._remap()
+        if size < self.size or not self._head_ok():
+            self._empty()
+        if size == self.size:
+            return 0
+        parts = _map(_index_chunk, [(self.path, a, b) for a, b in _chunks(self.path, self.size, size)], workers)
+        added = sum(len(p['offsets']) for p, _ in parts)
+        self.cols = {k: np.concatenate([self.cols[k]] + [p[k] for p, _ in parts]) for k in self.cols}
+        self.head = next((h for _, h in reversed(parts) if h is not None), self.head)
+        self.size = size
+        self._postings = {}
+        if persist:
+            self.save()
+        return added
+
+    def entry(self, i):
+        off = int(self.cols['offsets'][i])
+        end = self.mm.find(b"\n", off, self.size)
+        return json.loads(self.mm[off:end if end != -1 else self.size])
+
+    def lookup(self, field, value):
+        """Rows where field == value (sorted), from a value -> rows posting list built on first use."""
+        post = self._postings.get(field)
+        if post is None:
+            vals, inv = np.unique(self.cols[field], return_inverse=True)
+            order = np.argsort(inv, kind='stable')
+            bounds = np.searchsorted(inv[order], np.arange(len(vals) + 1))
+            post = self._postings[field] = (vals, order, bounds)
+        vals, order, bounds = post
+        i = int(np.searchsorted(vals, value))
+        if i == len(vals) or vals[i] != value:
+            return np.empty(0, dtype=np.int64)
+        return order[bounds[i]:bounds[i + 1]]
+
+    def time_range(self, since=None, until=None):
+        ts = self.cols['ts']
+        lo = -np.inf if since is None else since
+        hi = np.inf if until is None else until
+        ordered = self._postings.get('ts')
+        if ordered is None:
+            ordered = self._postings['ts'] = bool(np.all(ts[1:] >= ts[:-1]))
+        if ordered:
+            return np.arange(np.searchsorted(ts, lo, 'left'), np.searchsorted(ts, hi, 'right'))
+        return np.nonzero((ts >= lo) & (ts <= hi))[0]
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+
+# --- Reader ---
+class LedgerReader:
+    """
+    Random access, lookups and chain verification over a (possibly rotated) ledger.
+    Each segment gets a persistent offset index (<segment>.idx.npz: byte offset, ts,
+    plan_id, plan_name, zone per entry) that is extended incrementally on refresh(), so only
+    new lines are ever parsed; entries are read back through mmap.
+    Rows are numbered 0..len-1 across all segments in chain order.
+    workers: processes for index builds and verification (chunks of CHUNK_BYTES).
+    """
+    def __init__(self, path="data/ledger.jsonl", workers=None, persist=True):
+        self.path = path
+        self.workers = workers or os.cpu_count() or 1
+        self.persist = persist
+        self._segs = []
+        self._starts = np.zeros(1, dtype=np.int64)
+        self.refresh()
+
+    def refresh(self):
+        """Pick up appended lines, rotated and compacted segments. Returns the entry count."""
+        old = {s.path: s for s in self._segs}
+        segs = []
+        for p in segment_paths(self.path):
+            seg = old.pop(p, None) or _Segment(p)
+            seg.update(self.workers, self.persist)
+            segs.append(seg)
+        for s in old.values():
+            s.close()
+        self._segs = segs
+        self._starts = np.cumsum([0] + [len(s) for s in segs])
+        return len(self)
+
+    def __len__(self):
+        return int(self._starts[-1])
+
+    def __getitem__(self, row):
+        n = len(self)
+        i = row + n if row < 0 else row
+        if not 0 <= i < n:
+            raise IndexError("ledger row out of range")
+        k = int(np.searchsorted(self._starts, i, 'right')) - 1
+        return self._segs[k].entry(i - int(self._starts[k]))
+
+    def __iter__(self):
+        for seg in self._segs:
+            for i in range(len(seg)):
+                yield seg.entry(i)
+
+    @property
+    def head(self):
+        return next((s.head for s in reversed(self._segs) if len(s)), '')
+
+    def rows(self, plan_id=None, plan_name=None, zone=None, since=None, until=None):
+        """Row numbers (ascending) of entries matching every given filter; ts range is inclusive."""
+        filters = [(k, v) for k, v in zip(INDEX_FIELDS, (plan_id, plan_name, zone)) if v is not None]
+        out = []
+        for start, seg in zip(self._starts, self._segs):
+            hit = None
+            if since is not None or until is not None:
+                hit = seg.time_range(since, until)
+            for field, value in filters:
+                r = seg.lookup(field, str(value))
+                hit = r if hit is None else np.intersect1d(hit, r, assume_unique=True)
+            if hit is None:
+                hit = np.arange(len(seg))
+            out.append(np.sort(hit) + start)
+        return np.concatenate(out) if out else np.empty(0, dtype=np.int64)
+
+    def find(self, limit=None, **filters):
+        """Payloads matching rows(**filters), oldest first (at most limit)."""
+        rows = self.rows(**filters)
+        return [self[int(i)] for i in rows[:limit]]
+
+    def verify(self, workers=None):
+        """
+        Check the whole chain: every hash recomputed and every prev equal to the hash before
+        it, including across chunk and segment boundaries (the first prev must be '').
+        Chunks are verified in parallel. Returns {'ok', 'entries', 'segments', 'chunks',
+        'head', 'errors': [{'segment', 'offset', 'error'}]}.
+        """
+        tasks = [(s.path, a, b) for s in self._segs for a, b in _chunks(s.path, 0, s.size)]
+        results = _map(_verify_chunk, tasks, workers or self.workers)
+        prev, n, errors = '', 0, []
+        for (path, a, _), (count, first_prev, last, errs) in zip(tasks, results):
+            errors.extend({'segment': path, 'offset': off, 'error': e} for off, e in errs)
+            if count:
+                if first_prev != prev:
+                    errors.append({'segment': path, 'offset': a, 'error': "broken link"})
+                prev = last
+            n += count
+        return {'ok': not errors, 'entries': n, 'segments': len(self._segs), 'chunks': len(tasks),
+                'head': prev, 'errors': errors}
+
+    def close(self):
+        for s in self._segs:
+            s.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# --- Compaction ---
+def compact(path, target_bytes=256 << 20):
+    """
+    Merge runs of consecutive rotated segments (never the active file) into segments of up
+    to target_bytes, so a long-running ledger doesn't pile up small files. Bytes are
+    concatenated unchanged: the chain stays intact and the first segment's index of each
+    run stays valid (readers extend it on refresh). Returns the segments written.
+    Run it while nothing rotates this ledger; a crash between writing a merged segment and
+    removing its parts leaves those entries twice (verify() reports it).
+    """
+    groups, cur, cur_size = [], [], 0
+    for _, p in _segments(path):
+        size = os.path.getsize(p)
+        if cur and cur_size + size > target_bytes:
+            groups.append(cur)
+            cur, cur_size = [], 0
+        cur.append(p)
+        cur_size += size
+    groups.append(cur)
+    written = []
+    for group in groups:
+        if len(group) < 2:
+            continue
+        tmp = group[0] + ".tmp"
+        with open(tmp, "wb") as out:
+            for p in group:
+                with open(p, "rb") as f:
+                    shutil.copyfileobj(f, out)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, group[0])
+        for p in group[1:]:
+            os.remove(p)
+            if os.path.exists(p + INDEX_SUFFIX):
+                os.remove(p + INDEX_SUFFIX)
+        written.append(group[0])
+    return written
@@ -1,65 +1,329 @@
-import os, json
-from dotenv import load_dotenv
-import google.generativeai as genai
+import os, json, time, asyncio, hashlib, re, sqlite3, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import get_logger
 
-load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 SIMULATE_IF_NO_KEY = True
+log = get_logger('llm')
+_env_loaded = False
 
+def api_key():
+    """GEMINI_API_KEY from the environment; a .env file is read the first time it's asked for."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+    return os.getenv("GEMINI_API_KEY")
+
+
+# --- Response cache ---
+def normalize_prompt(prompt):
+    """Collapse whitespace so formatting-only differences share a cache entry."""
+    return re.sub(r"\s+", " ", prompt).strip()
+
+class ResponseCache:
+    """
+    Content-addressed LLM response cache.
+    In-memory LRU (max_entries) with TTL (seconds, None = never expire), optionally backed
+    by a SQLite file (path) so entries survive restarts. Counters in self.stats.
+    """
+    def __init__(self, max_entries=1024, ttl=3600.0, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._mem = OrderedDict()   # key -> (expires_at, text)
+        self._lock = threading.Lock()
+        self._db = None
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0, 'disk_hits': 0}
+        if path:
+            d = os.path.dirname(path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, expires_at REAL, text TEXT)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model, temperature, max_tokens, prompt):
+        raw = json.dumps([model, temperature, max_tokens, normalize_prompt(prompt)])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None:
+                if item[0] is None or item[0] > now:
+                    self._mem.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return item[1]
+                del self._mem[key]
+                if self._db is None:
+                    self.stats['expired'] += 1
+            if self._db is not None:
+                row = self._db.execute("SELECT expires_at, text FROM llm_cache WHERE key=?", (key,)).fetchone()
+                if row is not None:
+                    if row[0] is None or row[0] > now:
+                        self._put_mem(key, row[0], row[1])
+                        self.stats['hits'] += 1
+                        self.stats['disk_hits'] += 1
+                        return row[1]
+                    self._db.execute("DELETE FROM llm_cache WHERE key=?", (key,))
+                    self._db.commit()
+                    self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, key, text):
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._put_mem(key, expires_at, text)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO llm_cache VALUES (?,?,?)", (key, expires_at, text))
+                self._db.commit()
+
+    def _put_mem(self, key, expires_at, text):
+        self._mem[key] = (expires_at, text)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    @property
+    def persistent(self):
+        return self._db is not None
+
+    def __len__(self):
+        return len(self._mem)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def _call_soon(loop, fn):
+    try:
+        loop.call_soon_threadsafe(fn)
+    except RuntimeError:
+        pass    # loop already closed: nobody is waiting for the slot
 
 class LLM:
-    def __init__(self, provider="gemini", model="gemini-2.5-flash"):
+    def __init__(self, provider="gemini", model="gemini-2.5-flash",
+                 max_concurrency=8, timeout=30.0, retries=2, backoff=0.5, latency=0.0, cache=None):
+        """
+        provider: "gemini" or "stub" (local deterministic responses after `latency` seconds).
+        max_concurrency / timeout / retries / backoff apply to acall().
+        cache: optional ResponseCache; only temperature-0 (deterministic) calls are cached.
+        The Gemini SDK is imported on the first real API call, not at import / construction.
+        Blocking provider calls run on a thread pool; close() shuts it down.
+        """
         self.provider = provider
         self.model = model
-        self.key = GEMINI_API_KEY
+        self.key = api_key() if provider == "gemini" else None
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.latency = latency
+        self.cache = cache
+        self._inflight = {}
+        self._pool = None
+        self._sem = None
+        self._sem_loop = None
+        self.busy = 0           # concurrency slots held (timed-out calls still running included)
+        self.client = None
+        self._client_lock = threading.Lock()
 
-        if self.key:
-            genai.configure(api_key=self.key)
-            self.client = genai.GenerativeModel(model)
-        else:
-            self.client = None
+    def _client(self):
+        """GenerativeModel for self.model, created (and google.generativeai imported) on first use."""
+        with self._client_lock:
+            if self.client is None:
+                import google.generativeai as genai
+                genai.configure(api_key=self.key)
+                self.client = genai.GenerativeModel(self.model)
+        return self.client
 
     def call(self, prompt, max_tokens=300, temperature=0.0):
         """
         Returns a dict with 'text'. If Gemini gives empty response,
         fallback to simulated deterministic output.
         """
+        key = self._cache_key(prompt, max_tokens, temperature)
+        if key is not None:
+            text = self.cache.get(key)
+            if text is not None:
+                return {"text": text}
+        out = self._call(prompt, max_tokens, temperature)
+        if key is not None and out.get("cacheable", True):
+            self.cache.put(key, out["text"])
+        return {"text": out["text"]}
+
+    def _call(self, prompt, max_tokens, temperature):
+        if self.provider == "stub":
+            if self.latency:
+                time.sleep(self.latency)
+            return {"text": self._simulate(prompt)}
         if not self.key:
             if SIMULATE_IF_NO_KEY:
-                return {"text": self._simulate(prompt)}
+                # keyless simulation isn't an answer from the model: never cache it
+                return {"text": self._simulate(prompt), "cacheable": False}
             raise RuntimeError("No GEMINI_API_KEY found.")
 
         try:
-            print("[LLM] Calling Gemini API...")
-            response = self.client.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": temperature,
-                    "max_output_tokens": max_tokens
-                }
-            )
-
-            # Try to extract the response text robustly
-            text = ""
-            if hasattr(response, "text") and response.text:
-                text = response.text.strip()
-            elif hasattr(response, "candidates") and response.candidates:
-                # candidate may exist but have empty parts
-                parts = getattr(response.candidates[0].content, "parts", [])
-                if parts and hasattr(parts[0], "text"):
-                    text = parts[0].text.strip()
-
-            # Gemini sometimes returns empty content → handle that
-            if not text or text.lower() in ["", "null", "none"]:
-                print("[LLM] Empty or blocked response — using simulation.")
-                text = self._simulate(prompt)
-
-            print("[LLM] Gemini responded.")
+            return self._generate(prompt, max_tokens, temperature)
+        except Exception as e:
+            log.warning("gemini error, using simulation", extra={'error': repr(e)})
+            # don't cache the fallback: the next call should retry the API
+            return {"text": self._simulate(prompt), "cacheable": False}
+
+    async def acall(self, prompt, max_tokens=300, temperature=0.0, timeout=None):
+        """
+        Non-blocking call(): at most max_concurrency requests in flight, each attempt
+        bounded by timeout, retried with exponential backoff, then simulated fallback.
+        A provider call that times out keeps its slot until its thread really returns, so
+        the limit holds for calls still running in the executor too.
+        """
+        key = self._cache_key(prompt, max_tokens, temperature)
+        if key is None:
+            out = await self._acall(prompt, max_tokens, temperature, timeout)
+            return {"text": out["text"]}
+        text = await self._cache_io(self.cache.get, key)
+        if text is not None:
             return {"text": text}
+        # identical prompts already in flight share one request
+        pending = self._inflight.get(key)
+        if pending is not None:
+            try:
+                return {"text": await asyncio.shield(pending)}
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise       # this caller was cancelled
+                # the first caller was (e.g. by its deadline), not this one: ask again
+                return await self.acall(prompt, max_tokens, temperature, timeout)
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            out = await self._acall(prompt, max_tokens, temperature, timeout)
+            if out.get("cacheable", True):
+                await self._cache_io(self.cache.put, key, out["text"])
+            fut.set_result(out["text"])
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # waiters re-raise; don't warn if there are none
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        return {"text": out["text"]}
 
-        except Exception as e:
-            print(f"[LLM] Gemini ERROR: {e}")
-            return {"text": self._simulate(prompt)}
+    async def _acall(self, prompt, max_tokens, temperature, timeout):
+        if self.provider != "stub" and not self.key:
+            if SIMULATE_IF_NO_KEY:
+                return {"text": self._simulate(prompt), "cacheable": False}
+            raise RuntimeError("No GEMINI_API_KEY found.")
+
+        timeout = self.timeout if timeout is None else timeout
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._attempt(prompt, max_tokens, temperature, timeout)
+            except Exception as e:
+                err = e
+                if attempt < self.retries:
+                    await asyncio.sleep(self.backoff * (2 ** attempt))
+        log.warning("llm failed, using simulation",
+                    extra={'provider': self.provider, 'attempts': self.retries + 1, 'error': repr(err)})
+        return {"text": self._simulate(prompt), "cacheable": False}
+
+    def close(self):
+        """Shut down the provider thread pool (calls still running finish in the background)."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def _cache_key(self, prompt, max_tokens, temperature):
+        """Cache key for deterministic calls, None when the call must not be cached."""
+        if self.cache is None or temperature != 0:
+            return None
+        return ResponseCache.make_key(f"{self.provider}/{self.model}", temperature, max_tokens, prompt)
+
+    def _semaphore(self):
+        # asyncio primitives bind to the loop they are first used on
+        loop = asyncio.get_running_loop()
+        if self._sem is None or self._sem_loop is not loop:
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+            self._sem_loop = loop
+        return self._sem
+
+    async def _cache_io(self, fn, *args):
+        # SQLite reads / writes can block for milliseconds: keep them off the event loop
+        if not self.cache.persistent:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def _attempt(self, prompt, max_tokens, temperature, timeout):
+        """One request under a concurrency slot, bounded by timeout; returns {'text'[, 'cacheable']}."""
+        sem = self._semaphore()
+        await sem.acquire()
+        self.busy += 1
+        def release():
+            self.busy -= 1
+            sem.release()
+        if self.provider == "stub":
+            try:
+                return await asyncio.wait_for(self._stub(prompt), timeout)
+            finally:
+                release()
+        # google-generativeai is blocking: run it on a bounded thread pool. A thread can't be
+        # cancelled, so the slot is released when the call finishes, not when we stop waiting.
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm")
+        loop = asyncio.get_running_loop()
+        try:
+            cf = self._pool.submit(self._generate, prompt, max_tokens, temperature)
+        except BaseException:
+            release()
+            raise
+        cf.add_done_callback(lambda _: _call_soon(loop, release))
+        return await asyncio.wait_for(asyncio.wrap_future(cf, loop=loop), timeout)
+
+    async def _stub(self, prompt):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return {"text": self._simulate(prompt)}
+
+    def _generate(self, prompt, max_tokens, temperature):
+        """One Gemini round trip -> {'text'[, 'cacheable']}; raises on API errors."""
+        log.debug("calling gemini")
+        response = self._client().generate_content(
+            prompt,
+            generation_config={
+                "temperature": temperature,
+                "max_output_tokens": max_tokens
+            }
+        )
+
+        # Try to extract the response text robustly
+        text = ""
+        if hasattr(response, "text") and response.text:
+            text = response.text.strip()
+        elif hasattr(response, "candidates") and response.candidates:
+            # candidate may exist but have empty parts
+            parts = getattr(response.candidates[0].content, "parts", [])
+            if parts and hasattr(parts[0], "text"):
+                text = parts[0].text.strip()
+
+        # Gemini sometimes returns empty content → handle that
+        if not text or text.lower() in ["", "null", "none"]:
+            log.warning("empty or blocked response, using simulation")
+            # not a real answer: don't let the cache serve it from now on
+            return {"text": self._simulate(prompt), "cacheable": False}
+
+        log.debug("gemini responded")
+        return {"text": text}
 
     def _simulate(self, prompt):
         """Local deterministic fallback when Gemini fails or key missing."""
@@ -0,0 +1,210 @@
+# plan_stats.py
+import os, json
+from ledger import segment_paths
+from instrumentation import get_logger
+
+STATS_SUFFIX = ".stats.json"   # PlanStats snapshot persisted next to the ledger by bootstrap()
+STATS_VERSION = 1
+log = get_logger('plan_stats')
+
+class _Running:
+    """Counters for one plan type; every statistic is a running sum, so update() is O(1)."""
+    __slots__ = ('n', 'impact', 'impact_sq', 'cost', 'executed', 'succeeded', 'confidence', 'brier')
+
+    def __init__(self):
+        self.n = 0
+        self.impact = self.impact_sq = self.cost = self.confidence = self.brier = 0.0
+        self.executed = self.succeeded = 0
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, d):
+        s = cls()
+        for k in cls.__slots__:
+            setattr(s, k, d[k])
+        return s
+
+def execution_outcome(execution):
+    """Audit card 'execution' list -> True (every step ok), False (blocked / a step failed), None (nothing ran)."""
+    if not execution:
+        return None
+    for r in execution:
+        if r.get('status') == 'blocked_by_safety' or not (r.get('result') or {}).get('ok', False):
+            return False
+    return True
+
+def _hash_before(path, offset):
+    """'hash' of the ledger line in path that ends right at byte offset (None if there is none)."""
+    try:
+        if offset <= 0 or os.path.getsize(path) < offset:
+            return None
+        with open(path, "rb") as f:
+            back = 1 << 12
+            while True:
+                start = max(0, offset - back)
+                f.seek(start)
+                data = f.read(offset - start)
+                if not data.endswith(b"\n"):
+                    return None
+                nl = data.rfind(b"\n", 0, len(data) - 1)
+                if nl != -1 or start == 0:
+                    return json.loads(data[nl + 1:]).get('hash')
+                back *= 4
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class PlanStats:
+    """
+    Running per-plan-type outcome statistics, fed one ledger entry at a time:
+    predicted impact (mean / variance) and cost, execution success rate, and calibration
+    of the planner's confidence against observed success (mean confidence vs success
+    rate, Brier score). bootstrap() folds in an existing ledger in one streaming pass, and
+    keeps a snapshot next to it (<ledger>.stats.json) so the next start only replays the
+    entries appended since.
+    weights() is the table the planner ranks with: per plan name, the ratio of the
+    success probability we observe (smoothed towards the stated confidence with `prior`
+    pseudo-observations) to the mean stated confidence - 1.0 for unseen plans.
+    """
+    def __init__(self, prior=5.0, min_weight=0.25, max_weight=2.0):
+        self.prior = prior
+        self.min_weight = min_weight
+        self.max_weight = max_weight
+        self.by_plan = {}
+        self.entries = 0
+        self.head = ''          # hash of the last ledger entry folded in
+        self._weights = None
+        self._pos = None        # (ledger file, byte offset after the head entry) while bootstrapping
+
+    def update(self, payload):
+        """Fold in one ledger payload ({'entry': audit card, 'hash', ...}) or a bare card."""
+        card = payload.get('entry', payload) if isinstance(payload, dict) else {}
+        if not isinstance(card, dict):
+            return
+        name = card.get('plan_name') or card.get('plan_id') or 'unknown'
+        s = self.by_plan.get(name)
+        if s is None:
+            s = self.by_plan[name] = _Running()
+        impact = float(card.get('impact_pct') or 0.0)
+        s.n += 1
+        s.impact += impact
+        s.impact_sq += impact * impact
+        s.cost += float(card.get('cost') or 0.0)
+        ok = execution_outcome(card.get('execution'))
+        if ok is not None:
+            conf = float(card.get('confidence', 0.7) or 0.0)
+            s.executed += 1
+            s.succeeded += ok
+            s.confidence += conf
+            s.brier += (conf - ok) ** 2
+        self.entries += 1
+        self.head = payload.get('hash', self.head)
+        self._weights = None
+
+    def bootstrap(self, path, persist=True):
+        """
+        Stream the entries of the ledger at path (all segments) through update().
+        persist: start from the snapshot at path + STATS_SUFFIX when its head entry is still
+        where it was recorded, replay only what follows, then save a fresh snapshot.
+        A partly written last line (torn by a crash) is left for the next start; an
+        unreadable complete line is skipped with a warning.
+        """
+        segs = segment_paths(path)
+        first, offset = (self._resume(path, segs) if persist else None) or (0, 0)
+        self._pos = None
+        for i in range(first, len(segs)):
+            self._fold(segs[i], offset if i == first else 0)
+        if persist and self._pos is not None:
+            self.save(path, *self._pos)
+        return self
+
+    def _fold(self, seg, offset):
+        with open(seg, "rb") as f:
+            f.seek(offset)
+            pos = offset
+            for line in f:
+                if not line.endswith(b"\n"):
+                    log.warning("ignoring partly written ledger line", extra={'path': seg, 'offset': pos})
+                    return
+                pos += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    payload = json.loads(line)
+                except ValueError:
+                    log.warning("skipping unreadable ledger line", extra={'path': seg, 'offset': pos - len(line)})
+                    continue
+                self.update(payload)
+                self._pos = (seg, pos)
+
+    def _resume(self, path, segs):
+        """Load the snapshot; (segment index, offset) to replay from, or None to start over."""
+        try:
+            with open(path + STATS_SUFFIX) as f:
+                snap = json.load(f)
+            if snap['version'] != STATS_VERSION or not snap['entries']:
+                return None
+            head, offset = snap['head'], snap['offset']
+            by_plan = {name: _Running.from_dict(d) for name, d in snap['by_plan'].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        # the snapshot's head entry has to end at offset in the file it was read from, or in a
+        # later name for it (rotated into a segment); the hash chain vouches for what came before
+        named = [i for i, seg in enumerate(segs) if os.path.basename(seg) == snap.get('file')]
+        for i in named + [i for i in reversed(range(len(segs))) if i not in named]:
+            if _hash_before(segs[i], offset) == head:
+                self.by_plan, self.entries, self.head, self._weights = by_plan, snap['entries'], head, None
+                return i, offset
+        return None
+
+    def save(self, path, seg, offset):
+        """Write the snapshot for the ledger at path; the head entry ends at offset in seg."""
+        snap = {'version': STATS_VERSION, 'entries': self.entries, 'head': self.head,
+                'file': os.path.basename(seg), 'offset': offset,
+                'by_plan': {name: s.to_dict() for name, s in self.by_plan.items()}}
+        tmp = path + STATS_SUFFIX + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(snap, f)
+        os.replace(tmp, path + STATS_SUFFIX)
+
+    def weight(self, name):
+        s = self.by_plan.get(name)
+        if s is None or not s.executed:
+            return 1.0
+        conf = s.confidence / s.executed
+        if conf <= 0:
+            return 1.0
+        p = (s.succeeded + self.prior * conf) / (s.executed + self.prior)
+        return min(self.max_weight, max(self.min_weight, p / conf))
+
+    def weights(self):
+        """{plan_name: ranking weight}; cached until the next update."""
+        if self._weights is None:
+            self._weights = {name: round(self.weight(name), 4) for name in self.by_plan}
+        return self._weights
+
+    def summary(self):
+        """Per plan: n, mean impact / cost, success rate, mean confidence, Brier score, weight."""
+        out = {}
+        for name, s in self.by_plan.items():
+            ex = s.executed or 1
+            out[name] = {'n': s.n, 'impact_mean': s.impact / s.n, 'cost_mean': s.cost / s.n,
+                         'impact_sd': max(s.impact_sq / s.n - (s.impact / s.n) ** 2, 0.0) ** 0.5,
+                         'success_rate': s.succeeded / ex if s.executed else None,
+                         'confidence_mean': s.confidence / ex if s.executed else None,
+                         'brier': s.brier / ex if s.executed else None,
+                         'weight': self.weights()[name]}
+        return out
+
+    def __eq__(self, other):
+        if not isinstance(other, PlanStats):
+            return NotImplemented
+        return (self.entries == other.entries and self.head == other.head and
+                {k: v.to_dict() for k, v in self.by_plan.items()} ==
+                {k: v.to_dict() for k, v in other.by_plan.items()})
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"PlanStats(entries={self.entries}, plans={len(self.by_plan)})"
@@ -0,0 +1,121 @@
+# replay.py
+import os, json
+from collections import deque
+from llm_wrapper import LLM, ResponseCache
+from state_store import Event
+
+# A recording is a directory with
+#   inputs.jsonl - one line per tick: {'tick', 'events': [perception events that arrived]}
+#   llm.jsonl    - one line per LLM call: {'key', 'text'} (key: prompt + settings hash)
+INPUTS, RESPONSES = "inputs.jsonl", "llm.jsonl"
+
+def response_key(prompt, max_tokens, temperature):
+    """Provider-independent key for one LLM request (whitespace-normalized prompt)."""
+    return ResponseCache.make_key("", temperature, max_tokens, prompt)
+
+# --- Recording ---
+class Recorder:
+    """Writes a run's per-tick perception input and every LLM response into directory `path`."""
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._inputs = open(os.path.join(path, INPUTS), "w")
+        self._responses = open(os.path.join(path, RESPONSES), "w")
+
+    def record_tick(self, tick, events):
+        events = [e.to_dict() if isinstance(e, Event) else dict(e) for e in events]
+        self._inputs.write(json.dumps({'tick': tick, 'events': events}) + "\n")
+
+    def record_response(self, key, text):
+        self._responses.write(json.dumps({'key': key, 'text': text}) + "\n")
+
+    def wrap(self, llm):
+        return RecordingLLM(llm, self)
+
+    def close(self):
+        self._inputs.close()
+        self._responses.close()
+
+class RecordingLLM:
+    """LLM proxy that records each response (keyed by request) as it returns."""
+    def __init__(self, llm, recorder):
+        self.llm = llm
+        self.recorder = recorder
+
+    async def acall(self, prompt, max_tokens=300, temperature=0.0, timeout=None):
+        out = await self.llm.acall(prompt, max_tokens, temperature, timeout)
+        self.recorder.record_response(response_key(prompt, max_tokens, temperature), out['text'])
+        return out
+
+    def call(self, prompt, max_tokens=300, temperature=0.0):
+        out = self.llm.call(prompt, max_tokens, temperature)
+        self.recorder.record_response(response_key(prompt, max_tokens, temperature), out['text'])
+        return out
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+# --- Replay ---
+class ReplayLLM:
+    """
+    Answers from a recording, instantly: each request gets the next recorded response for
+    the same key (the last one again once they run out). Requests that were never recorded
+    (e.g. a changed planner prompt) fall back to the local simulation and are counted in
+    stats['misses'].
+    """
+    def __init__(self, path):
+        self.responses = {}
+        with open(os.path.join(path, RESPONSES)) as f:
+            for line in f:
+                if line.strip():
+                    r = json.loads(line)
+                    self.responses.setdefault(r['key'], deque()).append(r['text'])
+        self.fallback = LLM(provider="stub")
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def call(self, prompt, max_tokens=300, temperature=0.0):
+        texts = self.responses.get(response_key(prompt, max_tokens, temperature))
+        if not texts:
+            self.stats['misses'] += 1
+            return self.fallback.call(prompt, max_tokens, temperature)
+        self.stats['hits'] += 1
+        return {'text': texts.popleft() if len(texts) > 1 else texts[0]}
+
+    async def acall(self, prompt, max_tokens=300, temperature=0.0, timeout=None):
+        return self.call(prompt, max_tokens, temperature)
+
+class ReplayFeed:
+    """
+    Recorded perception input served like a live ingest.IngestServer: each drain() hands
+    out the next tick's events, so the perception agent sees exactly what it saw when the
+    run was recorded.
+    """
+    def __init__(self, path):
+        with open(os.path.join(path, INPUTS)) as f:
+            self.ticks = [[Event(**e) for e in json.loads(line)['events']] for line in f if line.strip()]
+        self._next = 0
+        self.running = True
+        self.on_data = None
+        self.stats = {'received': 0, 'accepted': 0, 'malformed': 0, 'dropped': 0, 'drained': 0, 'connections': 0}
+
+    async def start(self):
+        return self
+
+    async def close(self):
+        pass
+
+    def drain(self, max_items=None):
+        if self._next >= len(self.ticks):
+            return [], []
+        events = self.ticks[self._next]
+        self._next += 1
+        self.stats['received'] += len(events)
+        self.stats['accepted'] += len(events)
+        self.stats['drained'] += len(events)
+        return events, [None] * len(events)
+
+    def pending(self):
+        return sum(len(t) for t in self.ticks[self._next:])
+
+    def __len__(self):
+        return len(self.ticks)
@@ -0,0 +1,287 @@
+# rules.py
+import os, json, math
+import numpy as np
+from instrumentation import get_logger
+
+log = get_logger('rules')
+
+# --- Rule sets ---
+# Declarative, JSON-friendly:
+#   incidents:  [{'name', 'when': [[metric, op, value], ...], 'severity'}]  (all conditions must hold)
+#   coalitions: [{'roles': [...], 'min_severity': 0, 'rules': [incident rule names]}]
+#               (a tier applies when the zone's severity >= min_severity and, if 'rules'
+#                is given, one of those incident rules matched; roles accumulate in order)
+#   people_per_severity: estimated_people = severity * this
+# A zone's severity is the highest of its matching incident rules; metrics are the
+# world_state fields (avg_water, avg_garbage, ...), and a missing metric never matches.
+DEFAULT_RULES = {
+    'incidents': [
+        {'name': 'flood', 'when': [['avg_water', '>=', 2.5]], 'severity': 3},
+        {'name': 'garbage_overflow', 'when': [['avg_garbage', '>=', 90]], 'severity': 2},
+    ],
+    'coalitions': [
+        {'roles': ['Planner', 'Executor', 'Audit']},
+        {'min_severity': 3, 'roles': ['PublicComm', 'Traffic']},
+        {'min_severity': 4, 'roles': ['EmergencyResponse']},
+    ],
+    'people_per_severity': 1000,
+}
+
+OPS = {'>=': np.greater_equal, '>': np.greater, '<=': np.less_equal, '<': np.less,
+       '==': np.equal, '!=': np.not_equal}
+
+def _num(v):
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        return math.nan
+    return v
+
+class RuleSet:
+    """
+    A rule set compiled for vectorized evaluation: every condition of every rule becomes a
+    (metric column, op, threshold) entry, grouped by op, so evaluate() costs a handful of
+    NumPy operations over a (zones x metrics) array however many rules there are.
+    Raises ValueError for malformed rules (unknown op, no conditions, unknown rule name).
+    """
+    def __init__(self, spec=None):
+        spec = DEFAULT_RULES if spec is None else spec
+        self.spec = spec
+        self.people_per_severity = spec.get('people_per_severity', 1000)
+        rules = spec.get('incidents', [])
+        self.names = [r['name'] for r in rules]
+        self.severity = np.array([r.get('severity', 1) for r in rules], dtype=np.int64)
+        self.metrics = []
+        col = {}
+        conds = []       # (rule, column, op, threshold), sorted by rule
+        for i, r in enumerate(rules):
+            if not r.get('when'):
+                raise ValueError(f"rule {r['name']!r} has no conditions")
+            for metric, op, value in r['when']:
+                if op not in OPS:
+                    raise ValueError(f"rule {r['name']!r}: unknown op {op!r}")
+                if metric not in col:
+                    col[metric] = len(self.metrics)
+                    self.metrics.append(metric)
+                conds.append((i, col[metric], op, float(value)))
+        self._starts = np.searchsorted([c[0] for c in conds], np.arange(len(rules)))
+        self._counts = np.bincount([c[0] for c in conds], minlength=len(rules))
+        self._groups = []   # (op, condition positions, columns, thresholds)
+        for op in OPS:
+            pos = [k for k, c in enumerate(conds) if c[2] == op]
+            if pos:
+                self._groups.append((op, np.array(pos), np.array([conds[k][1] for k in pos]),
+                                     np.array([conds[k][3] for k in pos])))
+        self._n_conds = len(conds)
+
+        index = {n: i for i, n in enumerate(self.names)}
+        self.tiers = []
+        for t in spec.get('coalitions', []):
+            unknown = [n for n in t.get('rules', ()) if n not in index]
+            if unknown:
+                raise ValueError(f"coalition tier refers to unknown rules {unknown}")
+            self.tiers.append((t.get('min_severity', 0), [index[n] for n in t.get('rules', ())], list(t['roles'])))
+        self._roles = {}    # tier pattern -> roles
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def evaluate(self, X):
+        """
+        X: (zones x len(self.metrics)) float array, NaN = metric missing.
+        Returns (matched (zones x rules) bool, severity (zones,), tiers (zones x tiers) bool).
+        """
+        n = len(X)
+        ok = np.zeros((n, self._n_conds), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            for op, pos, cols, thr in self._groups:
+                vals = X[:, cols]
+                ok[:, pos] = OPS[op](vals, thr) & ~np.isnan(vals)
+        if self.names:
+            matched = np.add.reduceat(ok, self._starts, axis=1) == self._counts
+            severity = np.where(matched, self.severity, 0).max(axis=1)
+        else:
+            matched = np.zeros((n, 0), dtype=bool)
+            severity = np.zeros(n, dtype=np.int64)
+        tiers = np.zeros((n, len(self.tiers)), dtype=bool)
+        for j, (min_sev, rule_idx, _) in enumerate(self.tiers):
+            t = severity >= min_sev
+            if rule_idx:
+                t &= matched[:, rule_idx].any(axis=1)
+            tiers[:, j] = t
+        return matched, severity, tiers
+
+    def roles(self, tier_row):
+        """Roles for one zone's tier pattern (cached per distinct pattern)."""
+        key = tier_row.tobytes()
+        roles = self._roles.get(key)
+        if roles is None:
+            roles = self._roles[key] = [r for j, t in enumerate(self.tiers) if tier_row[j] for r in t[2]]
+        return roles
+
+    def roles_for_severity(self, severity, matched=()):
+        """Roles for an incident that did not come from evaluate() (e.g. injected by hand)."""
+        row = np.array([severity >= m and (not idx or any(self.names[i] in matched for i in idx))
+                        for m, idx, _ in self.tiers], dtype=bool)
+        return self.roles(row)
+
+# --- Incremental evaluation over zones ---
+class RuleEngine:
+    """
+    Per-zone rule results kept between ticks: update(world) re-evaluates only the zones
+    whose world_state entry changed since the last call (WorldState.changes_from; everything
+    on the first call, a rule reload, or an unrelated world) and returns the incidents for
+    every zone in one pass, with each zone's coalition roles evaluated alongside (coalitions_for()).
+    rules: a rule-set dict, or a path to a JSON rule file that is re-read (hot reload)
+    whenever its mtime changes; a file that fails to load keeps the previous rules.
+    """
+    def __init__(self, rules=None, capacity=64):
+        self.source = rules if isinstance(rules, str) else None
+        self._mtime = None
+        self.rules = RuleSet.load(rules) if self.source else RuleSet(rules)
+        if self.source:
+            self._mtime = os.stat(self.source).st_mtime_ns
+        self.reloads = 0
+        self.world = None
+        self.index = {}          # zone -> row
+        self.zones = []          # row -> zone
+        self.free = []           # rows of removed zones, for reuse
+        self._alloc(capacity)
+        self.incidents = {}      # zone -> incident dict
+        self.coalitions = {}     # zone -> {'zone', 'roles'}
+        self.assessment = None   # incident list from the last update (world order)
+        self._coalition_list = None
+
+    def _alloc(self, capacity):
+        n_m, n_r, n_t = len(self.rules.metrics), len(self.rules.names), len(self.rules.tiers)
+        self.X = np.full((capacity, n_m), np.nan)
+        self._matched = np.zeros((capacity, n_r), dtype=bool)   # (zones x rules); see matched()
+        self.severity = np.zeros(capacity, dtype=np.int64)
+        self.tiers = np.zeros((capacity, n_t), dtype=bool)
+
+    def _grow(self, need):
+        cap = len(self.X)
+        if need <= cap:
+            return
+        new = max(need, cap * 2)
+        for name in ('X', '_matched', 'severity', 'tiers'):
+            old = getattr(self, name)
+            arr = np.full((new,) + old.shape[1:], np.nan) if name == 'X' else np.zeros((new,) + old.shape[1:], dtype=old.dtype)
+            arr[:cap] = old
+            setattr(self, name, arr)
+
+    def configure(self, rules):
+        """Switch to a new rule set (dict or path) if it differs from the current one."""
+        if rules is None:
+            return
+        if isinstance(rules, str):
+            if rules != self.source:
+                self._set(RuleSet.load(rules), rules)
+        elif self.source is not None or rules != self.rules.spec:
+            self._set(RuleSet(rules), None)
+
+    def _set(self, ruleset, source):
+        self.rules = ruleset
+        self.source = source
+        self._mtime = os.stat(source).st_mtime_ns if source else None
+        self.reloads += 1
+        self.world = None       # everything is re-evaluated against the new rules
+        self.index, self.zones, self.free = {}, [], []
+        self.incidents, self.coalitions = {}, {}
+        self.assessment, self._coalition_list = None, None    # derived from the cleared dicts
+        self._alloc(len(self.X))
+
+    def maybe_reload(self):
+        """Re-read the rule file if it changed on disk; True when the rules changed."""
+        if not self.source:
+            return False
+        try:
+            mtime = os.stat(self.source).st_mtime_ns
+        except OSError as e:
+            log.warning("rule file unavailable, keeping the current rules", extra={'path': self.source, 'error': repr(e)})
+            return False
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        try:
+            ruleset = RuleSet.load(self.source)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.warning("rule reload failed, keeping the current rules", extra={'path': self.source, 'error': repr(e)})
+            return False
+        self._set(ruleset, self.source)
+        log.info("rules reloaded", extra={'path': self.source, 'rules': len(ruleset.names)})
+        return True
+
+    def update(self, world):
+        """
+        Evaluate the zones of `world` that changed; returns (incidents in world order, changed)
+        where changed is False when no zone needed re-evaluation.
+        """
+        self.maybe_reload()
+        delta = world.changes_from(self.world) if self.world is not None and hasattr(world, 'changes_from') else None
+        if delta is None:
+            zones, removed = list(world), [z for z in self.index if z not in world]
+        else:
+            zones, removed = delta
+        self.world = world
+        if not zones and not removed and self.assessment is not None:
+            return self.assessment, False
+        for z in removed:
+            row = self.index.pop(z, None)
+            if row is not None:
+                self.free.append(row)
+                self.zones[row] = None
+            self.incidents.pop(z, None)
+            self.coalitions.pop(z, None)
+        rows = []
+        for z in zones:
+            row = self.index.get(z)
+            if row is None:
+                row = self.free.pop() if self.free else len(self.zones)
+                if row == len(self.zones):
+                    self.zones.append(z)
+                else:
+                    self.zones[row] = z
+                self.index[z] = row
+            rows.append(row)
+        if rows:
+            self._grow(len(self.zones))
+            rows = np.array(rows)
+            metrics = self.rules.metrics
+            self.X[rows] = np.array([[_num(world[z].get(m)) for m in metrics] for z in zones],
+                                    dtype=float).reshape(len(rows), len(metrics))
+            matched, severity, tiers = self.rules.evaluate(self.X[rows])
+            self._matched[rows], self.severity[rows], self.tiers[rows] = matched, severity, tiers
+            per = self.rules.people_per_severity
+            for z, sev, t in zip(zones, severity.tolist(), tiers):
+                if sev > 0:
+                    self.incidents[z] = {'zone': z, 'severity': sev, 'estimated_people': per * sev, 'notes': []}
+                    self.coalitions[z] = {'zone': z, 'roles': list(self.rules.roles(t))}
+                else:
+                    self.incidents.pop(z, None)
+                    self.coalitions.pop(z, None)
+        self.assessment = [self.incidents[z] for z in world if z in self.incidents]
+        self._coalition_list = None
+        return self.assessment, True
+
+    def coalitions_for(self, incidents):
+        """Coalitions for an incident list; the last update()'s list is served from the per-zone results."""
+        if incidents is self.assessment:
+            if self._coalition_list is None:
+                self._coalition_list = [self.coalitions[i['zone']] for i in incidents]
+            return self._coalition_list
+        return [{'zone': i['zone'], 'roles': list(self.roles(i))} for i in incidents]
+
+    def matched(self, zone):
+        """Names of the incident rules that matched `zone` at the last update."""
+        row = self.index.get(zone)
+        return [] if row is None else [self.rules.names[i] for i in np.flatnonzero(self._matched[row])]
+
+    def roles(self, incident):
+        """Coalition roles for an incident: the evaluated tiers for its zone, or by severity."""
+        row = self.index.get(incident.get('zone'))
+        if row is not None and self.severity[row] == incident.get('severity'):
+            return self.rules.roles(self.tiers[row])
+        return self.rules.roles_for_severity(incident.get('severity', 0))
@@ -0,0 +1,278 @@
+# scheduler.py
+import asyncio
+
+# --- Node declarations ---
+def node(reads=(), writes=()):
+    """
+    Declare which state keys an agent function reads and writes.
+    Appending to a list counts as a write (it also reads the old value).
+    Used by DagScheduler to work out which nodes may run concurrently.
+    """
+    def deco(fn):
+        fn.reads = frozenset(reads)
+        fn.writes = frozenset(writes)
+        return fn
+    return deco
+
+class Node:
+    def __init__(self, name, agent, func):
+        self.name = name
+        self.agent = agent
+        self.func = func
+        self.reads = getattr(func, 'reads', None)
+        self.writes = getattr(func, 'writes', None)
+
+    @property
+    def declared(self):
+        return self.reads is not None and self.writes is not None
+
+    def __repr__(self):
+        return f"Node({self.name})"
+
+def conflicts(a, b):
+    """True if running a and b in either order could give different results."""
+    if not (a.declared and b.declared):
+        return True  # undeclared nodes are barriers
+    return bool(a.writes & (b.reads | b.writes) or a.reads & b.writes)
+
+def build_dag(nodes):
+    """
+    nodes: list in sequential order -> {index: set(indices it must wait for)}.
+    Every pair that conflicts keeps its sequential order; everything else is free.
+    """
+    deps = {j: set() for j in range(len(nodes))}
+    for j in range(len(nodes)):
+        for i in range(j):
+            if conflicts(nodes[i], nodes[j]):
+                deps[j].add(i)
+    # transitive reduction keeps the awaited set small
+    for j in deps:
+        implied = set()
+        for i in deps[j]:
+            implied |= _ancestors(deps, i)
+        deps[j] -= implied
+    return deps
+
+def _ancestors(deps, i):
+    out, stack = set(), list(deps[i])
+    while stack:
+        k = stack.pop()
+        if k not in out:
+            out.add(k)
+            stack.extend(deps[k])
+    return out
+
+# --- Scheduler ---
+class DagScheduler:
+    """
+    Runs nodes as a DAG instead of a fixed sequence, and pipelines ticks:
+    node j of tick t waits only for conflicting nodes of tick t and tick t-1
+    (conflicts with older ticks are implied through tick t-1), so e.g. tick t+1's
+    perception/fusion overlap tick t's planning/execution.
+    Because every conflicting pair keeps its sequential order, the final state
+    matches the sequential loop as long as nodes touch only the keys they declare.
+    """
+    def __init__(self, nodes, max_inflight_ticks=2):
+        self.nodes = list(nodes)
+        self.max_inflight_ticks = max(1, max_inflight_ticks)
+        self.deps = build_dag(self.nodes)
+        self.cross_deps = {
+            j: {i for i in range(len(self.nodes)) if conflicts(self.nodes[i], self.nodes[j])}
+            for j in range(len(self.nodes))
+        }
+
+    def levels(self):
+        """Nodes grouped by DAG depth (for display / debugging)."""
+        depth = {}
+        for j in range(len(self.nodes)):
+            depth[j] = 1 + max((depth[i] for i in self.deps[j]), default=-1)
+        out = {}
+        for j, d in depth.items():
+            out.setdefault(d, []).append(self.nodes[j].name)
+        return [out[d] for d in sorted(out)]
+
+    async def run(self, ticks, invoke, tick_interval=0.0, on_tick_start=None, on_tick_end=None):
+        """
+        invoke(node, tick) -> coroutine that runs one node (should handle its own errors).
+        tick_interval: delay between launching consecutive ticks.
+        """
+        tasks = {}      # (tick, j) -> task
+        tick_tasks = []
+        for t in range(ticks):
+            if t >= self.max_inflight_ticks:
+                await tick_tasks[t - self.max_inflight_ticks]
+            if on_tick_start:
+                on_tick_start(t)
+            this_tick = []
+            for j, n in enumerate(self.nodes):
+                waits = [tasks[(t, i)] for i in self.deps[j]]
+                if t > 0:
+                    waits += [tasks[(t-1, i)] for i in self.cross_deps[j]]
+                task = asyncio.ensure_future(self._run_node(n, t, waits, invoke))
+                tasks[(t, j)] = task
+                this_tick.append(task)
+            if t > 0:
+                # tick t-2 is no longer needed once tick t is wired up
+                for j in range(len(self.nodes)):
+                    tasks.pop((t-2, j), None)
+            tick_tasks.append(asyncio.ensure_future(self._finish_tick(t, this_tick, on_tick_end)))
+            if tick_interval and t < ticks - 1:
+                await asyncio.sleep(tick_interval)
+        await asyncio.gather(*tick_tasks)
+
+    async def _run_node(self, n, t, waits, invoke):
+        if waits:
+            await asyncio.gather(*waits)
+        await invoke(n, t)
+
+    async def _finish_tick(self, t, this_tick, on_tick_end):
+        await asyncio.gather(*this_tick)
+        if on_tick_end:
+            on_tick_end(t)
+
+# --- Event-driven scheduling ---
+def _fingerprint(value):
+    return value, (len(value) if hasattr(value, '__len__') else None)
+
+def _changed(before, after):
+    """
+    A key changed if it now holds a different, unequal object, or its length changed
+    (in-place appends to lists / ring buffers). Other in-place mutation isn't seen.
+    """
+    old, old_len = before
+    if after is old:
+        return old_len != (len(after) if hasattr(after, '__len__') else None)
+    try:
+        same = old == after
+    except Exception:
+        return True
+    return same is not True
+
+class EventScheduler:
+    """
+    Runs the graph in waves instead of fixed ticks. A wave runs the source nodes (the ones
+    reading only keys no other node writes, e.g. perception) plus every node that reads a
+    key changed earlier in the wave, so unchanged parts of the graph are skipped.
+    Waves start when something calls notify() (new data, an approval), right after a wave
+    whose sources took in new input, or at the latest every max_latency seconds (polling
+    for sources that can't notify). Consecutive waves start at least min_interval apart;
+    triggers arriving in between are coalesced into one wave. The throttle never holds a
+    wave back longer than max_latency. stop() ends the run after the current wave.
+    """
+    def __init__(self, nodes, max_latency=1.0, min_interval=0.0):
+        self.nodes = list(nodes)
+        self.max_latency = max_latency
+        self.min_interval = min_interval
+        writers = {}
+        for i, n in enumerate(self.nodes):
+            for k in n.writes or ():
+                writers.setdefault(k, set()).add(i)
+        self.sources = {
+            n.name for i, n in enumerate(self.nodes)
+            if n.reads is None or all(writers.get(k, set()) <= {i} for k in n.reads)
+        }
+        # only keys some node reads count as news (e.g. ingest_stats, which nobody reads, doesn't)
+        self.read_keys = set().union(*(n.reads or () for n in self.nodes))
+        self.source_writes = set()
+        for n in self.nodes:
+            if n.name in self.sources:
+                self.source_writes |= (n.writes or set()) & self.read_keys
+        # keys a node reads but only a later node writes: changes carry over to the next wave
+        self.carry_keys = {
+            k for i, n in enumerate(self.nodes) for k in n.reads or ()
+            if any(w > i for w in writers.get(k, ()))
+        }
+        self.waves = 0
+        self.stats = {'waves': 0, 'node_runs': 0, 'skipped': 0, 'polls': 0}
+        self._dirty = set()
+        self._wake = None
+        self._stopping = False
+
+    def downstream(self, keys):
+        """Names of the nodes that a change to `keys` can reach (static, from declarations)."""
+        keys, out = set(keys), []
+        for n in self.nodes:
+            if n.reads is None or n.reads & keys:
+                out.append(n.name)
+                if n.writes is None:
+                    return out + [m.name for m in self.nodes[self.nodes.index(n)+1:]]
+                keys |= n.writes
+        return out
+
+    def notify(self, *keys):
+        """Mark keys as changed from outside the graph (or just wake it) and start a wave soon."""
+        self._dirty.update(keys)
+        if self._wake is not None:
+            self._wake.set()
+
+    def stop(self):
+        self._stopping = True
+        if self._wake is not None:
+            self._wake.set()
+
+    async def run(self, state, invoke, max_waves=None, stop_when_idle=False,
+                  on_wave_start=None, on_wave_end=None):
+        """
+        invoke(node, wave) -> coroutine that runs one node (should handle its own errors).
+        max_waves: stop after that many waves (None = until stop()).
+        stop_when_idle: stop after a wave that changed nothing, with no triggers pending.
+        on_wave_start(wave, dirty_keys) / on_wave_end(wave, changed_keys): optional callbacks.
+        """
+        loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        last_start = None
+        immediate = True
+        while max_waves is None or self.waves < max_waves:
+            # nodes that never suspend would keep back-to-back waves from giving stop(),
+            # signal handlers and notify() a turn: yield to the loop before every wave
+            await asyncio.sleep(0)
+            if self._stopping:
+                break
+            if not immediate and not self._wake.is_set():
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.max_latency)
+                except asyncio.TimeoutError:
+                    self.stats['polls'] += 1
+                if self._stopping:
+                    break
+            if last_start is not None and self.min_interval:
+                delay = min(last_start + self.min_interval - loop.time(), self.max_latency)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self._wake.clear()
+            dirty, self._dirty = self._dirty, set()
+            last_start = loop.time()
+            wave = self.waves
+            if on_wave_start:
+                on_wave_start(wave, dirty)
+            changed = await self._wave(state, invoke, wave, dirty) & self.read_keys
+            self.waves += 1
+            self.stats['waves'] += 1
+            if on_wave_end:
+                on_wave_end(wave, changed)
+            self._dirty |= changed & self.carry_keys
+            # sources took in new input: more may be waiting, go again straight away
+            immediate = bool(changed & self.source_writes)
+            if stop_when_idle and not changed and not self._dirty and not self._wake.is_set():
+                break
+
+    async def _wave(self, state, invoke, wave, dirty):
+        dirty = set(dirty)
+        changed = set()
+        run_all = False
+        for n in self.nodes:
+            if not (run_all or n.name in self.sources or n.reads is None or n.reads & dirty):
+                self.stats['skipped'] += 1
+                continue
+            before = {k: _fingerprint(state.get(k)) for k in n.writes} if n.writes is not None else None
+            await invoke(n, wave)
+            self.stats['node_runs'] += 1
+            if before is None:
+                run_all = True   # undeclared writes: everything after it may be affected
+                continue
+            for k, fp in before.items():
+                if _changed(fp, state.get(k)):
+                    dirty.add(k)
+                    changed.add(k)
+        return changed
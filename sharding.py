@@ -0,0 +1,130 @@
+# sharding.py
+import os, csv, time, zlib, asyncio, contextlib, io
+from concurrent.futures import ProcessPoolExecutor
+
+from ledger import LedgerWriter
+
+# --- Partitioning ---
+def shard_of(key, n_shards):
+    """Stable shard index for a zone/region name (same in every process)."""
+    return zlib.crc32(str(key).encode()) % n_shards
+
+def split_sensor_csv(csv_path, out_dir, n_shards, key="location"):
+    """
+    Partition a sensor CSV by zone (location) into n_shards CSVs under out_dir.
+    Returns the list of shard CSV paths (index = shard id).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = [os.path.join(out_dir, f"shard_{i:03d}.csv") for i in range(n_shards)]
+    with open(csv_path, newline='') as f:
+        reader = csv.DictReader(f)
+        outs = [open(p, "w", newline='') for p in paths]
+        try:
+            writers = [csv.DictWriter(o, fieldnames=reader.fieldnames) for o in outs]
+            for w in writers:
+                w.writeheader()
+            for row in reader:
+                writers[shard_of(row.get(key), n_shards)].writerow(row)
+        finally:
+            for o in outs:
+                o.close()
+    return paths
+
+# --- Worker ---
+def run_shard(spec):
+    """
+    Run one shard's pipeline in this process (own state, CSV cursor and ledger segment).
+    spec: dict with shard, csv_path, ledger_path, iterations and optional
+    llm_latency (stub LLM when set), scheduler, config, verbose.
+    """
+    from graph import run_graph
+    from llm_wrapper import LLM, ResponseCache
+
+    if spec.get('llm_latency') is not None:
+        llm = LLM(provider="stub", latency=spec['llm_latency'], cache=ResponseCache())
+    else:
+        llm = None
+    t0, c0 = time.perf_counter(), time.process_time()
+    out = io.StringIO() if not spec.get('verbose') else None
+    with contextlib.redirect_stdout(out) if out is not None else contextlib.nullcontext():
+        state = asyncio.run(run_graph(
+            iterations=spec['iterations'], llm=llm, config=spec.get('config'),
+            scheduler=spec.get('scheduler', 'sequential'), tick_interval=0.0,
+            csv_path=spec['csv_path'], ledger_path=spec['ledger_path']))
+    audit = state.get('audit_log', [])
+    return {
+        'shard': spec['shard'],
+        'ticks': spec['iterations'],
+        'events': len(state.get('perception_events', [])),
+        'ledger_entries': len(audit),
+        'head': audit[-1]['hash'] if audit else "",
+        'elapsed_s': time.perf_counter() - t0,
+        'cpu_s': time.process_time() - c0,
+    }
+
+# --- Runner ---
+class ShardedRunner:
+    """
+    Runs run_graph for many zones/regions at once by spreading shards over a process pool.
+    Each shard gets its own state and ledger segment (out_dir/ledger_<id>.jsonl); after a run
+    the shard heads are merged into one entry on a top-level chain (out_dir/ledger_top.jsonl).
+    """
+    def __init__(self, shard_csvs, out_dir="data/shards", workers=None, llm_latency=None,
+                 scheduler="sequential", config=None):
+        self.shard_csvs = list(shard_csvs)
+        self.out_dir = out_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.llm_latency = llm_latency
+        self.scheduler = scheduler
+        self.config = config
+        os.makedirs(out_dir, exist_ok=True)
+        self.top_ledger_path = os.path.join(out_dir, "ledger_top.jsonl")
+
+    @classmethod
+    def from_csv(cls, csv_path, n_shards, out_dir="data/shards", **kw):
+        """Partition one sensor CSV by zone and build a runner over the pieces."""
+        return cls(split_sensor_csv(csv_path, out_dir, n_shards), out_dir=out_dir, **kw)
+
+    def specs(self, iterations):
+        return [{
+            'shard': i,
+            'csv_path': p,
+            'ledger_path': os.path.join(self.out_dir, f"ledger_{i:03d}.jsonl"),
+            'iterations': iterations,
+            'llm_latency': self.llm_latency,
+            'scheduler': self.scheduler,
+            'config': self.config,
+        } for i, p in enumerate(self.shard_csvs)]
+
+    def run(self, iterations=10):
+        """Run every shard for `iterations` ticks; returns aggregate stats."""
+        specs = self.specs(iterations)
+        t0 = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(run_shard, specs))
+        wall = time.perf_counter() - t0
+        top = self.merge_heads(results)
+        ticks = sum(r['ticks'] for r in results)
+        events = sum(r['events'] for r in results)
+        cpu = sum(r['cpu_s'] for r in results)
+        return {
+            'shards': results,
+            'top_head': top['hash'],
+            'workers': self.workers,
+            'wall_s': wall,
+            'ticks_per_s': ticks / wall if wall else 0.0,
+            'events_per_s': events / wall if wall else 0.0,
+            'ledger_entries': sum(r['ledger_entries'] for r in results),
+            # shard CPU time packed into the wall clock: ~workers when scaling is linear
+            'effective_parallelism': cpu / wall if wall else 0.0,
+        }
+
+    def merge_heads(self, results):
+        """Append the per-shard heads (in shard order) as one entry on the top-level chain."""
+        entry = {
+            'type': 'shard_merge',
+            'shards': [{'shard': r['shard'], 'head': r['head'], 'entries': r['ledger_entries']}
+                       for r in sorted(results, key=lambda r: r['shard'])],
+        }
+        with LedgerWriter(self.top_ledger_path) as w:
+            return w.append(entry)
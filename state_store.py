@@ -0,0 +1,384 @@
+# state_store.py
+import os, sys, json
+from collections import deque
+
+# --- Compact event record ---
+class Event:
+    """
+    Perception event with __slots__ instead of a per-event dict.
+    Supports the mapping access agents already use (ev['value'], ev.get('sensor_type')).
+    """
+    __slots__ = ('ts', 'sensor_id', 'sensor_type', 'location', 'value', 'source')
+    FIELDS = __slots__
+
+    def __init__(self, ts, sensor_id, sensor_type, location, value, source="simulator"):
+        self.ts = ts
+        self.sensor_id = sensor_id
+        self.sensor_type = sensor_type
+        self.location = location
+        self.value = value
+        self.source = source
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if isinstance(key, str) else default
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def keys(self):
+        return self.FIELDS
+
+    def items(self):
+        return [(k, getattr(self, k)) for k in self.FIELDS]
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.FIELDS}
+
+    def __reduce__(self):
+        # constructor args pickle ~3x faster (and smaller) than the generic __slots__ state
+        return (Event, (self.ts, self.sensor_id, self.sensor_type, self.location, self.value, self.source))
+
+    def __eq__(self, other):
+        if isinstance(other, Event):
+            return all(getattr(self, k) == getattr(other, k) for k in self.FIELDS)
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Event({self.to_dict()!r})"
+
+def _json_default(o):
+    return o.to_dict() if hasattr(o, 'to_dict') else str(o)
+
+# --- Bounded list ---
+class RingBuffer:
+    """
+    Append-only list that keeps only the newest `maxlen` items in memory.
+    Indexing is logical: len() counts every item ever appended and non-negative indices
+    refer to that full history, so cursors like events[cursor:] keep working; negative
+    indices/slices are relative to the newest item. Items that fall out of memory are
+    served from the spill file (JSONL) when spill_path is set, otherwise dropped.
+    Evictions happen in chunks so the amortized cost per append stays O(1).
+    """
+    def __init__(self, maxlen, spill_path=None, chunk=None, items=()):
+        self.maxlen = maxlen
+        self.spill_path = spill_path
+        self.chunk = chunk or max(1, maxlen // 4)
+        self.start = 0          # logical index of self.items[0]
+        self.items = []
+        self.spilled = 0
+        self.extend(items)
+
+    def __len__(self):
+        return self.start + len(self.items)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        """Iterates the in-memory items only."""
+        return iter(list(self.items))
+
+    def append(self, item):
+        self.items.append(item)
+        if len(self.items) > self.maxlen + self.chunk:
+            self._evict()
+
+    def extend(self, items):
+        self.items.extend(items)
+        if len(self.items) > self.maxlen + self.chunk:
+            self._evict()
+
+    def extend_tail(self, n, tail):
+        """
+        Account for n appended items of which only `tail` (the newest len(tail)) is kept; the
+        older n - len(tail) count as evicted right away, without being built. For bulk input
+        whose older part could not stay in memory anyway: when anything is skipped, tail must
+        hold at least maxlen items, and there must be no spill file to write the skipped ones to.
+        """
+        skipped = n - len(tail)
+        if skipped > 0:
+            if self.spill_path:
+                raise ValueError("can't skip items of a ring buffer with a spill file")
+            if len(tail) < self.maxlen:
+                raise ValueError(f"tail of {len(tail)} items would leave the buffer short of maxlen={self.maxlen}")
+            # everything in memory is older than the skipped items: evicted with them
+            self.start += len(self.items) + skipped
+            self.items = []
+        self.extend(tail)
+
+    def retained(self, n):
+        """How many of n items appended at once would still be needed in memory / spilled."""
+        return n if self.spill_path else min(n, self.maxlen)
+
+    def _evict(self):
+        k = len(self.items) - self.maxlen
+        old = self.items[:k]
+        del self.items[:k]
+        if self.spill_path:
+            d = os.path.dirname(self.spill_path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            with open(self.spill_path, "a") as f:
+                f.write("".join(json.dumps(o, default=_json_default) + "\n" for o in old))
+            self.spilled += k
+        self.start += k
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step != 1:
+                return self[start:stop][::step]
+            if start < self.start and self.spill_path:
+                return self.query(start, stop)
+            lo = max(start - self.start, 0)
+            hi = max(stop - self.start, 0)
+            return self.items[lo:hi]
+        i = idx if idx >= 0 else len(self) + idx
+        if i < 0 or i >= len(self):
+            raise IndexError("RingBuffer index out of range")
+        if i < self.start:
+            if self.spill_path:
+                return self.query(i, i + 1)[0]
+            raise IndexError(f"item {i} was evicted (no spill file)")
+        return self.items[i - self.start]
+
+    def query(self, start=0, stop=None, where=None):
+        """
+        Items with logical index in [start, stop) from disk + memory.
+        where: optional predicate; spilled items come back as plain dicts.
+        """
+        stop = len(self) if stop is None else stop
+        out = []
+        if start < self.start and self.spill_path and os.path.exists(self.spill_path):
+            base = self.start - self.spilled
+            with open(self.spill_path) as f:
+                for i, line in enumerate(f, base):
+                    if i >= min(stop, self.start):
+                        break
+                    if i >= start:
+                        o = json.loads(line)
+                        if where is None or where(o):
+                            out.append(o)
+        for o in self.items[max(start - self.start, 0):max(stop - self.start, 0)]:
+            if where is None or where(o):
+                out.append(o)
+        return out
+
+    def nbytes(self, sample=64):
+        """Approximate memory held by the in-memory items (sampled)."""
+        n = len(self.items)
+        if not n:
+            return sys.getsizeof(self.items)
+        step = max(1, n // sample)
+        picked = self.items[::step]
+        per = sum(_sizeof(o) for o in picked) / len(picked)
+        return int(sys.getsizeof(self.items) + per * n)
+
+    def __eq__(self, other):
+        if isinstance(other, RingBuffer):
+            return self.start == other.start and self.items == other.items
+        if isinstance(other, list):
+            return self.start == 0 and self.items == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"RingBuffer(len={len(self)}, in_memory={len(self.items)}, maxlen={self.maxlen})"
+
+def _sizeof(o, depth=2):
+    size = sys.getsizeof(o)
+    if depth <= 0:
+        return size
+    if isinstance(o, dict):
+        size += sum(_sizeof(k, depth-1) + _sizeof(v, depth-1) for k, v in o.items())
+    elif isinstance(o, (list, tuple)):
+        size += sum(_sizeof(v, depth-1) for v in o)
+    elif hasattr(o, '__slots__'):
+        size += sum(_sizeof(getattr(o, k, None), depth-1) for k in o.__slots__)
+    return size
+
+# --- Versioned world state ---
+class WorldState(dict):
+    """
+    zone -> metrics mapping with a change counter. Treat it as read-only: evolve() returns a
+    new WorldState (copy-on-write, the old one is untouched) with version + 1 and the
+    zones that actually changed in .changed / .removed, or the same object when nothing
+    differs - so "did the world change?" is an identity or version check, not a diff.
+    Recent versions' change sets are kept (HISTORY) for changed_since() / delta().
+    It is a dict, so json.dumps and existing readers work unchanged.
+    """
+    __slots__ = ('version', 'changed', 'removed', '_log')
+    HISTORY = 256
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.version = 0
+        self.changed = frozenset(self)
+        self.removed = frozenset()
+        self._log = deque(maxlen=self.HISTORY)   # (base, version, changed, removed), shared along a lineage
+
+    def evolve(self, updates=None, removed=(), version=None):
+        """New version with `updates` applied and `removed` zones dropped (self if no-op)."""
+        updates = {z: v for z, v in (updates or {}).items() if z not in self or dict.__getitem__(self, z) != v}
+        removed = frozenset(z for z in removed if z in self and z not in updates)
+        if not updates and not removed:
+            return self
+        new = WorldState(self)
+        new.update(updates)
+        for z in removed:
+            del new[z]
+        new.version = self.version + 1 if version is None else version
+        new.changed = frozenset(updates)
+        new.removed = removed
+        log = self._log
+        if log and log[-1][1] != self.version:
+            # evolving an older version: branch off a copy of the history up to it
+            log = deque((e for e in log if e[1] <= self.version), maxlen=self.HISTORY)
+        log.append((self.version, new.version, new.changed, removed))
+        new._log = log
+        return new
+
+    def changed_since(self, version):
+        """
+        (changed zones, removed zones) between `version` and this one, or None when
+        `version` is not an ancestor within the kept history.
+        """
+        if version == self.version:
+            return frozenset(), frozenset()
+        if version is None or version > self.version:
+            return None
+        changed, removed = set(), set()
+        cur = self.version
+        for base, v, c, r in reversed(self._log):
+            if v > cur:
+                continue
+            if v != cur:
+                return None
+            changed |= c
+            removed |= r
+            cur = base
+            if cur == version:
+                return (frozenset(z for z in changed if z in self),
+                        frozenset(z for z in removed if z not in self))
+            if cur < version:
+                return None
+        return None
+
+    def changes_from(self, prev):
+        """
+        changed_since(prev.version) when prev is an earlier version of this same world
+        (the object a reader saw last time), else None.
+        """
+        if prev is self:
+            return frozenset(), frozenset()
+        if not isinstance(prev, WorldState) or prev._log is not self._log:
+            return None
+        return self.changed_since(prev.version)
+
+    def delta(self, since=None):
+        """
+        Compact update from version `since` to this one: {'version', 'since', 'set', 'removed'}.
+        Falls back to the full state (since=None) when `since` is out of the kept history.
+        """
+        cs = self.changed_since(since) if since is not None else None
+        if cs is None:
+            return {'version': self.version, 'since': None, 'set': dict(self), 'removed': []}
+        return {'version': self.version, 'since': since,
+                'set': {z: dict.__getitem__(self, z) for z in cs[0]}, 'removed': sorted(cs[1])}
+
+    def apply(self, delta):
+        """The WorldState a delta() describes, built on top of this one."""
+        if delta['since'] is None:
+            new = WorldState(delta['set'])
+            new.version = delta['version']
+            return new
+        if delta['since'] != self.version:
+            raise ValueError(f"delta is from version {delta['since']}, this is version {self.version}")
+        return self.evolve(delta['set'], delta['removed'], version=delta['version'])
+
+    def __eq__(self, other):
+        if isinstance(other, WorldState) and other._log is self._log and other.version == self.version:
+            return True
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    __hash__ = None
+
+# --- State store ---
+DEFAULT_LIMITS = {
+    'perception_events': 10000,
+    'provenance': 10000,
+    'summaries': 500,
+    'safety_notes': 500,
+    'assessor_notes': 500,
+    'audit_log': 1000,
+    'execution_results': 1000,
+    'learning_notes': 500,
+}
+
+class StateStore(dict):
+    """
+    The shared pipeline state, with bounded ring buffers for the fields that agents keep
+    appending to. Lists assigned to (or setdefault-ed on) a limited field are wrapped in a
+    RingBuffer; with spill_dir set, evicted items go to spill_dir/<field>.jsonl.
+    versions: key -> write counter, bumped on assignment and by touch() (the graph touches a
+    node's declared writes after it runs, since nodes also mutate values in place), so
+    checkpoints can tell which values changed without pickling them.
+    """
+    def __init__(self, *args, limits=None, spill_dir=None, **kw):
+        super().__init__()
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.spill_dir = spill_dir
+        self.versions = {}
+        self._clock = 0
+        self.update(*args, **kw)
+
+    def touch(self, keys=None):
+        """Mark keys (None = every key) as possibly changed in place."""
+        self._clock += 1
+        for k in (self if keys is None else keys):
+            if k in self:
+                self.versions[k] = self._clock
+
+    def _wrap(self, key, value):
+        if key in self.limits and isinstance(value, list):
+            spill = os.path.join(self.spill_dir, f"{key}.jsonl") if self.spill_dir else None
+            return RingBuffer(self.limits[key], spill, items=value)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, self._wrap(key, value))
+        self._clock += 1
+        self.versions[key] = self._clock
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kw):
+        for k, v in dict(*args, **kw).items():
+            self[k] = v
+
+    def memory_report(self):
+        """Per-field memory estimate: {field: {'len', 'in_memory', 'spilled', 'bytes'}}."""
+        report = {}
+        for k, v in self.items():
+            if isinstance(v, RingBuffer):
+                report[k] = {'len': len(v), 'in_memory': len(v.items), 'spilled': v.spilled, 'bytes': v.nbytes()}
+            else:
+                n = len(v) if hasattr(v, '__len__') else 1
+                report[k] = {'len': n, 'in_memory': n, 'spilled': 0, 'bytes': _sizeof(v)}
+        return report
@@ -0,0 +1,48 @@
+# tests/test_aggregation.py
+import asyncio, io, contextlib
+import numpy as np
+import graph
+from aggregation import ZoneAggregator
+from columnar import EventBatch
+from llm_wrapper import LLM
+
+def ev(ts, zone, value, stype='water_level'):
+    return {'ts': ts, 'location': zone, 'sensor_type': stype, 'value': value}
+
+def test_time_window_expires_on_the_event_clock():
+    agg = ZoneAggregator(('time', 120))
+    agg.update_many([ev("2025-10-25T10:00:00Z", 'zoneA', 1.0), ev("2025-10-25T10:01:00Z", 'zoneA', 2.0),
+                     ev("2025-10-25T10:03:30Z", 'zoneB', 5.0)])
+    agg.expire()    # years after these timestamps by the wall clock; 10:03:30 by the event clock
+    assert agg.stats['zoneA']['water'].count == 0      # 10:00 and 10:01 are older than 120 s
+    assert agg.zone_world('zoneB') == {'avg_water': 5.0, 'avg_garbage': None}
+    agg.update(ev("2025-10-25T10:04:00Z", 'zoneA', 3.0))
+    agg.expire()
+    assert agg.zone_world('zoneA')['avg_water'] == 3.0 and agg.stats['zoneB']['water'].count == 1
+
+def test_time_windows_over_historical_csv(tmp_path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        state = asyncio.run(graph.run_graph(6, llm=LLM(provider="stub"), tick_interval=0,
+                                            ledger_path=str(tmp_path / "ledger.jsonl"),
+                                            config={'fusion': {'window': ('time', 600)}}))
+    world = state['world_state']
+    assert world['zoneA']['avg_water'] is not None and world['zoneB']['avg_garbage'] is not None
+    assert all(s['count'] for zs in state['zone_stats'].values() for s in zs.values())
+
+def test_unparseable_timestamp_uses_the_event_clock():
+    rows = [ev("garbage", 'zoneA', 7.0), ev("2025-10-25T10:00:00Z", 'zoneA', 1.0),
+            ev("not a time", 'zoneA', 2.0), ev("2025-10-25T10:03:00Z", 'zoneB', 5.0)]
+    col = lambda k: np.array([r[k] for r in rows], dtype=object)
+    batch = EventBatch(col('ts'), col('location'), col('sensor_type'), col('location'),
+                       np.array([r['value'] for r in rows]), col('ts'))
+    per_event, batched = ZoneAggregator(('time', 120)), ZoneAggregator(('time', 120))
+    per_event.update_many(rows)
+    batched.update_batch(batch)
+    for agg in (per_event, batched):
+        # the first reading has no event clock yet and is dropped, the third is placed at
+        # 10:00; the clock itself only follows real timestamps (never the wall clock)
+        assert agg.latest == agg.stats['zoneB']['water'].values[-1][0]
+        assert [(t, v) for t, v, _ in agg.stats['zoneA']['water'].values] == [(agg.latest - 180, 1.0),
+                                                                              (agg.latest - 180, 2.0)]
+        agg.expire()
+        assert agg.stats['zoneA']['water'].count == 0 and agg.stats['zoneB']['water'].count == 1
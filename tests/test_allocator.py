@@ -0,0 +1,59 @@
+# tests/test_allocator.py
+import itertools
+import numpy as np
+from allocator import Allocator, solve, default_fleet
+
+def best_by_brute_force(V):
+    """Max total value over all assignments (each person to a distinct object, or idle)."""
+    R, S = V.shape
+    best = 0.0
+    for choice in itertools.product(range(-1, S), repeat=R):
+        taken = [j for j in choice if j >= 0]
+        if len(taken) == len(set(taken)):
+            best = max(best, sum(V[i, j] for i, j in enumerate(choice) if j >= 0))
+    return best
+
+def total(V, assign):
+    return sum(V[i, j] for i, j in enumerate(assign) if j >= 0)
+
+def test_auction_is_optimal_on_small_problems():
+    rng = np.random.default_rng(3)
+    for _ in range(40):
+        R, S = rng.integers(1, 6), rng.integers(1, 5)
+        V = rng.normal(10, 20, (R, S)).round(1)       # some pairs aren't worth it (idle wins)
+        assign, prices, _, finished = solve(V, time_budget=5.0)
+        assert finished
+        taken = assign[assign >= 0]
+        assert len(taken) == len(set(taken.tolist())) and set(assign.tolist()) <= set(range(-2, S))
+        assert abs(total(V, assign) - best_by_brute_force(V)) <= R * 1e-6 * np.abs(V).max() + 1e-9
+
+def incidents(severities):
+    return [{'zone': f"zone{i}", 'severity': s} for i, s in enumerate(severities)]
+
+def test_allocation_is_optimal_per_kind():
+    alloc = Allocator(time_budget=5.0)
+    fleet = default_fleet(trucks=5, crews=3, seed=1)
+    incs = incidents([3, 1, 2])
+    out = alloc.allocate(incs, fleet)
+    assert out.optimal
+    best = 0.0
+    for kind in ('crew', 'truck'):
+        _, _, V = alloc.values(incs, fleet, kind)
+        best += best_by_brute_force(V)
+    assert abs(out.objective - best) < 1e-3
+    assert sum(len(ids) for z in out.by_zone.values() for ids in z.values()) == len(out.assignments)
+    assert all(out.assignments[r] == zone for zone, kinds in out.by_zone.items() for ids in kinds.values() for r in ids)
+
+def test_warm_start_reaches_the_same_optimum():
+    alloc = Allocator(time_budget=5.0)
+    fleet = default_fleet(trucks=40, crews=15, seed=2)
+    incs = incidents([1 + i % 4 for i in range(12)])
+    first = alloc.allocate(incs, fleet)
+    again = alloc.allocate(incs, fleet, warm=first)      # nothing changed: the old prices still clear
+    assert again.assignments == first.assignments and again.iterations < first.iterations
+    bumped = incs[:3] + [{'zone': 'zone3', 'severity': 4}] + incs[4:]
+    for changed, res in [(bumped, fleet), (incs[:-1], fleet), (incs + [{'zone': 'zone12', 'severity': 1}], fleet),
+                         (incs, fleet[1:])]:
+        cold, warm = alloc.allocate(changed, res), alloc.allocate(changed, res, warm=first)
+        assert cold.optimal and warm.optimal
+        assert abs(warm.objective - cold.objective) <= 1e-6 * abs(cold.objective)
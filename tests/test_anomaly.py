@@ -0,0 +1,17 @@
+# tests/test_anomaly.py
+import tools
+
+def readings(values, sid='ws_01'):
+    return [{'sensor_id': sid, 'value': v} for v in values]
+
+def test_detect_adversarial_accepts_threshold_factor():
+    obs = readings([1.0, 1.1, 0.9, 1.0, 1.05, 0.95, 1.0, 1.02, 9.0])
+    assert tools.detect_adversarial(obs, threshold_factor=3.0)[-1]['sensor_id'] == 'ws_01'
+    assert tools.detect_adversarial(obs, 3.0) == tools.detect_adversarial(obs, threshold_factor=3.0)
+
+def test_threshold_factor_sets_the_spike_threshold():
+    # a jump that is large against the sensor's scale but still close to its baseline
+    obs = readings([1.0, 1.1, 0.9, 1.0, 1.05, 0.95, 1.0, 1.02, 1.25])
+    assert not tools.detect_adversarial(obs)
+    flags = tools.detect_adversarial(obs, threshold_factor=2.0)
+    assert [f['reason'] for f in flags] == ['sudden_spike']
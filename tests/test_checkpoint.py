@@ -0,0 +1,46 @@
+# tests/test_checkpoint.py
+import asyncio, io, contextlib
+import pytest
+import graph
+from checkpoint import Checkpointer, load
+from llm_wrapper import LLM
+from state_store import StateStore, WorldState
+from test_scheduler import project, run
+
+def test_unchanged_values_are_not_pickled(tmp_path):
+    state = StateStore({'world_state': WorldState({'z1': {'avg_water': 1.0}}), 'zone_stats': {'z1': {}},
+                        'plans': [{'name': 'p'}], 'perception_events': []})
+    ck = Checkpointer(str(tmp_path / "s.ckpt"), fsync=False)
+    ck.save(state, 1)
+    first = ck.stats['pickled']
+    ck.save(state, 2)
+    assert first == 4 and ck.stats['pickled'] == first
+    state['zone_stats']['z1']['water'] = 2.0      # in place, then touched like a node's writes
+    state.touch(['zone_stats'])
+    state['world_state'] = state['world_state'].evolve({'z2': {'avg_water': 3.0}})
+    ck.save(state, 3)
+    assert ck.stats['pickled'] == first + 2
+    ck.close()
+    restored, meta = load(ck.path)
+    assert meta['ticks'] == 3 and restored['zone_stats'] == {'z1': {'water': 2.0}}
+    assert restored['world_state'] == {'z1': {'avg_water': 1.0}, 'z2': {'avg_water': 3.0}}
+
+def test_last_checkpoint_matches_final_state(tmp_path):
+    ckpt = str(tmp_path / "state.ckpt")
+    ck = Checkpointer(ckpt, every=1, fsync=False)
+    final = run(tmp_path, "sequential", checkpoint=ck)
+    restored, meta = load(ckpt)
+    assert meta['ticks'] == 8 and ck.stats['checkpoints'] == 8
+    # only values some node wrote since the last checkpoint get pickled again (in a
+    # sequential run that is most of them; 'resources' and the like never are)
+    values = sum(not hasattr(v, 'extend_tail') for v in final.values())
+    assert ck.stats['pickled'] < values * 8
+    got, want = project(restored), project(final)
+    for key in want:
+        assert got[key] == want[key], key
+
+def test_record_refused_with_overlapping_ticks(tmp_path):
+    with pytest.raises(ValueError, match="recording needs tick boundaries"):
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(graph.run_graph(1, llm=LLM(provider="stub"), scheduler="dag", max_inflight_ticks=2,
+                                        record=str(tmp_path / "rec"), ledger_path=str(tmp_path / "l.jsonl")))
@@ -0,0 +1,81 @@
+# tests/test_columnar.py
+import asyncio
+import numpy as np
+import pytest
+import tools
+from agents import perception, fusion, safety
+from aggregation import ZoneAggregator
+from anomaly import StreamingDetector
+from columnar import CsvTail
+from state_store import StateStore, RingBuffer
+from workload import Workload
+
+def run_batches(path, limits):
+    """perception (batch mode) -> fusion -> safety until the CSV is drained."""
+    async def go():
+        state = StateStore(limits=limits)
+        toolset = {'csv_tail': CsvTail(path, max_bytes=64 << 10), 'detect_adversarial': tools.detect_adversarial}
+        while True:
+            before = state.get('ingest_offset', 0)
+            await perception.run(state, toolset, None, {'batch': True})
+            await fusion.run(state, toolset, None)
+            await safety.run(state, toolset, None)
+            if state['ingest_offset'] == before:
+                return state
+    return asyncio.run(go())
+
+def test_batch_path_matches_per_event(tmp_path):
+    w = Workload(zones=12, sensors=3, minutes=120, seed=5, floods=2, overflows=2, spikes=4)
+    path = w.write_csv(str(tmp_path / "sensors.csv"))
+    state = run_batches(path, {'perception_events': 500, 'provenance': 500})
+    events = [ev for b, _ in CsvTail(path).batches() for ev in b.records()]
+    assert len(events) > 2000 and state['ingest_stats']['rows'] == len(events)
+
+    agg, det = ZoneAggregator(), StreamingDetector()
+    agg.update_many(events)
+    flags = det.detect(events)
+    got = state['zone_aggregator']
+    assert sorted(got.stats) == sorted(agg.stats)
+    for zone in agg.stats:
+        for metric, ws in agg.stats[zone].items():
+            assert got.stats[zone][metric].snapshot() == pytest.approx(ws.snapshot())
+    got = state['anomaly_detector']
+    assert got.ids == det.ids and got.active == det.active
+    assert np.allclose(got.level, det.level) and np.array_equal(got.count, det.count)
+    fresh = StreamingDetector()
+    assert flags and [f for b, _ in CsvTail(path).batches() for f in tools.detect_adversarial(b, detector=fresh)] == flags
+
+    # only the retained tail was built as Events, at the right logical positions
+    buf = state['perception_events']
+    assert len(buf) == len(events) and buf.start >= len(events) - len(buf.items) > 0
+    assert buf[len(events) - 1] == events[-1] and buf[buf.start] == events[buf.start]
+    assert state['provenance'][len(events) - 1] == {'agent': 'perception', 'obs_id': len(events) - 1}
+
+def test_extend_tail_needs_a_full_tail_and_no_spill(tmp_path):
+    buf = RingBuffer(3, items=[1, 2])
+    buf.extend_tail(10, [8, 9, 10])
+    assert len(buf) == 12 and list(buf) == [8, 9, 10] and buf[11] == 10
+    with pytest.raises(ValueError):
+        buf.extend_tail(10, [1, 2])
+    with pytest.raises(ValueError):
+        RingBuffer(3, spill_path=str(tmp_path / "spill.jsonl")).extend_tail(10, [1, 2, 3])
+
+def test_csv_tail_skips_overlong_and_malformed_rows(tmp_path):
+    path = tmp_path / "sensors.csv"
+    good = "2025-10-25T10:00:00Z,ws_01,water_level,zoneA,{}\n"
+    path.write_text("timestamp,sensor_id,sensor_type,location,value\n" + good.format(1.0) +
+                    "2025-10-25T10:01:00Z,ws_01,water_level,zoneA," + "9" * 500 + "\n" +
+                    good.format(2.0) + "garbage,with,far,too,many,fields,here\n\n" + good.format(3.0) +
+                    "2025-10-25T10:03:00Z,ws_01,wat")
+    tail = CsvTail(str(path), max_bytes=200)
+    out = list(tail.batches())
+    values = [v for b, _ in out for v in b.value]
+    assert values == [1.0, 2.0, 3.0] and sum(b.rejected for b, _ in out) == 2
+    # the unfinished last row waits for its newline
+    offset = out[-1][1]
+    batch, pending = tail.read(offset)
+    assert len(batch) == 0 and pending == offset
+    with open(path, "a") as f:
+        f.write("er_level,zoneA,4.0\n")
+    batch, _ = tail.read(offset)
+    assert list(batch.value) == [4.0] and batch.rejected == 0
@@ -0,0 +1,88 @@
+# tests/test_dispatch.py
+import asyncio, time
+from collections import Counter
+from dispatch import ExecutionEngine, StubDispatchService
+
+def plan(actors, zone='zone1'):
+    return {'id': 'p1', 'zone': zone,
+            'steps': [{'actor': a, 'action': 'dispatch_truck', 'count': 1} for a in actors]}
+
+def test_retries_dispatch_each_step_once():
+    svc = StubDispatchService(latency=0.005, failure_rate=0.3, lost_ack_rate=0.2, seed=1)
+    engine = ExecutionEngine(svc, timeout=0.05, retries=8, backoff=0.001)
+    res = asyncio.run(engine.run(plan([f"crew{i % 4}" for i in range(30)])))
+    assert all(r['status'] == 'ok' for r in res)
+    assert svc.stats['failures'] and svc.stats['lost_acks'] and svc.stats['duplicates']
+    keys = [p['idempotency_key'] for p in svc.dispatched]
+    assert len(keys) == len(set(keys)) == 30
+    assert sorted(r['key'] for r in res) == sorted(keys)
+    # a second execution of the same plan gets new keys
+    again = asyncio.run(engine.run(plan([f"crew{i % 4}" for i in range(30)]), execution=1))
+    assert not {r['key'] for r in again} & set(keys)
+
+def test_lost_ack_retry_is_answered_from_the_dedupe_table():
+    svc = StubDispatchService(latency=0.001, lost_ack_rate=1.0, seed=0)
+    engine = ExecutionEngine(svc, timeout=0.02, retries=2, backoff=0.001)
+    (r,) = asyncio.run(engine.run(plan(["crew0"])))
+    assert r['status'] == 'ok' and r['attempts'] == 2
+    assert svc.stats['dispatched'] == 1 and svc.stats['duplicates'] == 1
+
+def test_slow_service_times_out_after_all_attempts():
+    svc = StubDispatchService(latency=0.1)
+    engine = ExecutionEngine(svc, timeout=0.01, retries=2, backoff=0.001)
+    (r,) = asyncio.run(engine.run(plan(["crew0"])))
+    assert r['status'] == 'timeout' and r['attempts'] == 3 and r['result'] == {'ok': False, 'error': 'timeout'}
+    assert svc.stats['requests'] == 3 and svc.stats['dispatched'] == 0
+
+def test_per_actor_limit_and_no_global_slots_held_while_waiting():
+    inflight, peak, done_at = Counter(), Counter(), {}
+    t0 = time.perf_counter()
+    async def dispatch(payload):
+        actor = payload['zone']
+        inflight[actor] += 1
+        peak[actor] = max(peak[actor], inflight[actor])
+        await asyncio.sleep(0.02)
+        inflight[actor] -= 1
+        done_at[payload['idempotency_key']] = time.perf_counter() - t0
+        return {'ok': True}
+    engine = ExecutionEngine(dispatch, concurrency=2, per_actor=4, actor_limits={'busy': 1}, timeout=1.0)
+    # the zone doubles as the actor name so the dispatch callable can see it
+    steps = plan(['busy'] * 6 + ['free'])['steps']
+    async def go():
+        limits = {None: asyncio.Semaphore(engine.concurrency)}
+        return await asyncio.gather(*(engine.run_step({'zone': s['actor']}, s, f"k{i}", limits)
+                                      for i, s in enumerate(steps)))
+    res = asyncio.run(go())
+    assert all(r['status'] == 'ok' for r in res) and peak['busy'] == 1
+    # 'free' only waits for a global slot, not behind the queue of 'busy' steps
+    assert done_at['k6'] < 0.06 and max(done_at.values()) >= 0.12
+
+def test_sync_dispatch_runs_off_the_loop_and_times_out():
+    def blocking(payload):
+        time.sleep(0.3)
+        return {'ok': True}
+    async def go():
+        engine = ExecutionEngine(blocking, timeout=0.05, retries=0)
+        ticks = 0
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        t = asyncio.ensure_future(ticker())
+        t0 = time.perf_counter()
+        (r,) = await engine.run(plan(["crew0"]))
+        t.cancel()
+        return r, time.perf_counter() - t0, ticks
+    r, dt, ticks = asyncio.run(go())
+    assert r['status'] == 'timeout' and dt < 0.2 and ticks >= 2
+
+def test_non_dict_result_fails_without_retries():
+    calls = []
+    def broken(payload):
+        calls.append(payload)
+        return "accepted"
+    engine = ExecutionEngine(broken, retries=3, backoff=0.001)
+    (r,) = asyncio.run(engine.run(plan(["crew0"])))
+    assert r['status'] == 'failed' and r['attempts'] == 1 and len(calls) == 1
+    assert "unexpected result 'accepted'" in r['result']['error']
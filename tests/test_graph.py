@@ -0,0 +1,36 @@
+# tests/test_graph.py
+import asyncio, io, contextlib
+import pytest
+import graph
+from ingest import IngestServer
+from instrumentation import Metrics
+from llm_wrapper import LLM
+from workload import Workload
+
+class FailingMetrics(Metrics):
+    """Raises out of the end of tick `fail_at` (1-based)."""
+    def __init__(self, fail_at):
+        super().__init__()
+        self.fail_at, self.ticks = fail_at, 0
+
+    def maybe_export(self):
+        self.ticks += 1
+        if self.ticks == self.fail_at:
+            raise RuntimeError("export failed")
+
+def test_run_graph_cleans_up_when_a_tick_raises(tmp_path):
+    ticks = 6
+    csv = Workload(zones=6, sensors=2, minutes=ticks, seed=3, floods=2, overflows=1).write_csv(str(tmp_path / "s.csv"))
+    ledger = tmp_path / "ledger.jsonl"
+    server = IngestServer(tcp_port=0)
+    with contextlib.redirect_stdout(io.StringIO()), pytest.raises(RuntimeError, match="export failed"):
+        asyncio.run(graph.run_graph(ticks, llm=LLM(provider="stub"), tick_interval=0, csv_path=csv,
+                                    ledger_path=str(ledger), config={'perception': {'batch': True}},
+                                    ledger_batch={'max_batch': 10_000, 'max_delay': 60},
+                                    ingest=server, record=str(tmp_path / "rec"),
+                                    checkpoint={'path': str(tmp_path / "state.ckpt"), 'every': 1},
+                                    metrics=FailingMetrics(ticks)))
+    # the server run_graph started is closed, and entries still queued in the group-commit
+    # writer (60 s delay) were flushed to the ledger
+    assert not server.running
+    assert ledger.read_text().count("\n") > 0
@@ -0,0 +1,110 @@
+# tests/test_ingest.py
+import asyncio, json, socket, time
+import numpy as np
+import pytest
+from ingest import IngestServer, encode_frame, decode_frames, MAX_FIELD
+from state_store import StateStore
+from agents import perception, fusion
+
+def reading(i, zones):
+    z = i % zones
+    if z % 2 == 0:
+        return (f"ws_{z}", 'water_level', f"zone{z}", (i % 40) / 10)
+    return (f"gs_{z}", 'garbage_level', f"zone{z}", 30 + i % 70)
+
+async def tcp_load(port, n, conns, lines_per_write, zones):
+    """n JSON lines over `conns` connections, lines_per_write per write; returns the count sent."""
+    per = n // conns
+    async def one(c):
+        _, w = await asyncio.open_connection("127.0.0.1", port)
+        ids = range(c * per, (c + 1) * per)
+        for start in range(0, per, lines_per_write):
+            w.write("".join(json.dumps(dict(zip(('sensor_id', 'sensor_type', 'location', 'value'),
+                                                reading(i, zones)), timestamp=i)) + "\n"
+                            for i in ids[start:start + lines_per_write]).encode())
+            await w.drain()     # respects backpressure from the server
+        w.close()
+        await w.wait_closed()
+    await asyncio.gather(*(one(c) for c in range(conns)))
+    return per * conns
+
+async def udp_load(port, n, frames_per_dgram, zones):
+    """n binary frames, frames_per_dgram per datagram; returns the count sent."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    for start in range(0, n, frames_per_dgram):
+        sock.sendto(b"".join(encode_frame(*reading(i, zones), ts=i)
+                             for i in range(start, min(n, start + frames_per_dgram))),
+                    ("127.0.0.1", port))
+        await asyncio.sleep(0)       # let the server read the socket before its buffer fills
+    sock.close()
+    return n
+
+async def pipeline(server, done, latencies, period):
+    """perception + fusion draining the server until `done` and the queue is empty."""
+    state = StateStore({'perception_events': []}, limits={'perception_events': 10_000, 'provenance': 10_000})
+    tools = {'ingest': server}
+    while not (done.is_set() and server.pending() == 0):
+        await perception.run(state, tools, None, {})
+        stats = state['ingest_stats']
+        await fusion.run(state, tools, None, {})
+        if stats['oldest_recv'] is not None:
+            now = time.perf_counter()
+            latencies += [now - stats['oldest_recv'], now - stats['newest_recv']]
+        await asyncio.sleep(period)
+    return state
+
+async def load(proto, events, zones=20):
+    """Run the load generator against a server while perception + fusion drain it."""
+    server = IngestServer(tcp_port=0 if proto == 'tcp' else None, udp_port=0 if proto == 'udp' else None,
+                          maxsize=5_000, overflow='block')
+    async with server:
+        done, latencies = asyncio.Event(), []
+        pipe = asyncio.create_task(pipeline(server, done, latencies, 0.005))
+        t0 = time.perf_counter()
+        if proto == 'tcp':
+            sent = await tcp_load(server.tcp_port, events, 4, 100, zones)
+            while server.stats['received'] < sent and time.perf_counter() - t0 < 30:
+                await asyncio.sleep(0.01)
+        else:
+            sent = await udp_load(server.udp_port, events, 50, zones)
+            await asyncio.sleep(0.2)
+        done.set()
+        state = await pipe
+        dt = time.perf_counter() - t0
+    return sent, server.stats, state, np.array(latencies), dt
+
+def test_tcp_load_generator_throughput_and_latency():
+    sent, stats, state, lat, dt = asyncio.run(load('tcp', 20_000))
+    # 'block' overflow pushes back on the senders instead of dropping
+    assert stats['accepted'] == stats['drained'] == sent and stats['dropped'] == stats['malformed'] == 0
+    assert len(state['perception_events']) == sent and len(state['world_state']) == 20
+    assert sent / dt > 5_000
+    assert len(lat) and np.percentile(lat, 99) < 1.0
+
+def test_udp_load_generator_frames():
+    sent, stats, state, lat, dt = asyncio.run(load('udp', 5_000))
+    # loopback UDP can still lose datagrams under load: most, not all, have to arrive
+    assert stats['malformed'] == 0 and stats['accepted'] == stats['drained'] >= 0.9 * sent
+    assert len(state['perception_events']) == stats['drained'] and len(state['world_state']) == 20
+    assert len(lat) and np.percentile(lat, 99) < 1.0
+
+def test_encode_frame_field_limit():
+    frame = encode_frame("s" * MAX_FIELD, "water_level", "zone1", 1.5, ts=7)
+    assert decode_frames(frame)[0]['sensor_id'] == "s" * MAX_FIELD
+    with pytest.raises(ValueError, match="location is 256 bytes"):
+        encode_frame("s1", "water_level", "z" * 256, 1.5)
+    with pytest.raises(ValueError, match="sensor_type"):
+        encode_frame("s1", "é" * 128, "zone1", 1.5)
+
+def test_tcp_handler_passes_its_cancellation_on():
+    async def go():
+        async with IngestServer(tcp_port=0) as server:
+            _, w = await asyncio.open_connection("127.0.0.1", server.tcp_port)
+            await asyncio.sleep(0.05)
+            (handler,) = [t for t in asyncio.all_tasks() if '_handle_tcp' in repr(t.get_coro())]
+            handler.cancel()
+            await asyncio.gather(handler, return_exceptions=True)
+            w.close()
+            return handler.cancelled(), len(server._conns)
+    assert asyncio.run(go()) == (True, 0)
@@ -0,0 +1,80 @@
+# tests/test_instrumentation.py
+import asyncio, io, json, logging
+import numpy as np
+from instrumentation import Metrics, Histogram, RateLimitFilter, configure_logging, get_logger, current_agent
+
+def test_histogram_quantiles_are_within_bucket_error():
+    values = np.random.default_rng(0).lognormal(-4, 1.5, 5000)
+    h = Histogram()
+    for v in values:
+        h.observe(float(v))
+    for q in (0.5, 0.95, 0.99):
+        exact = np.quantile(values, q, method='lower')
+        assert abs(h.quantile(q) - exact) <= 0.03 * exact
+    assert h.quantile(1.0) <= h.max == values.max() and h.quantile(0.0) >= h.min == values.min()
+    h.observe(0.0)
+    assert h.min == 0.0 and h.quantile(0.0) == 0.0 and h.snapshot()['count'] == 5001
+    assert Histogram().quantile(0.5) is None
+
+def test_timed_labels_sync_and_async_calls_with_the_agent():
+    m = Metrics()
+    add = m.timed('tool_seconds', lambda a, b: a + b, tool='add')
+    async def fetch(x):
+        await asyncio.sleep(0)
+        return x
+    afetch = m.timed('tool_seconds', fetch, tool='fetch')
+    async def node():
+        current_agent.set('planner')
+        return add(1, 2), await afetch('x')
+    assert asyncio.run(node()) == (3, 'x') and add(3, 4) == 7
+    series = m.histograms['tool_seconds']
+    assert {k: h.count for k, h in series.items()} == {
+        (('agent', 'planner'), ('tool', 'add')): 1, (('agent', 'planner'), ('tool', 'fetch')): 1,
+        (('agent', None), ('tool', 'add')): 1}
+    assert afetch.__wrapped__ is fetch and afetch.__name__ == 'fetch'
+
+def test_flush_writes_the_trace_and_the_prometheus_file(tmp_path):
+    trace, prom = tmp_path / "trace.jsonl", tmp_path / "metrics" / "greenmesh.prom"
+    m = Metrics(trace_path=str(trace), export_path=str(prom), export_interval=3600)
+    with m.time('agent_seconds', agent='fusion'):
+        pass
+    m.set('ingest_queue_depth', 40)
+    m.maybe_export()                               # inside the interval: nothing written yet
+    assert not prom.exists() and not trace.exists()
+    m.flush()
+    spans = [json.loads(line) for line in trace.read_text().splitlines()]
+    assert [(s['name'], s['agent']) for s in spans] == [('agent_seconds', 'fusion')]
+    text = prom.read_text()
+    assert '# TYPE greenmesh_agent_seconds summary' in text
+    assert 'greenmesh_agent_seconds_count{agent="fusion"} 1' in text
+    assert 'greenmesh_ingest_queue_depth 40' in text and text == m.to_prometheus()
+    m.flush()                                      # spans are written once
+    assert len(trace.read_text().splitlines()) == 1
+
+def test_rate_limited_logging_reports_what_it_dropped():
+    out, root = io.StringIO(), logging.getLogger("greenmesh")
+    saved = root.level, root.propagate
+    configure_logging("DEBUG", json_lines=True, burst=2, interval=60, stream=out)
+    try:
+        log = get_logger('test')
+        for i in range(5):
+            log.info("tick %d", i, extra={'n': i})
+        log.warning("kept")
+        flt = next(f for f in root.handlers[0].filters if isinstance(f, RateLimitFilter))
+        flt._windows[('greenmesh.test', "tick %d")][0] -= 60     # the next record opens a new window
+        log.info("tick %d", 5)
+    finally:
+        root.handlers.clear()
+        root.setLevel(saved[0])
+        root.propagate = saved[1]
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r['msg'] for r in lines] == ["tick 0", "tick 1", "kept", "tick 5"]
+    assert lines[0]['n'] == 0 and lines[-1]['suppressed'] == 3
+
+def test_prometheus_label_values_are_escaped_and_none_is_omitted():
+    m = Metrics()
+    m.inc('tool_calls_total', tool='say "hi"\\now\n')
+    m.inc('tool_calls_total', agent=None, tool='plain')
+    text = m.to_prometheus()
+    assert 'tool_calls_total{tool="say \\"hi\\"\\\\now\\n"} 1' in text
+    assert 'tool_calls_total{tool="plain"} 1' in text and 'None' not in text
@@ -0,0 +1,112 @@
+# tests/test_ledger.py
+import asyncio, json
+import pytest
+from ledger import LedgerWriter, BatchedLedgerWriter
+from ledger_index import LedgerReader
+
+def test_interval_policy_fsyncs_idle_tail(tmp_path):
+    async def go():
+        b = BatchedLedgerWriter(LedgerWriter(str(tmp_path / "l.jsonl")), max_delay=0.001,
+                                fsync='interval', fsync_interval=0.05)
+        await b.append({'n': 0})            # first batch inside the interval: no fsync yet
+        before = b.stats['fsyncs']
+        await asyncio.sleep(0.15)           # no further batches: the timer has to do it
+        after = b.stats['fsyncs']
+        await b.close()
+        return before, after
+    before, after = asyncio.run(go())
+    assert before == 0 and after == 1
+
+def test_queued_counts_lines_being_written(tmp_path):
+    async def go():
+        b = BatchedLedgerWriter(LedgerWriter(str(tmp_path / "l.jsonl")), max_delay=10, fsync='entry')
+        futs = [b.submit({'n': i})[1] for i in range(3)]
+        flush = asyncio.ensure_future(b.flush())
+        await futs[0]                        # the batch is now being written entry by entry
+        with open(tmp_path / "l.jsonl") as f:
+            written = [json.loads(line)['entry']['n'] for line in f]
+        seen = [json.loads(line)['entry']['n'] for line in b.queued()]
+        await flush
+        await b.close()
+        return written, seen, b.queued()
+    written, seen, rest = asyncio.run(go())
+    # every chained entry is either in the file or reported as queued (what a checkpoint records)
+    assert seen and written + seen == [0, 1, 2] and rest == []
+    with LedgerReader(str(tmp_path / "l.jsonl"), persist=False) as r:
+        assert r.verify(workers=1)['ok'] and len(r) == 3
+
+def test_writer_recovers_from_a_torn_tail(tmp_path):
+    path = str(tmp_path / "l.jsonl")
+    with LedgerWriter(path) as w:
+        for i in range(5):
+            w.append({'n': i})
+        head = w.head
+        line = json.dumps(w.make_payload({'n': 5})) + "\n"
+    with open(path, "a") as f:
+        f.write(line[:len(line) // 2])      # crash mid-append
+    with LedgerWriter(path) as w:
+        assert w.head == head
+        w.append({'n': 6})
+    assert (tmp_path / "l.torn.jsonl").read_text() == line[:len(line) // 2] + "\n"
+    with LedgerReader(path, persist=False) as r:
+        assert r.verify(workers=1)['ok'] and [e['entry']['n'] for e in r] == [0, 1, 2, 3, 4, 6]
+
+def test_complete_entry_missing_its_newline_is_kept(tmp_path):
+    path = str(tmp_path / "l.jsonl")
+    with LedgerWriter(path) as w:
+        w.append({'n': 0})
+        line = json.dumps(w.make_payload({'n': 1}))
+    with open(path, "a") as f:
+        f.write(line)
+    with LedgerWriter(path) as w:
+        assert w.head == json.loads(line)['hash']
+        w.append({'n': 2})
+    with LedgerReader(path, persist=False) as r:
+        assert r.verify(workers=1)['ok'] and len(r) == 3
+    assert not (tmp_path / "l.torn.jsonl").exists()
+
+class FailingFile:
+    """Wraps the writer's file handle: writes after the first `ok` fail like a full disk."""
+    def __init__(self, f, ok):
+        self.f, self.ok = f, ok
+    def write(self, data):
+        if not self.ok:
+            raise OSError(28, "No space left on device")
+        self.ok -= 1
+        return self.f.write(data)
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+def test_failed_batch_stops_the_chain_until_reopened(tmp_path):
+    path = str(tmp_path / "l.jsonl")
+    async def go():
+        w = LedgerWriter(path)
+        b = BatchedLedgerWriter(w, max_delay=10, fsync='entry')
+        b.submit({'n': 0})
+        await b.flush()
+        real, w._f = w._f, FailingFile(w._f, 1)
+        futs = [b.submit({'n': i})[1] for i in (1, 2)]
+        fsync, later = b._fsync, []
+        async def submit_during_fsync():
+            # chained onto the batch while it is being written: 1 is in, 2 fails next
+            later.append(b.submit({'n': 3})[1])
+            await fsync()
+        b._fsync = submit_during_fsync
+        flush = asyncio.ensure_future(b.flush())
+        results = await asyncio.gather(flush, futs[1], return_exceptions=True)
+        assert await futs[0] and len(later) == 1
+        results += await asyncio.gather(later[0], return_exceptions=True)
+        b._fsync = fsync
+        w._f = real
+        with pytest.raises(RuntimeError, match="failed earlier"):
+            b.submit({'n': 4})
+        await b.close()
+        w.close()
+        return results
+    results = asyncio.run(go())
+    assert all(isinstance(r, OSError) for r in results)
+    # a new writer continues from the last line that made it into the file
+    with LedgerWriter(path) as w:
+        w.append({'n': 5})
+    with LedgerReader(path, persist=False) as r:
+        assert r.verify(workers=1)['ok'] and [e['entry']['n'] for e in r] == [0, 1, 5]
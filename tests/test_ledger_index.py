@@ -0,0 +1,67 @@
+# tests/test_ledger_index.py
+import json, os
+from ledger import LedgerWriter, segment_paths, INDEX_SUFFIX
+from ledger_index import LedgerReader, compact
+
+def write(path, n, start=0, max_segment_bytes=1500):
+    with LedgerWriter(path, max_segment_bytes=max_segment_bytes) as w:
+        for i in range(start, start + n):
+            w.append({'plan_id': f"p{i % 7}", 'plan_name': ('evacuate', 'clean')[i % 2],
+                      'zone': f"zone{i % 3}", 'n': i})
+
+def expected(path, **filters):
+    rows = []
+    for seg in segment_paths(path):
+        with open(seg) as f:
+            rows.extend(json.loads(line) for line in f)
+    return [p for p in rows if all(str(p['entry'][k]) == str(v) for k, v in filters.items())]
+
+def test_queries_across_rotated_segments(tmp_path):
+    path = str(tmp_path / "ledger.jsonl")
+    write(path, 60)
+    assert len(segment_paths(path)) > 3
+    with LedgerReader(path, workers=1) as r:
+        assert len(r) == 60 and [p['entry']['n'] for p in r] == list(range(60))
+        for filters in ({'zone': 'zone1'}, {'plan_id': 'p3', 'plan_name': 'clean'}, {'plan_id': 'nope'}):
+            assert r.find(**filters) == expected(path, **filters)
+        ts = [p['ts'] for p in r]
+        assert list(r.rows(since=ts[10], until=ts[20])) == [i for i, t in enumerate(ts) if ts[10] <= t <= ts[20]]
+        assert r[-1]['entry']['n'] == 59 and r.head == r[-1]['hash']
+        assert r.verify()['ok']
+    assert all(os.path.exists(p + INDEX_SUFFIX) for p in segment_paths(path))
+
+    write(path, 25, start=60)                 # more entries and rotations: indexes are extended
+    with LedgerReader(path, workers=1) as r:
+        assert [p['entry']['n'] for p in r] == list(range(85))
+        assert r.find(zone='zone2') == expected(path, zone='zone2')
+        report = r.verify()
+        assert report['ok'] and report['entries'] == 85 and report['segments'] == len(segment_paths(path))
+
+def test_compact_keeps_the_chain_and_the_rows(tmp_path):
+    path = str(tmp_path / "ledger.jsonl")
+    write(path, 60)
+    with LedgerReader(path, workers=1) as r:
+        before, segments = list(r), len(segment_paths(path))
+        written = compact(path, target_bytes=4000)
+        assert written and len(segment_paths(path)) < segments
+        assert os.path.exists(path)           # the active file is never merged
+        assert r.refresh() == 60 and list(r) == before
+        assert r.find(plan_id='p4') == expected(path, plan_id='p4')
+        assert r.verify()['ok']
+    with LedgerReader(path, workers=1, persist=False) as r:
+        assert list(r) == before
+
+def test_verify_reports_a_tampered_entry(tmp_path):
+    path = str(tmp_path / "ledger.jsonl")
+    write(path, 20, max_segment_bytes=None)
+    with open(path) as f:
+        lines = f.readlines()
+    p = json.loads(lines[5])
+    p['entry']['zone'] = 'elsewhere'
+    lines[5] = json.dumps(p) + "\n"
+    with open(path, "w") as f:
+        f.writelines(lines)
+    with LedgerReader(path, workers=1, persist=False) as r:
+        report = r.verify()
+    assert not report['ok'] and [e['error'] for e in report['errors']] == ["hash mismatch"]
+    assert report['errors'][0]['offset'] == sum(len(line) for line in lines[:5])
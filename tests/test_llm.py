@@ -0,0 +1,130 @@
+# tests/test_llm.py
+import asyncio, time, io, threading, contextlib
+import graph
+from llm_wrapper import LLM, ResponseCache
+from instrumentation import Metrics
+
+class CountingLLM(LLM):
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        self.calls = 0
+
+    async def acall(self, *a, **kw):
+        self.calls += 1
+        return await super().acall(*a, **kw)
+
+class SlowProvider(LLM):
+    """'gemini' provider whose blocking round trip is a sleep (no SDK, no network)."""
+    def __init__(self, delay, **kw):
+        super().__init__(provider="stub", **kw)
+        self.provider, self.key, self.delay = "gemini", "test", delay
+
+    def _generate(self, prompt, max_tokens, temperature):
+        time.sleep(self.delay)
+        return {"text": "slow"}
+
+def run_ticks(tmp_path, scheduler, latency, ticks=3):
+    llm = CountingLLM(provider="stub", latency=latency)
+    metrics = Metrics()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(graph.run_graph(ticks, llm=llm, scheduler=scheduler, tick_interval=0, max_inflight_ticks=1,
+                                    ledger_path=str(tmp_path / f"{scheduler}.jsonl"), metrics=metrics))
+    return metrics.histograms['tick_seconds'][()].quantile(.5), llm.calls / ticks
+
+def test_tick_wall_clock_drops_when_llm_calls_overlap(tmp_path):
+    latency = 0.1
+    serial, calls = run_ticks(tmp_path, "sequential", latency)
+    overlapped, _ = run_ticks(tmp_path, "dag", latency)
+    assert calls >= 2
+    # one after another every tick waits for each call; the dag awaits them together
+    assert serial >= calls * latency * 0.9
+    assert overlapped < serial * 0.6
+
+def test_acall_concurrency_limit():
+    async def go(limit):
+        llm = LLM(provider="stub", latency=0.05, max_concurrency=limit)
+        t0 = time.perf_counter()
+        await asyncio.gather(*(llm.acall(f"q{i}") for i in range(8)))
+        return time.perf_counter() - t0
+    assert asyncio.run(go(8)) < 0.1
+    assert asyncio.run(go(2)) >= 0.2
+
+def test_timed_out_call_keeps_its_slot_until_the_thread_returns():
+    async def go():
+        llm = SlowProvider(0.3, max_concurrency=1, timeout=0.05, retries=0)
+        out = await llm.acall("q")                    # times out -> simulated fallback
+        busy_after_timeout = llm.busy
+        t0 = time.perf_counter()
+        llm.delay = 0
+        await llm.acall("q2")                         # has to wait for the first thread
+        waited = time.perf_counter() - t0
+        return out, busy_after_timeout, waited, llm.busy
+    out, busy, waited, busy_end = asyncio.run(go())
+    assert out['text'] == "OK" and busy == 1 and waited >= 0.15 and busy_end == 0
+
+def test_persistent_cache_io_runs_off_the_event_loop(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite"))
+    threads = []
+    get, put = cache.get, cache.put
+    cache.get = lambda k: threads.append(threading.current_thread()) or get(k)
+    cache.put = lambda k, t: threads.append(threading.current_thread()) or put(k, t)
+    async def go():
+        llm = LLM(provider="stub", cache=cache)
+        await llm.acall("plan something")
+        return await llm.acall("plan something")
+    assert asyncio.run(go())['text'].startswith('{"plans"')
+    assert threads and threading.main_thread() not in threads
+    cache.close()
+
+class EmptyProvider(LLM):
+    """'gemini' provider whose model answers with self.reply (empty = blocked)."""
+    def __init__(self, **kw):
+        super().__init__(provider="stub", **kw)
+        self.provider, self.key, self.reply = "gemini", "test", ""
+
+    def _client(self):
+        outer = self
+        class Model:
+            def generate_content(self, prompt, generation_config=None):
+                return type("Response", (), {'text': outer.reply})()
+        return Model()
+
+def test_empty_reply_fallback_is_not_cached():
+    llm = EmptyProvider(cache=ResponseCache())
+    assert llm.call("plan")['text'] == llm._simulate("plan")
+    assert len(llm.cache) == 0
+    async def go():
+        await llm.acall("plan")
+        llm.reply = "real answer"
+        return await llm.acall("plan")
+    assert asyncio.run(go())['text'] == "real answer"
+    assert llm.call("plan")['text'] == "real answer"
+
+def test_keyless_simulation_is_not_cached(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite"))
+    llm = EmptyProvider(cache=cache)
+    llm.key, llm.reply = None, "real answer"
+    assert llm.call("plan")['text'] == llm._simulate("plan")
+    assert asyncio.run(llm.acall("assess"))['text'] == llm._simulate("assess")
+    assert len(cache) == 0
+    # once a key is configured the model is asked, not the simulation replayed from the cache
+    llm.key = "test"
+    assert llm.call("plan")['text'] == "real answer"
+    assert asyncio.run(llm.acall("assess"))['text'] == "real answer"
+    cache.close()
+
+def test_cancelled_first_caller_does_not_cancel_waiters():
+    async def go():
+        llm = SlowProvider(0.1, cache=ResponseCache())
+        first = asyncio.ensure_future(llm.acall("plan"))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(llm.acall("plan"))     # joins the in-flight request
+        await asyncio.sleep(0.01)
+        first.cancel()                                         # e.g. the planner's deadline
+        out = await second
+        pool = llm._pool
+        llm.close()
+        return first.cancelled(), out, pool, llm._pool
+    cancelled, out, pool, after = asyncio.run(go())
+    assert cancelled and out['text'] == "slow"
+    assert pool._shutdown and after is None
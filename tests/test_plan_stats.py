@@ -0,0 +1,60 @@
+# tests/test_plan_stats.py
+import os, json
+from ledger import LedgerWriter, rewind
+from plan_stats import PlanStats, STATS_SUFFIX
+
+class CountingStats(PlanStats):
+    def update(self, payload):
+        self.folded = getattr(self, 'folded', 0) + 1
+        super().update(payload)
+
+def card(i):
+    return {'plan_name': ('alert_and_dispatch', 'monitor_only')[i % 2], 'impact_pct': i % 50, 'cost': 10,
+            'confidence': 0.8, 'execution': [{'result': {'ok': i % 3 != 0}}]}
+
+def write(path, start, n, **kw):
+    with LedgerWriter(path, **kw) as w:
+        for i in range(start, start + n):
+            w.append(card(i))
+        return w.head
+
+def test_restart_replays_only_new_entries(tmp_path):
+    path = str(tmp_path / "ledger.jsonl")
+    write(path, 0, 50)
+    assert PlanStats().bootstrap(path).entries == 50 and os.path.exists(path + STATS_SUFFIX)
+    head = write(path, 50, 7)
+    warm = CountingStats().bootstrap(path)
+    assert warm.folded == 7 and warm.head == head
+    assert warm == PlanStats().bootstrap(path, persist=False)
+    assert warm.summary() == PlanStats().bootstrap(path, persist=False).summary()
+
+def test_snapshot_follows_rotation_and_is_dropped_after_rewind(tmp_path):
+    path = str(tmp_path / "ledger.jsonl")
+    write(path, 0, 30)
+    PlanStats().bootstrap(path)
+    write(path, 30, 30, max_segment_bytes=1)     # rotates the active file after every write
+    rotated = CountingStats().bootstrap(path)
+    assert rotated.folded == 30 and rotated == PlanStats().bootstrap(path, persist=False)
+    # rewinding past the snapshot's head invalidates it: full rebuild
+    path2 = str(tmp_path / "other.jsonl")
+    keep = write(path2, 0, 10)
+    write(path2, 10, 10)
+    PlanStats().bootstrap(path2)
+    rewind(path2, keep)
+    write(path2, 100, 3)
+    rebuilt = CountingStats().bootstrap(path2)
+    assert rebuilt.folded == 13 and rebuilt == PlanStats().bootstrap(path2, persist=False)
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = str(tmp_path / "ledger.jsonl")
+    write(path, 0, 20)
+    with LedgerWriter(path) as w:
+        line = json.dumps(w.make_payload(card(20))) + "\n"
+    with open(path, "a") as f:
+        f.write(line[:len(line) // 2])
+    stats = PlanStats().bootstrap(path)
+    assert stats.entries == 20
+    with open(path, "a") as f:
+        f.write(line[len(line) // 2:])
+    resumed = CountingStats().bootstrap(path)
+    assert resumed.folded == 1 and resumed.entries == 21 and resumed == PlanStats().bootstrap(path, persist=False)
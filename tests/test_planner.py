@@ -0,0 +1,14 @@
+# tests/test_planner.py
+from agents.planner import apply_allocation, canned_candidates
+from allocator import Allocation
+
+def test_zone_without_trucks_gets_no_dispatch_steps():
+    alloc = Allocation([], [])
+    alloc.by_zone = {'zoneA': {'truck': ['t1', 't2']}, 'zoneB': {'crew': ['c1']}}
+    a = apply_allocation(canned_candidates(), 'zoneA', alloc)
+    assert a[0]['steps'][0] == {'actor': 'Executor', 'action': 'dispatch_truck', 'count': 2, 'resources': ['t1', 't2']}
+    for zone in ('zoneB', 'zoneC'):
+        steps = [s for e in apply_allocation(canned_candidates(), zone, alloc) for s in e['steps']]
+        assert steps and all(s['action'] == 'monitor' for s in steps)
+    # without an allocation the candidate steps are kept as proposed
+    assert apply_allocation(canned_candidates(), 'zoneB', None)[0]['steps'][0]['count'] == 2
@@ -0,0 +1,24 @@
+# tests/test_rules.py
+from rules import RuleEngine
+from state_store import WorldState
+
+def test_matched_names_the_rules_per_zone():
+    engine = RuleEngine(capacity=2)
+    world = WorldState({'z1': {'avg_water': 3.0, 'avg_garbage': 95}, 'z2': {'avg_water': 1.0, 'avg_garbage': 92},
+                        'z3': {'avg_water': 0.5, 'avg_garbage': 10}})
+    incidents, changed = engine.update(world)      # three zones: grows past capacity=2
+    assert changed and [i['zone'] for i in incidents] == ['z1', 'z2']
+    assert engine.matched('z1') == ['flood', 'garbage_overflow']
+    assert engine.matched('z2') == ['garbage_overflow']
+    assert engine.matched('z3') == [] and engine.matched('unknown') == []
+    engine.update(world.evolve({'z2': {'avg_water': 2.6, 'avg_garbage': 50}}))
+    assert engine.matched('z2') == ['flood'] and engine.matched('z1') == ['flood', 'garbage_overflow']
+
+def test_rule_change_drops_the_previous_assessment():
+    engine = RuleEngine()
+    incidents, _ = engine.update(WorldState({'z1': {'avg_water': 3.0, 'avg_garbage': 95}}))
+    engine.configure({**engine.rules.spec, 'incidents': [r for r in engine.rules.spec['incidents']
+                                                         if r['name'] == 'flood']})
+    assert engine.assessment is None
+    # an old incident list is no longer the engine's own: roles are worked out per incident
+    assert [c['zone'] for c in engine.coalitions_for(incidents)] == ['z1']
@@ -0,0 +1,68 @@
+# tests/test_sharding.py
+import os, json, csv, random
+import pytest
+from sharding import ShardedRunner, shard_of
+from ledger_index import LedgerReader
+
+def synthetic_csv(path, zones, rows, seed=7):
+    rnd = random.Random(seed)
+    with open(path, "w", newline='') as f:
+        w = csv.writer(f)
+        w.writerow(["timestamp", "sensor_id", "sensor_type", "location", "value"])
+        for i in range(rows):
+            z = rnd.randrange(zones)
+            if rnd.random() < 0.5:
+                w.writerow([1761477000 + i, f"ws_{z:04d}", "water_level", f"zone{z:04d}", round(rnd.uniform(0.5, 3.5), 2)])
+            else:
+                w.writerow([1761477000 + i, f"gs_{z:04d}", "garbage_level", f"zone{z:04d}", round(rnd.uniform(40, 99), 1)])
+
+def test_shards_keep_own_state_and_ledgers(tmp_path):
+    src = str(tmp_path / "sensors.csv")
+    synthetic_csv(src, 32, 400)
+    runner = ShardedRunner.from_csv(src, 8, out_dir=str(tmp_path / "out"), workers=2, llm_latency=0.0)
+    stats = runner.run(iterations=5)
+    assert [r['shard'] for r in stats['shards']] == list(range(8))
+    for spec, r in zip(runner.specs(5), stats['shards']):
+        with open(spec['csv_path']) as f:
+            zones = {row['location'] for row in csv.DictReader(f)}
+        assert zones and all(shard_of(z, 8) == r['shard'] for z in zones)
+        with LedgerReader(spec['ledger_path'], persist=False) as reader:
+            check = reader.verify(workers=1)
+            assert check['ok'] and check['entries'] == r['ledger_entries'] == 5
+            assert reader.head == r['head']
+    with open(runner.top_ledger_path) as f:
+        top = [json.loads(line) for line in f]
+    assert top[-1]['hash'] == stats['top_head']
+    assert [s['head'] for s in top[-1]['entry']['shards']] == [r['head'] for r in stats['shards']]
+
+@pytest.mark.skipif((os.cpu_count() or 1) < 2, reason="speedup needs more than one CPU")
+def test_eight_shards_scale_with_cores(tmp_path):
+    workers = min(8, os.cpu_count())
+    src = str(tmp_path / "sensors.csv")
+    synthetic_csv(src, 64, 8 * 150 * 2)
+    walls = {}
+    for n in (1, workers):
+        runner = ShardedRunner.from_csv(src, 8, out_dir=str(tmp_path / f"w{n}"), workers=n, llm_latency=0.0)
+        walls[n] = runner.run(iterations=150)['wall_s']
+    # CPU-bound stages: close to linear in the number of cores
+    assert walls[1] / walls[workers] >= 0.6 * workers
+
+def shard_outcome(runner, stats):
+    """Per shard: event count and ledger entries without ts/hash and the (uuid) plan ids."""
+    out = []
+    for spec, r in zip(runner.specs(0), stats['shards']):
+        with open(spec['ledger_path']) as f:
+            entries = [{k: v for k, v in json.loads(line)['entry'].items() if k != 'plan_id'} for line in f]
+        out.append((r['shard'], r['events'], r['ledger_entries'], entries))
+    return out
+
+def test_parallel_run_matches_serial(tmp_path):
+    src = str(tmp_path / "sensors.csv")
+    synthetic_csv(src, 24, 300)
+    outcomes = []
+    for n in (1, 4):
+        runner = ShardedRunner.from_csv(src, 6, out_dir=str(tmp_path / f"w{n}"), workers=n, llm_latency=0.0)
+        outcomes.append(shard_outcome(runner, runner.run(iterations=6)))
+    serial, parallel = outcomes
+    assert all(entries for *_, entries in serial)
+    assert parallel == serial
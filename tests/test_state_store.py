@@ -0,0 +1,102 @@
+# tests/test_state_store.py
+import pytest
+from state_store import Event, RingBuffer, StateStore
+
+def events(n):
+    return [Event(f"t{i}", f"s{i % 3}", 'water_level', f"zone{i % 2}", float(i)) for i in range(n)]
+
+def test_ring_buffer_indexes_the_full_history():
+    buf = RingBuffer(4, chunk=2)
+    for i in range(11):
+        buf.append(i)
+    # len() and non-negative indices are logical; only the newest 4..6 stay in memory
+    assert len(buf) == 11 and 4 <= len(buf.items) <= 6 and list(buf) == buf.items
+    assert buf[10] == buf[-1] == 10 and buf[buf.start] == buf.start
+    cursor = 8
+    assert buf[cursor:] == [8, 9, 10] and buf[-2:] == [9, 10] and buf[cursor:cursor] == []
+    # evicted without a spill file: gone, and slices over them return what is left
+    with pytest.raises(IndexError, match="evicted"):
+        buf[0]
+    with pytest.raises(IndexError):
+        buf[11]
+    assert buf[0:11] == buf.items
+    same = RingBuffer(4, chunk=2)
+    for i in range(11):
+        same.append(i)
+    assert buf == same and buf != RingBuffer(4, chunk=2, items=range(12))
+
+def test_ring_buffer_serves_evicted_items_from_the_spill_file(tmp_path):
+    evs = events(20)
+    buf = RingBuffer(5, spill_path=str(tmp_path / "spill" / "events.jsonl"), chunk=2)
+    buf.extend(evs[:7])
+    for ev in evs[7:]:
+        buf.append(ev)
+    assert len(buf) == 20 and buf.spilled == buf.start > 0 and len(buf.items) <= 7
+    # spilled items come back as dicts (Event compares equal to its dict form)
+    assert buf[0] == evs[0] and isinstance(buf[0], dict) and buf[19] is evs[19]
+    assert buf[3:18] == evs[3:18] and buf[::5] == evs[::5]
+    assert buf.query(0, 20, where=lambda o: o['location'] == 'zone1') == evs[1::2]
+    with pytest.raises(ValueError):
+        buf.extend_tail(10, evs[:5])
+
+def test_state_store_bounds_limited_fields():
+    state = StateStore(limits={'perception_events': 8})
+    state['perception_events'] = []
+    state.setdefault('provenance', []).append(1)       # not limited: stays a list
+    state['perception_events'].extend(events(30))
+    buf = state['perception_events']
+    assert isinstance(buf, RingBuffer) and len(buf) == 30 and type(state['provenance']) is list
+    report = state.memory_report()
+    assert report['perception_events']['len'] == 30 and report['perception_events']['in_memory'] == len(buf.items)
+    assert report['perception_events']['bytes'] > 0 and report['provenance']['len'] == 1
+
+def test_state_store_spills_to_spill_dir(tmp_path):
+    state = StateStore(limits={'audit_log': 3}, spill_dir=str(tmp_path))
+    log = state.setdefault('audit_log', [])
+    log.extend({'n': i} for i in range(10))
+    assert (tmp_path / "audit_log.jsonl").exists() and log[0] == {'n': 0} and log[:] == [{'n': i} for i in range(10)]
+
+def test_world_state_evolve_is_copy_on_write():
+    from state_store import WorldState
+    w0 = WorldState({'zoneA': {'avg_water': 1.0}, 'zoneB': {'avg_water': 2.0}})
+    assert w0.evolve({'zoneA': {'avg_water': 1.0}}) is w0       # nothing differs: same object
+    w1 = w0.evolve({'zoneA': {'avg_water': 3.0}, 'zoneC': {'avg_water': 0.5}})
+    assert w1.version == 1 and w1.changed == {'zoneA', 'zoneC'} and w1.removed == frozenset()
+    assert w0 == {'zoneA': {'avg_water': 1.0}, 'zoneB': {'avg_water': 2.0}} and w0.version == 0
+    w2 = w1.evolve(removed=['zoneB', 'missing'])
+    assert w2.removed == {'zoneB'} and 'zoneB' not in w2 and 'zoneB' in w1
+
+def test_world_state_changes_from_an_earlier_version():
+    from state_store import WorldState
+    w0 = WorldState({'a': 1, 'b': 2})
+    w1 = w0.evolve({'a': 5})
+    w2 = w1.evolve({'c': 7}, removed=['b'])
+    w3 = w2.evolve({'c': 8})
+    assert w3.changes_from(w3) == (frozenset(), frozenset())
+    assert w3.changes_from(w1) == ({'c'}, {'b'}) and w3.changes_from(w0) == ({'a', 'c'}, {'b'})
+    # not an ancestor: a separate lineage, a newer version, or an equal but unrelated dict
+    assert w3.changes_from(WorldState({'a': 1, 'b': 2})) is None
+    assert w1.changes_from(w3) is None and w3.changes_from({'a': 5}) is None
+    # a branch off an older version (same version numbers as w2, w3) is a different lineage:
+    # never mistaken for the other branch, and the other branch keeps its own history
+    branch = w1.evolve({'d': 1})
+    assert branch.version == w2.version and branch.changes_from(w2) is None and w2.changes_from(branch) is None
+    assert branch.evolve({'e': 1}).changes_from(branch) == ({'e'}, frozenset())
+    assert w3.changes_from(w1) == ({'c'}, {'b'})
+
+def test_world_state_delta_round_trip_and_history_limit():
+    from state_store import WorldState
+    w = base = WorldState({f"z{i}": i for i in range(5)})
+    for v in range(WorldState.HISTORY + 5):
+        w = w.evolve({f"z{v % 5}": 100 + v})
+    recent = w.delta(since=w.version - 3)
+    assert recent['since'] == w.version - 3 and len(recent['set']) == 3 and recent['removed'] == []
+    # too far back for the kept history: the full state instead
+    assert w.changes_from(base) is None and w.delta(since=0) == {'version': w.version, 'since': None,
+                                                                 'set': dict(w), 'removed': []}
+    prev = w.evolve({'z9': 1}, removed=['z0'])
+    d = prev.delta(since=w.version)
+    rebuilt = w.apply(d)
+    assert rebuilt == prev and rebuilt.version == prev.version and d['removed'] == ['z0']
+    with pytest.raises(ValueError):
+        base.apply(d)
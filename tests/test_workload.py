@@ -0,0 +1,46 @@
+# tests/test_workload.py
+import os
+import numpy as np
+import pandas as pd
+from workload import Workload, generate
+
+def test_same_seed_same_bytes(tmp_path):
+    a = generate(zones=5, sensors=4, minutes=30, seed=7).write_csv(str(tmp_path / "a.csv"))
+    b = generate(zones=5, sensors=4, minutes=30, seed=7).write_csv(str(tmp_path / "b.csv"))
+    c = generate(zones=5, sensors=4, minutes=30, seed=8).write_csv(str(tmp_path / "c.csv"))
+    with open(a, "rb") as fa, open(b, "rb") as fb, open(c, "rb") as fc:
+        data = fa.read()
+        assert data == fb.read() and data != fc.read()
+
+def test_csv_matches_the_sensor_schema(tmp_path):
+    w = Workload(zones=3, sensors=4, minutes=12, seed=1)
+    path = str(tmp_path / "feed.csv")
+    w.write_csv(path, 0, 5)
+    w.write_csv(path, 5, header=False)             # appended in two parts == written at once
+    df = pd.read_csv(path)
+    with open(os.path.join(os.path.dirname(__file__), "..", "data", "simulated_sensors.csv")) as f:
+        assert ",".join(df.columns) == f.readline().strip()
+    assert len(df) == len(w) == 3 * 4 * 12
+    assert df.equals(pd.read_csv(w.write_csv(str(tmp_path / "whole.csv"))))
+    first = df[df.timestamp == "2025-10-25T10:00:00Z"]
+    assert list(first.sensor_id) == [Workload.sensor_id(z, j) for z in range(3) for j in range(4)]
+    assert set(df.sensor_type[df.sensor_id.str.startswith('ws_')]) == {'water_level'}
+    assert set(df.sensor_type[df.sensor_id.str.startswith('gs_')]) == {'garbage_level'}
+    assert w.minute(11) == df.iloc[-12:].to_dict('records')
+
+def test_injected_events_show_up_in_the_readings():
+    w = Workload(zones=6, sensors=4, minutes=60, seed=3, floods=2, overflows=2, spikes=4)
+    kinds = [e['kind'] for e in w.events]
+    assert kinds.count('flood') == 2 and kinds.count('overflow') == 2 and kinds.count('spike') == 4
+    df = w.frame()
+    minutes = np.repeat(np.arange(w.minutes), w.zones * w.sensors)
+    for e in w.events:
+        if e['kind'] == 'spike':
+            hit = df[(df.sensor_id == e['sensor_id']) & (minutes >= e['start']) & (minutes < e['end'])]
+            assert len(hit) == e['end'] - e['start'] and set(hit.value) <= {25.0, 400.0}
+            continue
+        assert 10 <= e['end'] - e['start'] <= 30
+        stype, threshold = ('water_level', 2.5) if e['kind'] == 'flood' else ('garbage_level', 90)
+        last = df[(df.location == e['zone']) & (df.sensor_type == stype) & (minutes == e['end'] - 1)]
+        assert last.value.mean() >= threshold         # the assessor's flood / overflow rule fires
+    assert w.incident_zones() == sorted({e['zone'] for e in w.events if e['kind'] != 'spike'})
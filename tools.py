@@ -1,16 +1,20 @@
 # tools.py
-import csv, time, json, os, hashlib
-from collections import deque
-import random
-import math
+import csv, os
+from ledger import LedgerWriter, BatchedLedgerWriter
+from plan_stats import PlanStats
+# numpy-backed modules (ledger_index, anomaly, twin, allocator) are imported by the tools
+# that use them, so importing tools / graph doesn't load numpy
 
 # --- CSV reader (simple generator) ---
-def csv_stream(path="data/simulated_sensors.csv"):
+def csv_stream(path="data/simulated_sensors.csv", skip=0):
+    """Rows of the sensor CSV as dicts; skip: rows already consumed (e.g. on resume)."""
     if not os.path.exists(path):
         return
     with open(path, newline='') as csvfile:
         reader = csv.DictReader(csvfile)
-        for row in reader:
+        for i, row in enumerate(reader):
+            if i < skip:
+                continue
             # normalize numeric
             if 'value' in row:
                 try:
@@ -19,6 +23,15 @@ def csv_stream(path="data/simulated_sensors.csv"):
                     pass
             yield row
 
+# --- Columnar CSV reader (chunked, vectorized validation) ---
+def csv_tail(path="data/simulated_sensors.csv", max_bytes=64 << 20):
+    """
+    CsvTail over path: read(offset) -> (EventBatch, new_offset) with every complete
+    row after offset.
+    """
+    from columnar import CsvTail   # pandas: only loaded when batch ingestion is used
+    return CsvTail(path, max_bytes=max_bytes)
+
 # --- Simple optimizer (greedy) ---
 def simple_optimizer(requirements, resources):
     """
@@ -36,7 +49,44 @@ def simple_optimizer(requirements, resources):
         rem -= take
     return alloc
 
-# --- Digital twin simulator (fast heuristic) ---
+# --- Global allocator (auction, see allocator.py) ---
+def allocate_resources(incidents, resources, warm=None, time_budget=None, allocator=None):
+    """
+    One allocation of all resources (trucks, crews) across all incidents, weighing
+    severity, travel distance and capacity; supersedes simple_optimizer for dispatch.
+    warm: the previous Allocation, so a re-solve after small changes starts from it.
+    Returns an allocator.Allocation (assignments, by_zone, objective, optimal).
+    """
+    if allocator is None:
+        from allocator import DEFAULT_ALLOCATOR as allocator
+    return allocator.allocate(incidents, resources, warm=warm, time_budget=time_budget)
+
+# --- Digital twin simulator (fast heuristic, vectorized in twin.py) ---
+def _num(v):
+    v = float(v)
+    return int(v) if v.is_integer() else v
+
+def digital_twin_batch(plans, world_state, zones=None, twin=None):
+    """
+    Score many candidate plans in one vectorized pass.
+    zones=None: one outcome dict per plan against the whole world (as digital_twin_simulate).
+    zones=[...]: {outcome: array (plans x zones)} using each zone's own features.
+    World features are computed once per WorldState version and reused.
+    """
+    from twin import DEFAULT_TWIN, OUTCOMES, features_for
+    twin = twin or DEFAULT_TWIN
+    out = twin.evaluate(plans, features_for(world_state), zones)
+    if zones is not None:
+        return out
+    cols = [out[k].tolist() for k in OUTCOMES]
+    return [{k: _num(v) for k, v in zip(OUTCOMES, row)} for row in zip(*cols)]
+
+def digital_twin_rollout(plans, world_state, zones, samples=200, ci=0.9, seed=None, twin=None):
+    """Monte Carlo rollouts: {outcome: {'mean', 'lo', 'hi'}} arrays (plans x zones)."""
+    from twin import DEFAULT_TWIN, features_for
+    twin = twin or DEFAULT_TWIN
+    return twin.rollout(plans, features_for(world_state), zones, samples=samples, ci=ci, seed=seed)
+
 def digital_twin_simulate(plan, world_state):
     """
     plan: dict steps
@@ -44,63 +94,75 @@ def digital_twin_simulate(plan, world_state):
     Returns estimated outcome dict (time_saved_min, damage_reduced_pct, cost)
     Heuristics: more steps -> more cost, 'dispatch' reduces time
     """
-    base = {'time_saved_min': 0, 'damage_reduced_pct': 0, 'cost': 0}
-    p = plan.get('name','').lower()
-    if 'dispatch' in p or 'alert' in p:
-        base['time_saved_min'] = 20
-        base['damage_reduced_pct'] = 40
-        base['cost'] = 100
-    if 'monitor' in p:
-        base['time_saved_min'] = 5
-        base['damage_reduced_pct'] = 5
-        base['cost'] = 10
-    # tweak based on world_state
-    if any(zone.get('avg_water',0) and zone['avg_water']>3 for zone in world_state.values()):
-        base['damage_reduced_pct'] += 10
-        base['time_saved_min'] += 10
-    return base
-
-# --- Adversarial detector (stat rule + noise) ---
-def detect_adversarial(observations, threshold_factor=3.0):
-    """
-    observations: list of dicts with keys sensor_id,value
-    returns flags: list of (sensor_id, reason)
-    """
-    flags = []
-    # compute last values per sensor
-    last = {}
-    for o in observations:
-        sid = o.get('sensor_id')
-        val = o.get('value')
-        if sid in last and isinstance(val, (int,float)):
-            if abs(val - last[sid]) / max(1e-6, last[sid]) > threshold_factor:
-                flags.append({'sensor_id': sid, 'reason': 'sudden_spike'})
-        last[sid] = val
-    # random small prob of false positive for demo
-    if random.random() < 0.02:
-        flags.append({'sensor_id': 'sim_random', 'reason':'random_noise'})
-    return flags
+    return digital_twin_batch([plan], world_state)[0]
+
+# --- Adversarial detector (robust per-sensor statistics) ---
+def detect_adversarial(observations, threshold_factor=None, detector=None, **opts):
+    """
+    observations: list of dicts with keys sensor_id,value, or a columnar.EventBatch
+    threshold_factor: the old spike threshold, kept for existing callers; it sets a fresh
+    detector's sudden-spike (rate-of-change) threshold, in units of the sensor's robust scale.
+    detector: StreamingDetector to score against (keeps state across calls);
+    a fresh one (configured by threshold_factor / opts) is used when omitted.
+    returns flags: list of {'sensor_id', 'reason', 'score'}
+    """
+    if detector is None:
+        from anomaly import StreamingDetector
+        if threshold_factor is not None:
+            opts.setdefault('roc_threshold', threshold_factor)
+        detector = StreamingDetector(**opts)
+    if hasattr(observations, 'codes'):
+        codes, sensor_ids = observations.codes('sensor_id')
+        return detector.detect_coded(codes, sensor_ids, observations.value)
+    return detector.detect(observations)
 
 # --- Simple ledger (append-only file) with basic ECDSA-like signature (mock) ---
 LEDGER_PATH = "data/ledger.jsonl"
-def append_ledger(entry):
+_ledger_writers = {}
+
+def get_ledger_writer(path=None):
+    """
+    Shared LedgerWriter per ledger path (keeps chain head + open file handle).
+    One whose write failed is replaced, re-reading the head from the file.
+    """
+    path = os.path.abspath(path or LEDGER_PATH)
+    w = _ledger_writers.get(path)
+    if w is None or w.error is not None:
+        if w is not None:
+            w.close()
+        w = _ledger_writers[path] = LedgerWriter(path)
+    return w
+
+def close_ledger_writer(path=None):
+    """Close and forget the shared writer for path; the next one re-reads the head from disk."""
+    w = _ledger_writers.pop(os.path.abspath(path or LEDGER_PATH), None)
+    if w is not None:
+        w.close()
+
+def append_ledger(entry, path=None):
     """
     entry: dict -> will be appended with timestamp+hash
+    path: ledger file (defaults to LEDGER_PATH)
+    O(1) per call: the previous hash is kept in memory by the ledger writer.
     """
-    os.makedirs(os.path.dirname(LEDGER_PATH), exist_ok=True)
-    now = time.time()
-    payload = {'ts': now, 'entry': entry}
-    # compute prev hash
-    prev = ""
-    if os.path.exists(LEDGER_PATH):
-        with open(LEDGER_PATH, "r") as f:
-            lines = f.readlines()
-            if lines:
-                last = json.loads(lines[-1])
-                prev = last.get("hash","")
-    payload['prev'] = prev
-    h = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
-    payload['hash'] = h
-    with open(LEDGER_PATH, "a") as f:
-        f.write(json.dumps(payload)+"\n")
-    return payload
+    return get_ledger_writer(path).append(entry)
+
+def get_ledger_batcher(path=None, **opts):
+    """
+    Group-commit writer over the shared LedgerWriter for path.
+    opts: max_batch, max_delay, fsync ('entry'|'batch'|'interval'|'none'), fsync_interval
+    """
+    return BatchedLedgerWriter(get_ledger_writer(path), **opts)
+
+def ledger_reader(path=None, **opts):
+    """
+    Indexed reader over the ledger at path (and its rotated segments): lookups by
+    plan_id / plan_name / zone / ts range, random access and parallel chain verification.
+    opts: workers, persist (see ledger_index.LedgerReader)
+    """
+    from ledger_index import LedgerReader
+    return LedgerReader(path or LEDGER_PATH, **opts)
+
+def load_plan_stats(path=None, **opts):
+    """PlanStats for the ledger at path: its snapshot (if still valid) plus the entries appended since."""
+    return PlanStats(**opts).bootstrap(path or LEDGER_PATH)
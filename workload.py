@@ -0,0 +1,124 @@
+# workload.py
+import numpy as np
+import pandas as pd
+
+START = np.datetime64('2025-10-25T10:00')
+
+class Workload:
+    """
+    Seeded synthetic sensor feed: `zones` zones x `sensors` sensors per zone x `minutes`
+    one-minute readings. Even sensor slots are water_level (m), odd ones garbage_level (%).
+    Readings are correlated the way the real feed is:
+      - one regional rain process (AR(1)) drives every zone's water level, scaled by a
+        per-zone exposure, plus a slower zone-local drift
+      - garbage fills at a per-zone rate and is collected (reset) when nearly full; rain
+        adds to it (wet waste, blocked drains)
+      - sensors in a zone read the zone signal plus a fixed offset and noise
+    Injected on top (ground truth in .events):
+      flood    - a zone's water rises to 2.8-4 m for 10-30 minutes (assessor severity 3)
+      overflow - a zone's garbage climbs past 95% for 10-30 minutes (severity 2)
+      spike    - one sensor reports an implausible value for 1-3 readings (spoofing /
+                 faulty hardware; the safety agent should flag it, not act on it)
+    Same arguments -> same readings, byte for byte.
+    """
+    def __init__(self, zones=20, sensors=4, minutes=60, seed=0, floods=2, overflows=2, spikes=5):
+        self.zones, self.sensors, self.minutes, self.seed = zones, sensors, minutes, seed
+        rng = np.random.default_rng(seed)
+        T, N, M = minutes, zones, sensors
+
+        rain = np.zeros(T)
+        shocks = rng.normal(0, 0.08, T)
+        for t in range(1, T):
+            rain[t] = max(0.0, 0.95 * rain[t - 1] + shocks[t])
+        drift = np.cumsum(rng.normal(0, 0.02, (T, N)), axis=0)
+        water = rng.uniform(0.4, 1.2, N) + rng.uniform(0.5, 1.5, N) * rain[:, None] + drift
+
+        fill_rate = rng.uniform(0.3, 1.2, N)
+        garbage = np.empty((T, N))
+        level = rng.uniform(30, 70, N)
+        for t in range(T):
+            level = np.where(level > 85, rng.uniform(20, 35, N), level + fill_rate)
+            garbage[t] = level
+        garbage += 5 * rain[:, None]
+
+        self.events = []
+        for kind, count in (('flood', floods), ('overflow', overflows)):
+            for _ in range(count):
+                z = int(rng.integers(N))
+                start = int(rng.integers(max(T - 10, 1)))
+                end = min(T, start + int(rng.integers(10, 31)))
+                ramp = np.minimum(1.0, (np.arange(end - start) + 1) / 5)
+                if kind == 'flood':
+                    water[start:end, z] = np.maximum(water[start:end, z], ramp * rng.uniform(2.8, 4.0))
+                else:
+                    garbage[start:end, z] = np.maximum(garbage[start:end, z], 85 + ramp * rng.uniform(10, 20))
+                self.events.append({'kind': kind, 'zone': f"zone{z}", 'start': start, 'end': end})
+
+        kinds = np.arange(M) % 2                       # 0 water, 1 garbage
+        offset = np.where(kinds == 0, rng.normal(0, 0.05, (N, M)), rng.normal(0, 2.0, (N, M)))
+        noise = np.where(kinds == 0, rng.normal(0, 0.03, (T, N, M)), rng.normal(0, 1.0, (T, N, M)))
+        values = np.where(kinds == 0, water[:, :, None], garbage[:, :, None]) + offset + noise
+        values = np.where(kinds == 0, np.clip(values, 0, None), np.clip(values, 0, 120))
+
+        for _ in range(spikes):
+            z, j = int(rng.integers(N)), int(rng.integers(M))
+            start = int(rng.integers(T))
+            end = min(T, start + int(rng.integers(1, 4)))
+            values[start:end, z, j] = 25.0 if kinds[j] == 0 else 400.0
+            self.events.append({'kind': 'spike', 'zone': f"zone{z}", 'sensor_id': self.sensor_id(z, j),
+                                'start': start, 'end': end})
+
+        self.values = values.round(2)
+        self._ids = np.array([[self.sensor_id(z, j) for j in range(M)] for z in range(N)], dtype=object).ravel()
+        self._types = np.where(np.tile(kinds, N) == 0, 'water_level', 'garbage_level').astype(object)
+        self._zones = np.repeat([f"zone{z}" for z in range(N)], M).astype(object)
+        self._ts = np.char.add(np.datetime_as_string(START + np.arange(T).astype('timedelta64[m]'), unit='s'), 'Z')
+
+    @staticmethod
+    def sensor_id(zone, slot):
+        return f"{'ws' if slot % 2 == 0 else 'gs'}_{zone}_{slot}"
+
+    def __len__(self):
+        return self.values.size
+
+    def frame(self, start=0, end=None):
+        """Readings for minutes [start, end) as a DataFrame in the simulated_sensors.csv schema."""
+        end = self.minutes if end is None else min(end, self.minutes)
+        per = self.zones * self.sensors
+        n = max(end - start, 0)
+        return pd.DataFrame({
+            'timestamp': np.repeat(self._ts[start:end], per),
+            'sensor_id': np.tile(self._ids, n),
+            'sensor_type': np.tile(self._types, n),
+            'location': np.tile(self._zones, n),
+            'value': self.values[start:end].reshape(-1),
+        })
+
+    def minute(self, t):
+        """One minute of readings as a list of raw dicts (what a live feed would send)."""
+        return self.frame(t, t + 1).to_dict('records')
+
+    def write_csv(self, path, start=0, end=None, header=True):
+        """Write (or with header=False append) minutes [start, end) to a CSV perception can read."""
+        self.frame(start, end).to_csv(path, mode='w' if header else 'a', header=header, index=False)
+        return path
+
+    def incident_zones(self):
+        """Zones with an injected flood / overflow (what the assessor should pick up)."""
+        return sorted({e['zone'] for e in self.events if e['kind'] != 'spike'})
+
+def generate(zones=20, sensors=4, minutes=60, seed=0, **events):
+    return Workload(zones, sensors, minutes, seed, **events)
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Write a synthetic sensor CSV.")
+    ap.add_argument("path")
+    ap.add_argument("--zones", type=int, default=20)
+    ap.add_argument("--sensors", type=int, default=4)
+    ap.add_argument("--minutes", type=int, default=60)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    w = generate(args.zones, args.sensors, args.minutes, args.seed)
+    w.write_csv(args.path)
+    print(f"{len(w):,} readings -> {args.path}; injected: {w.events}")